@@ -98,6 +98,13 @@ impl<T: NativeType> Array for PrimitiveArray<T> {
     }
 }
 
+impl<T: NativeType> PrimitiveArray<T> {
+    /// Returns the contiguous values of the array, including the placeholders of null slots.
+    pub fn raw_data(&self) -> &[T] {
+        &self.data
+    }
+}
+
 impl<T: NativeType> ArrayValidExt for PrimitiveArray<T> {
     fn get_valid_bitmap(&self) -> &BitVec {
         &self.valid
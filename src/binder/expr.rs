@@ -17,15 +17,22 @@ impl Binder {
     pub fn bind_expr(&mut self, expr: Expr) -> Result {
         let id = match expr {
             Expr::Value(v) => {
-                // This is okay since only sql udf relies on
-                // parameter-like (i.e., `$1`) values at present
+                // Parameter-like (i.e., `$1`) values are sql udf arguments inside a udf body,
+                // and prepared statement parameters otherwise
                 // TODO: consider formally `bind_parameter` in the future
                 // e.g., lambda function support, etc.
                 if let Value::Placeholder(key) = &v {
-                    self.udf_context
-                        .get_expr(key)
-                        .cloned()
-                        .ok_or_else(|| ErrorKind::InvalidSQL.with_spanned(&v))
+                    if let Some(id) = self.udf_context.get_expr(key) {
+                        Ok(*id)
+                    } else {
+                        let param = key
+                            .strip_prefix('$')
+                            .and_then(|n| n.parse::<usize>().ok())
+                            .and_then(|n| self.params.get(n.checked_sub(1)?))
+                            .cloned()
+                            .ok_or_else(|| ErrorKind::InvalidSQL.with_spanned(&v))?;
+                        Ok(self.egraph.add(Node::Constant(param)))
+                    }
                 } else {
                     Ok(self.egraph.add(Node::Constant(v.into())))
                 }
@@ -46,6 +46,8 @@ pub struct Binder {
     table_occurrences: HashMap<TableRefId, u32>,
     /// The context used in sql udf binding
     udf_context: UdfContext,
+    /// The values of prepared statement parameters `$1`, `$2`, ...
+    params: Vec<DataValue>,
 }
 
 #[derive(Clone, Debug, Default)]
@@ -215,9 +217,16 @@ impl Binder {
             contexts: vec![Context::default()],
             table_occurrences: HashMap::new(),
             udf_context: UdfContext::new(),
+            params: vec![],
         }
     }
 
+    /// Set the values bound to the parameters `$1`, `$2`, ... of a prepared statement.
+    pub fn with_params(mut self, params: Vec<DataValue>) -> Self {
+        self.params = params;
+        self
+    }
+
     /// Bind a statement.
     pub fn bind(&mut self, stmt: Statement) -> Result<RecExpr> {
         let id = self.bind_stmt(stmt)?;
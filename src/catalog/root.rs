@@ -1,6 +1,7 @@
 // Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
 
 use std::collections::HashMap;
+use std::sync::atomic::{AtomicU64, Ordering};
 use std::sync::{Arc, Mutex};
 
 use super::function::FunctionCatalog;
@@ -12,6 +13,8 @@ use crate::planner::RecExpr;
 /// The root of all catalogs.
 pub struct RootCatalog {
     inner: Mutex<Inner>,
+    /// Incremented on every change to the catalog.
+    version: AtomicU64,
 }
 
 #[derive(Default)]
@@ -34,9 +37,20 @@ impl RootCatalog {
         inner.add_schema(Self::DEFAULT_SCHEMA_NAME.into()).unwrap();
         RootCatalog {
             inner: Mutex::new(inner),
+            version: AtomicU64::new(0),
         }
     }
 
+    /// Returns the version of the catalog, which changes whenever a table, view, index or
+    /// function is added or dropped. Used to invalidate cached plans.
+    pub fn version(&self) -> u64 {
+        self.version.load(Ordering::Acquire)
+    }
+
+    fn bump_version(&self) {
+        self.version.fetch_add(1, Ordering::AcqRel);
+    }
+
     pub fn all_schemas(&self) -> HashMap<SchemaId, SchemaCatalog> {
         let inner = self.inner.lock().unwrap();
         inner.schemas.clone()
@@ -84,7 +98,9 @@ impl RootCatalog {
     ) -> Result<TableId, CatalogError> {
         let mut inner = self.inner.lock().unwrap();
         let schema = inner.schemas.get_mut(&schema_id).unwrap();
-        schema.add_table(name, columns, ordered_pk_ids)
+        let result = schema.add_table(name, columns, ordered_pk_ids);
+        self.bump_version();
+        result
     }
 
     pub fn add_view(
@@ -96,7 +112,9 @@ impl RootCatalog {
     ) -> Result<TableId, CatalogError> {
         let mut inner = self.inner.lock().unwrap();
         let schema = inner.schemas.get_mut(&schema_id).unwrap();
-        schema.add_view(name, columns, query)
+        let result = schema.add_view(name, columns, query);
+        self.bump_version();
+        result
     }
 
     pub fn add_index(
@@ -109,7 +127,9 @@ impl RootCatalog {
     ) -> Result<IndexId, CatalogError> {
         let mut inner = self.inner.lock().unwrap();
         let schema = inner.schemas.get_mut(&schema_id).unwrap();
-        schema.add_index(index_name, table_id, column_idxs.to_vec(), index_type)
+        let result = schema.add_index(index_name, table_id, column_idxs.to_vec(), index_type);
+        self.bump_version();
+        result
     }
 
     pub fn get_index_on_table(&self, schema_id: SchemaId, table_id: TableId) -> Vec<IndexId> {
@@ -132,6 +152,7 @@ impl RootCatalog {
         let mut inner = self.inner.lock().unwrap();
         let schema = inner.schemas.get_mut(&table_ref_id.schema_id).unwrap();
         schema.delete_table(table_ref_id.table_id);
+        self.bump_version();
     }
 
     pub fn get_table_id_by_name(&self, schema_name: &str, table_name: &str) -> Option<TableRefId> {
@@ -168,6 +189,7 @@ impl RootCatalog {
         let mut inner = self.inner.lock().unwrap();
         let schema = inner.schemas.get_mut(&schema_idx).unwrap();
         schema.create_function(name, arg_types, arg_names, return_type, language, body);
+        self.bump_version();
     }
 
     pub const DEFAULT_SCHEMA_NAME: &'static str = "postgres";
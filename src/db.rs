@@ -1,27 +1,130 @@
 // Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
 
 use std::sync::{Arc, Mutex};
+use std::time::{Duration, Instant};
 
-use futures::TryStreamExt;
+use futures::stream::BoxStream;
+use futures::{StreamExt, TryStreamExt};
 use minitrace::collector::SpanContext;
 use minitrace::Span;
 use risinglight_proto::rowset::block_statistics::BlockStatisticsType;
 
-use crate::array::Chunk;
+use crate::array::{ArrayBuilderImpl, Chunk, DataChunk};
 use crate::binder::bind_header;
-use crate::catalog::{RootCatalog, RootCatalogRef, TableRefId};
-use crate::parser::{parse, ParserError};
-use crate::planner::{Expr, RecExpr, Statistics};
+use crate::catalog::{ColumnCatalog, ColumnId, RootCatalog, RootCatalogRef, TableRefId};
+use crate::executor::{BoxedExecutor, ExecutorError, Metrics, OperatorMetrics};
+use crate::parser::{parse, ParserError, Statement};
+use crate::planner::{
+    Expr, OptimizerReport, PlanCache, PlanCacheStats, RecExpr, StageParams, Statistics,
+    StatsDetail, TelemetrySink,
+};
 use crate::storage::{
     InMemoryStorage, SecondaryStorage, SecondaryStorageOptions, Storage, StorageColumnRef,
-    StorageImpl, Table,
+    StorageImpl, Table, Transaction,
 };
+use crate::types::{DataType, DataValue};
 
 /// The database instance.
 pub struct Database {
     catalog: RootCatalogRef,
     storage: StorageImpl,
     config: Mutex<Config>,
+    plan_cache: Mutex<PlanCache>,
+    profile_counters: Mutex<ProfileCounters>,
+}
+
+/// A parsed statement with parameters `$1`, `$2`, ..., created by [`Database::prepare`].
+#[derive(Debug, Clone)]
+pub struct PreparedStatement {
+    sql: String,
+    stmt: Statement,
+}
+
+impl PreparedStatement {
+    /// Returns the SQL text of the statement.
+    pub fn sql(&self) -> &str {
+        &self.sql
+    }
+}
+
+/// Where the time of a query went, returned by [`Database::run_profiled`].
+#[derive(Debug, Clone, Default)]
+pub struct QueryProfile {
+    /// Parsing the SQL text and collecting the statistics for the optimizer.
+    pub parse: Duration,
+    pub statements: Vec<StatementProfile>,
+    pub total: Duration,
+}
+
+/// The profile of one statement of a query.
+#[derive(Debug, Clone, Default)]
+pub struct StatementProfile {
+    /// Whether the plan came from the plan cache, skipping binding and optimization.
+    pub plan_cached: bool,
+    pub bind: Duration,
+    /// The wall time of each optimizer stage, 0 to 3. Zero when the optimizer did not run.
+    pub optimizer_stages: [Duration; 4],
+    pub execute: Duration,
+    /// The busy time and output rows of each executor operator.
+    pub operators: Vec<OperatorMetrics>,
+}
+
+/// Totals over all queries run with [`Database::run_profiled`].
+#[derive(Debug, Clone, Default)]
+pub struct ProfileCounters {
+    pub queries: u64,
+    pub statements: u64,
+    pub plan_cache_hits: u64,
+    pub parse: Duration,
+    pub bind: Duration,
+    pub optimizer_stages: [Duration; 4],
+    pub execute: Duration,
+    pub total: Duration,
+}
+
+impl ProfileCounters {
+    fn add(&mut self, profile: &QueryProfile) {
+        self.queries += 1;
+        self.parse += profile.parse;
+        self.total += profile.total;
+        for statement in &profile.statements {
+            self.statements += 1;
+            self.plan_cache_hits += statement.plan_cached as u64;
+            self.bind += statement.bind;
+            for (total, time) in self
+                .optimizer_stages
+                .iter_mut()
+                .zip(statement.optimizer_stages)
+            {
+                *total += time;
+            }
+            self.execute += statement.execute;
+        }
+    }
+}
+
+/// A statement ready to be executed.
+struct Planned {
+    executor: BoxedExecutor,
+    /// Filled in by the executor as it runs.
+    metrics: Metrics,
+    profile: StatementProfile,
+}
+
+impl Planned {
+    /// Execute the statement and complete its profile with the execution time and operators.
+    async fn execute_profiled(self) -> Result<(Vec<DataChunk>, StatementProfile), Error> {
+        let Planned {
+            executor,
+            metrics,
+            mut profile,
+        } = self;
+        let execute_start = Instant::now();
+        let output = executor.try_collect().await?;
+        profile.execute = execute_start.elapsed();
+        profile.operators = metrics.operators();
+        Ok((output, profile))
+    }
 }
 
 /// The configuration of the database.
@@ -29,6 +132,10 @@ pub struct Database {
 struct Config {
     disable_optimizer: bool,
     mock_stat: Option<Statistics>,
+    telemetry: Option<TelemetrySink>,
+    stage_params: StageParams,
+    /// Whether plain queries, and not only prepared statements, go through the plan cache.
+    cache_queries: bool,
 }
 
 impl Database {
@@ -39,6 +146,8 @@ impl Database {
             catalog: storage.catalog().clone(),
             storage: StorageImpl::InMemoryStorage(Arc::new(storage)),
             config: Default::default(),
+            plan_cache: Default::default(),
+            profile_counters: Default::default(),
         }
     }
 
@@ -50,6 +159,8 @@ impl Database {
             catalog: storage.catalog().clone(),
             storage: StorageImpl::SecondaryStorage(storage),
             config: Default::default(),
+            plan_cache: Default::default(),
+            profile_counters: Default::default(),
         }
     }
 
@@ -82,46 +193,414 @@ impl Database {
     pub async fn run(&self, sql: &str) -> Result<Vec<Chunk>, Error> {
         let _root = Span::root("run_sql", SpanContext::random());
 
-        let sql = if let Some(cmd) = sql.trim().strip_prefix('\\') {
-            self.command_to_sql(cmd)?
-        } else {
-            sql.to_string()
-        };
+        let sql = self.preprocess(sql)?;
+        let optimizer = self.new_optimizer().await?;
+        let stmts = parse(&sql)?;
+        let mut outputs: Vec<Chunk> = vec![];
+        for stmt in stmts {
+            let Some(planned) = self.build_executor(&optimizer, &stmt, &sql, None)? else {
+                continue;
+            };
+            let output = planned.executor.try_collect().await?;
+            let mut chunk = Chunk::new(output);
+            chunk = bind_header(chunk, &stmt);
+            outputs.push(chunk);
+        }
+        Ok(outputs)
+    }
 
-        let optimizer = crate::planner::Optimizer::new(
-            self.catalog.clone(),
-            self.get_storage_statistics().await?,
-            crate::planner::Config {
-                enable_range_filter_scan: self.storage.support_range_filter_scan(),
-                table_is_sorted_by_primary_key: self.storage.table_is_sorted_by_primary_key(),
-            },
-        );
+    /// Run SQL queries like [`Database::run`], and return where the time went.
+    ///
+    /// The profile is also added to the counters returned by [`Database::profile_counters`].
+    pub async fn run_profiled(&self, sql: &str) -> Result<(Vec<Chunk>, QueryProfile), Error> {
+        let _root = Span::root("run_sql_profiled", SpanContext::random());
+        let start = Instant::now();
 
+        let sql = self.preprocess(sql)?;
+        let optimizer = self.new_optimizer().await?;
         let stmts = parse(&sql)?;
+        let mut profile = QueryProfile {
+            parse: start.elapsed(),
+            ..Default::default()
+        };
         let mut outputs: Vec<Chunk> = vec![];
+        for stmt in stmts {
+            let Some(planned) = self.build_executor(&optimizer, &stmt, &sql, None)? else {
+                continue;
+            };
+            let (output, statement) = planned.execute_profiled().await?;
+            profile.statements.push(statement);
+
+            let mut chunk = Chunk::new(output);
+            chunk = bind_header(chunk, &stmt);
+            outputs.push(chunk);
+        }
+        profile.total = start.elapsed();
+        self.profile_counters.lock().unwrap().add(&profile);
+        Ok((outputs, profile))
+    }
+
+    /// Returns the totals over all profiled queries.
+    pub fn profile_counters(&self) -> ProfileCounters {
+        self.profile_counters.lock().unwrap().clone()
+    }
+
+    /// Reset the totals over all profiled queries.
+    pub fn reset_profile_counters(&self) {
+        *self.profile_counters.lock().unwrap() = ProfileCounters::default();
+    }
+
+    /// Optimize the queries in SQL and return the statistics of the optimizer for each of them.
+    ///
+    /// Queries are optimized but not executed. Other statements are run as usual, so that later
+    /// statements see e.g. the tables and views they create. `detail` bounds how much of each
+    /// e-graph is inspected. The reports are also queued to the telemetry sink, if one is set.
+    ///
+    /// Without a `detail` level, no statistics are collected or recorded: the reports only hold
+    /// the cost, peak e-graph size and time of each stage, timed as in a normal query.
+    pub async fn optimizer_report(
+        &self,
+        sql: &str,
+        detail: Option<StatsDetail>,
+    ) -> Result<Vec<OptimizerReport>, Error> {
+        let _root = Span::root("optimizer_report", SpanContext::random());
+
+        let sql = self.preprocess(sql)?;
+        let optimizer = self.new_optimizer().await?;
+        let telemetry = self.telemetry();
+        let stmts = parse(&sql)?;
+        let mut reports = vec![];
         for stmt in stmts {
             let mut binder = crate::binder::Binder::new(self.catalog.clone());
-            let mut plan = binder.bind(stmt.clone()).map_err(|e| e.with_sql(&sql))?;
+            let plan = binder.bind(stmt.clone()).map_err(|e| e.with_sql(&sql))?;
             if self.handle_set(&plan)? {
+                self.plan_cache.lock().unwrap().clear();
                 continue;
             }
-            if !self.config.lock().unwrap().disable_optimizer {
-                plan = optimizer.optimize(plan);
+            let (plan, report) = optimizer.optimize_with_report(plan, detail);
+            if matches!(stmt, Statement::Query(_)) {
+                if let (Some(telemetry), Some(_)) = (&telemetry, detail) {
+                    telemetry.record(report.clone());
+                }
+                reports.push(report);
+            } else {
+                let (executor, _) = self.build_plan(&optimizer, &plan);
+                executor.try_collect::<Vec<_>>().await?;
+            }
+        }
+        Ok(reports)
+    }
+
+    /// Run SQL queries and return a stream over the output of the last statement.
+    ///
+    /// The statements before the last one are run to completion first. The last statement is
+    /// executed in the background as the stream is consumed, and dropping the stream cancels
+    /// the rest of its execution.
+    pub async fn run_stream(
+        &self,
+        sql: &str,
+    ) -> Result<BoxStream<'static, Result<DataChunk, Error>>, Error> {
+        let _root = Span::root("run_sql_stream", SpanContext::random());
+
+        let sql = self.preprocess(sql)?;
+        let optimizer = self.new_optimizer().await?;
+        let mut stmts = parse(&sql)?;
+        let Some(last) = stmts.pop() else {
+            return Ok(futures::stream::empty().boxed());
+        };
+        for stmt in stmts {
+            if let Some(planned) = self.build_executor(&optimizer, &stmt, &sql, None)? {
+                planned.executor.try_collect::<Vec<_>>().await?;
+            }
+        }
+        Ok(match self.build_executor(&optimizer, &last, &sql, None)? {
+            Some(planned) => planned.executor.map_err(Error::from).boxed(),
+            None => futures::stream::empty().boxed(),
+        })
+    }
+
+    /// Parse a single statement to be executed later with [`Database::execute_prepared`].
+    ///
+    /// The statement may contain parameters `$1`, `$2`, ... that are given at execution.
+    pub fn prepare(&self, sql: &str) -> Result<PreparedStatement, Error> {
+        let sql = self.preprocess(sql)?;
+        let mut stmts = parse(&sql)?;
+        if stmts.len() != 1 {
+            return Err(Error::Internal(
+                "a prepared statement must contain exactly one statement".into(),
+            ));
+        }
+        let stmt = stmts.pop().unwrap();
+        Ok(PreparedStatement { sql, stmt })
+    }
+
+    /// Execute a prepared statement with the given parameter values.
+    pub async fn execute_prepared(
+        &self,
+        prepared: &PreparedStatement,
+        params: &[DataValue],
+    ) -> Result<Vec<Chunk>, Error> {
+        let _root = Span::root("run_prepared", SpanContext::random());
+
+        let optimizer = self.new_optimizer().await?;
+        let Some(planned) =
+            self.build_executor(&optimizer, &prepared.stmt, &prepared.sql, Some(params))?
+        else {
+            return Ok(vec![]);
+        };
+        let output = planned.executor.try_collect().await?;
+        let chunk = bind_header(Chunk::new(output), &prepared.stmt);
+        Ok(vec![chunk])
+    }
+
+    /// Execute a prepared statement like [`Database::execute_prepared`], and return where the
+    /// time went.
+    ///
+    /// The statement was parsed by [`Database::prepare`], so the profile's `parse` time only
+    /// covers collecting the statistics. The profile is also added to the counters returned by
+    /// [`Database::profile_counters`].
+    pub async fn execute_prepared_profiled(
+        &self,
+        prepared: &PreparedStatement,
+        params: &[DataValue],
+    ) -> Result<(Vec<Chunk>, QueryProfile), Error> {
+        let _root = Span::root("run_prepared_profiled", SpanContext::random());
+        let start = Instant::now();
+
+        let optimizer = self.new_optimizer().await?;
+        let mut profile = QueryProfile {
+            parse: start.elapsed(),
+            ..Default::default()
+        };
+        let mut outputs = vec![];
+        if let Some(planned) =
+            self.build_executor(&optimizer, &prepared.stmt, &prepared.sql, Some(params))?
+        {
+            let (output, statement) = planned.execute_profiled().await?;
+            profile.statements.push(statement);
+            outputs.push(bind_header(Chunk::new(output), &prepared.stmt));
+        }
+        profile.total = start.elapsed();
+        self.profile_counters.lock().unwrap().add(&profile);
+        Ok((outputs, profile))
+    }
+
+    /// Returns the types of the given columns of a table.
+    pub fn column_types(
+        &self,
+        table_name: &str,
+        column_names: &[String],
+    ) -> Result<Vec<DataType>, Error> {
+        let (_, columns) = self.resolve_columns(table_name, column_names)?;
+        Ok(columns.iter().map(|col| col.data_type()).collect())
+    }
+
+    /// Append rows to a table through the storage layer, without going through SQL.
+    ///
+    /// Each chunk holds one array per name in `column_names`, in that order. Arrays are cast to
+    /// the column types and the other columns are filled with nulls. All chunks are appended in
+    /// one transaction. Returns the number of rows appended.
+    pub async fn append(
+        &self,
+        table_name: &str,
+        column_names: &[String],
+        chunks: Vec<DataChunk>,
+    ) -> Result<usize, Error> {
+        let (table_id, columns) = self.resolve_columns(table_name, column_names)?;
+        let column_ids = columns.iter().map(|col| col.id()).collect::<Vec<_>>();
+        match self.storage.clone() {
+            StorageImpl::InMemoryStorage(s) => {
+                append_chunks(s, table_id, &column_ids, chunks).await
+            }
+            StorageImpl::SecondaryStorage(s) => {
+                append_chunks(s, table_id, &column_ids, chunks).await
+            }
+        }
+    }
+
+    /// Find a table by name, `table` or `schema.table`, and the given columns of it.
+    fn resolve_columns(
+        &self,
+        table_name: &str,
+        column_names: &[String],
+    ) -> Result<(TableRefId, Vec<ColumnCatalog>), Error> {
+        let name = table_name.to_lowercase();
+        let (schema_name, name) = name
+            .split_once('.')
+            .unwrap_or((RootCatalog::DEFAULT_SCHEMA_NAME, &name));
+        let table_id = self
+            .catalog
+            .get_table_id_by_name(schema_name, name)
+            .ok_or_else(|| Error::Internal(format!("table not found: {table_name}")))?;
+        let table = self.catalog.get_table(&table_id).unwrap();
+        let columns = column_names
+            .iter()
+            .map(|column_name| {
+                table
+                    .get_column_by_name(&column_name.to_lowercase())
+                    .ok_or_else(|| Error::Internal(format!("column not found: {column_name}")))
+            })
+            .try_collect()?;
+        Ok((table_id, columns))
+    }
+
+    /// Returns the counters of the plan cache.
+    pub fn plan_cache_stats(&self) -> PlanCacheStats {
+        self.plan_cache.lock().unwrap().stats()
+    }
+
+    /// Set the number of plans kept in the plan cache. 0 disables the cache.
+    pub fn set_plan_cache_capacity(&self, capacity: usize) {
+        self.plan_cache.lock().unwrap().set_capacity(capacity);
+    }
+
+    /// Set whether plain queries of [`Database::run`], [`Database::run_profiled`] and
+    /// [`Database::run_stream`] go through the plan cache, keyed by statement text. Off by
+    /// default: only prepared statements are cached.
+    pub fn set_cache_queries(&self, enabled: bool) {
+        self.config.lock().unwrap().cache_queries = enabled;
+    }
+
+    /// Set the search effort of the optimizer stages. Cached plans, optimized with the previous
+    /// parameters, are dropped.
+    pub fn set_stage_params(&self, params: StageParams) {
+        self.config.lock().unwrap().stage_params = params;
+        self.plan_cache.lock().unwrap().clear();
+    }
+
+    /// Returns the search effort of the optimizer stages.
+    pub fn stage_params(&self) -> StageParams {
+        self.config.lock().unwrap().stage_params
+    }
+
+    /// Set where the optimizer writes the statistics of each query it optimizes. `None`, the
+    /// default, disables them.
+    ///
+    /// Plans served from the plan cache are not optimized again, so they produce no statistics.
+    /// Plain queries, e.g. those of the CLI, are only cached with [`Database::set_cache_queries`].
+    pub fn set_telemetry(&self, telemetry: Option<TelemetrySink>) {
+        self.config.lock().unwrap().telemetry = telemetry;
+    }
+
+    /// Returns where the optimizer writes its statistics, if anywhere.
+    pub fn telemetry(&self) -> Option<TelemetrySink> {
+        self.config.lock().unwrap().telemetry.clone()
+    }
+
+    /// Expand a backslash command into SQL.
+    fn preprocess(&self, sql: &str) -> Result<String, Error> {
+        if let Some(cmd) = sql.trim().strip_prefix('\\') {
+            self.command_to_sql(cmd)
+        } else {
+            Ok(sql.to_string())
+        }
+    }
+
+    async fn new_optimizer(&self) -> Result<crate::planner::Optimizer, Error> {
+        let statistics = self.get_storage_statistics().await?;
+        let config = self.config.lock().unwrap();
+        Ok(crate::planner::Optimizer::new(
+            self.catalog.clone(),
+            statistics,
+            crate::planner::Config {
+                enable_range_filter_scan: self.storage.support_range_filter_scan(),
+                table_is_sorted_by_primary_key: self.storage.table_is_sorted_by_primary_key(),
+                telemetry: config.telemetry.clone(),
+                stage_params: config.stage_params,
+            },
+        ))
+    }
+
+    /// Bind and optimize a statement, and build its executor.
+    ///
+    /// `params` are the parameter values of a prepared statement, `None` for a plain one.
+    /// Optimized plans of prepared queries (and of plain ones with
+    /// [`Database::set_cache_queries`]) are cached by statement text and parameter types until
+    /// the catalog or the storage statistics change, and reused for other parameter values once
+    /// found not to depend on them (see [`PlanCache`]). Returns `None` for statements that are
+    /// handled without execution, e.g. `SET`.
+    fn build_executor(
+        &self,
+        optimizer: &crate::planner::Optimizer,
+        stmt: &Statement,
+        sql: &str,
+        params: Option<&[DataValue]>,
+    ) -> Result<Option<Planned>, Error> {
+        let mut profile = StatementProfile::default();
+        let (optimize, cache_queries) = {
+            let config = self.config.lock().unwrap();
+            (!config.disable_optimizer, config.cache_queries)
+        };
+        let cacheable =
+            optimize && (params.is_some() || cache_queries) && matches!(stmt, Statement::Query(_));
+        let params = params.unwrap_or_default();
+        let types: Vec<_> = params.iter().map(|v| v.data_type()).collect();
+        let key = (stmt.to_string(), types);
+        // read before binding, so that a concurrent catalog change invalidates the new entry
+        let catalog_version = self.catalog.version();
+        let statistics = optimizer.statistics();
+        let cached = if cacheable {
+            self.plan_cache
+                .lock()
+                .unwrap()
+                .get(&key, params, catalog_version, statistics)
+        } else {
+            None
+        };
+
+        let plan = match cached {
+            Some(plan) => {
+                profile.plan_cached = true;
+                plan
             }
-            let executor = match self.storage.clone() {
-                StorageImpl::InMemoryStorage(s) => {
-                    crate::executor::build(optimizer.clone(), s, &plan)
+            None => {
+                let bind_start = Instant::now();
+                let mut binder =
+                    crate::binder::Binder::new(self.catalog.clone()).with_params(params.to_vec());
+                let mut plan = binder.bind(stmt.clone()).map_err(|e| e.with_sql(sql))?;
+                profile.bind = bind_start.elapsed();
+                if self.handle_set(&plan)? {
+                    // settings may change the statistics plans are based on
+                    self.plan_cache.lock().unwrap().clear();
+                    return Ok(None);
                 }
-                StorageImpl::SecondaryStorage(s) => {
-                    crate::executor::build(optimizer.clone(), s, &plan)
+                if optimize {
+                    (plan, profile.optimizer_stages) = optimizer.optimize_timed(plan);
                 }
-            };
-            let output = executor.try_collect().await?;
-            let mut chunk = Chunk::new(output);
-            chunk = bind_header(chunk, &stmt);
-            outputs.push(chunk);
+                if cacheable {
+                    self.plan_cache.lock().unwrap().insert(
+                        key,
+                        params.to_vec(),
+                        plan.clone(),
+                        catalog_version,
+                        statistics.clone(),
+                    );
+                }
+                plan
+            }
+        };
+        let (executor, metrics) = self.build_plan(optimizer, &plan);
+        Ok(Some(Planned {
+            executor,
+            metrics,
+            profile,
+        }))
+    }
+
+    /// Build the executor of an optimized plan.
+    fn build_plan(
+        &self,
+        optimizer: &crate::planner::Optimizer,
+        plan: &RecExpr,
+    ) -> (BoxedExecutor, Metrics) {
+        match self.storage.clone() {
+            StorageImpl::InMemoryStorage(s) => {
+                crate::executor::build_with_metrics(optimizer.clone(), s, plan)
+            }
+            StorageImpl::SecondaryStorage(s) => {
+                crate::executor::build_with_metrics(optimizer.clone(), s, plan)
+            }
         }
-        Ok(outputs)
     }
 
     async fn get_storage_statistics(&self) -> Result<Statistics, Error> {
@@ -199,6 +678,40 @@ impl Database {
     }
 }
 
+/// Append chunks to a table in one transaction, casting them to the column types like `INSERT`.
+async fn append_chunks<S: Storage>(
+    storage: Arc<S>,
+    table_id: TableRefId,
+    column_ids: &[ColumnId],
+    chunks: Vec<DataChunk>,
+) -> Result<usize, Error> {
+    let table = storage.get_table(table_id)?;
+    let columns = table.columns()?;
+    let mut txn = table.write().await?;
+    let mut count = 0;
+    for chunk in chunks {
+        let arrays: DataChunk = columns
+            .iter()
+            .map(
+                |col| match column_ids.iter().position(|&id| id == col.id()) {
+                    Some(index) => chunk.array_at(index).cast(&col.data_type()),
+                    None => {
+                        let mut builder =
+                            ArrayBuilderImpl::with_capacity(chunk.cardinality(), &col.data_type());
+                        builder.push_n(chunk.cardinality(), &DataValue::Null);
+                        Ok(builder.finish())
+                    }
+                },
+            )
+            .try_collect()
+            .map_err(ExecutorError::from)?;
+        count += arrays.cardinality();
+        txn.append(arrays).await?;
+    }
+    txn.commit().await?;
+    Ok(count)
+}
+
 /// The error type of database operations.
 #[derive(thiserror::Error, Debug)]
 pub enum Error {
@@ -292,6 +805,136 @@ mod tests {
     use rustyline::history::DefaultHistory;
 
     use super::*;
+    use crate::array::{ArrayImpl, I32Array};
+
+    /// The number of rows output by the last statement.
+    fn row_count(chunks: &[Chunk]) -> usize {
+        chunks.last().map_or(0, |chunk| {
+            chunk.data_chunks().iter().map(|c| c.cardinality()).sum()
+        })
+    }
+
+    #[tokio::test]
+    async fn append_casts_columns_and_fills_the_others() {
+        let db = Database::new_in_memory();
+        db.run("create table t (a int, b bigint, c varchar)")
+            .await
+            .unwrap();
+        let chunk: DataChunk = [
+            ArrayImpl::new_int32(I32Array::from_iter([Some(1), None, Some(3)])),
+            ArrayImpl::new_int32(I32Array::from_iter([10, 20, 30].map(Some))),
+        ]
+        .into_iter()
+        .collect();
+        // names are case-insensitive, and b is cast from INT to BIGINT
+        let columns = ["b".to_string(), "A".to_string()];
+        assert_eq!(db.append("T", &columns, vec![chunk]).await.unwrap(), 3);
+
+        let rows = db.run("select a from t").await.unwrap();
+        assert_eq!(row_count(&rows), 3);
+        let rows = db
+            .run("select a from t where a = 20 and b is null")
+            .await
+            .unwrap();
+        assert_eq!(row_count(&rows), 1);
+        let rows = db.run("select a from t where c is null").await.unwrap();
+        assert_eq!(row_count(&rows), 3);
+
+        assert!(db.append("missing", &columns, vec![]).await.is_err());
+        assert!(db.append("t", &["d".to_string()], vec![]).await.is_err());
+    }
+
+    #[tokio::test]
+    async fn prepared_statements_reuse_cached_plans() {
+        let db = Database::new_in_memory();
+        db.run("create table t (a int, b int); insert into t values (1, 10), (2, 20), (2, 30);")
+            .await
+            .unwrap();
+        // plain queries are not cached by default
+        db.run("select b from t").await.unwrap();
+        assert_eq!(db.plan_cache_stats().misses, 0);
+
+        let stmt = db.prepare("select b from t where a = $1").unwrap();
+        // the second value shows that the plan does not depend on it, later values reuse it
+        for (value, rows) in [(2, 2), (2, 2), (1, 1), (3, 0), (2, 2)] {
+            let output = db
+                .execute_prepared(&stmt, &[DataValue::Int32(value)])
+                .await
+                .unwrap();
+            assert_eq!(row_count(&output), rows);
+        }
+        let stats = db.plan_cache_stats();
+        assert_eq!((stats.hits, stats.misses, stats.size), (3, 2, 1));
+
+        // a catalog change invalidates the cached plans
+        db.run("create table u (c int)").await.unwrap();
+        db.execute_prepared(&stmt, &[DataValue::Int32(1)])
+            .await
+            .unwrap();
+        let stats = db.plan_cache_stats();
+        assert_eq!((stats.hits, stats.invalidations), (3, 1));
+
+        db.set_cache_queries(true);
+        db.run("select b from t").await.unwrap();
+        db.run("select b from t").await.unwrap();
+        assert_eq!(db.plan_cache_stats().hits, 5);
+
+        db.set_plan_cache_capacity(0);
+        db.execute_prepared(&stmt, &[DataValue::Int32(1)])
+            .await
+            .unwrap();
+        assert_eq!(db.plan_cache_stats().size, 0);
+    }
+
+    #[tokio::test]
+    async fn profiled_prepared_statements_add_to_the_counters() {
+        let db = Database::new_in_memory();
+        db.run("create table t (a int); insert into t values (1), (2);")
+            .await
+            .unwrap();
+        let stmt = db.prepare("select a from t where a = $1").unwrap();
+        for value in [1, 2] {
+            let (output, profile) = db
+                .execute_prepared_profiled(&stmt, &[DataValue::Int32(value)])
+                .await
+                .unwrap();
+            assert_eq!(row_count(&output), 1);
+            assert_eq!(profile.statements.len(), 1);
+        }
+        db.run_profiled("select a from t").await.unwrap();
+
+        let counters = db.profile_counters();
+        assert_eq!((counters.queries, counters.statements), (3, 3));
+        // unprofiled executions are not counted
+        db.execute_prepared(&stmt, &[DataValue::Int32(1)])
+            .await
+            .unwrap();
+        assert_eq!(db.profile_counters().queries, 3);
+    }
+
+    #[tokio::test]
+    async fn run_stream_stops_when_dropped() {
+        let db = Database::new_in_memory();
+        db.run("create table t (a int)").await.unwrap();
+        for _ in 0..3 {
+            db.run("insert into t values (1), (2)").await.unwrap();
+        }
+        // the statements before the last one run to completion
+        let mut stream = db
+            .run_stream("insert into t values (3); select a from t")
+            .await
+            .unwrap();
+        let chunk = stream.next().await.unwrap().unwrap();
+        assert!(chunk.cardinality() > 0);
+        // dropping the stream cancels the scan, the table can be written again
+        drop(stream);
+        db.run("insert into t values (4)").await.unwrap();
+        let rows = db.run("select a from t").await.unwrap();
+        assert_eq!(row_count(&rows), 8);
+
+        let mut stream = db.run_stream("").await.unwrap();
+        assert!(stream.next().await.is_none());
+    }
 
     #[test]
     fn test_completion() {
@@ -50,19 +50,48 @@ impl AnalyzeExecutor {
 }
 
 /// A collection of profiling information for a query.
-#[derive(Default)]
+#[derive(Default, Clone)]
 pub struct Metrics {
+    names: HashMap<Id, String>,
     spans: HashMap<Id, TimeSpan>,
     rows: HashMap<Id, Counter>,
 }
 
+/// The profiling information of one operator.
+#[derive(Debug, Clone)]
+pub struct OperatorMetrics {
+    pub id: usize,
+    pub name: String,
+    /// The time spent polling the operator.
+    pub time: Duration,
+    /// The number of rows it produced.
+    pub rows: u64,
+}
+
 impl Metrics {
     /// Register metrics for a node.
-    pub fn register(&mut self, id: Id, span: TimeSpan, rows: Counter) {
+    pub fn register(&mut self, id: Id, name: String, span: TimeSpan, rows: Counter) {
+        self.names.insert(id, name);
         self.spans.insert(id, span);
         self.rows.insert(id, rows);
     }
 
+    /// Get the metrics of all operators, ordered by node id.
+    pub fn operators(&self) -> Vec<OperatorMetrics> {
+        let mut operators = self
+            .names
+            .iter()
+            .map(|(&id, name)| OperatorMetrics {
+                id: usize::from(id),
+                name: name.clone(),
+                time: self.get_time(id),
+                rows: self.get_rows(id),
+            })
+            .collect_vec();
+        operators.sort_by_key(|op| op.id);
+        operators
+    }
+
     /// Get the running time for a node.
     pub fn get_time(&self, id: Id) -> Duration {
         self.spans.get(&id).map(|span| span.busy_time()).unwrap()
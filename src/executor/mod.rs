@@ -24,6 +24,7 @@ use tracing::Instrument;
 
 // use minitrace::prelude::*;
 use self::analyze::*;
+pub use self::analyze::{Metrics, OperatorMetrics};
 use self::copy_from_file::*;
 use self::copy_to_file::*;
 use self::create_function::*;
@@ -106,6 +107,15 @@ pub fn build(optimizer: Optimizer, storage: Arc<impl Storage>, plan: &RecExpr) -
     Builder::new(optimizer, storage, plan).build()
 }
 
+/// Builds the executor together with the metrics of its operators, filled in as it runs.
+pub fn build_with_metrics(
+    optimizer: Optimizer,
+    storage: Arc<impl Storage>,
+    plan: &RecExpr,
+) -> (BoxedExecutor, Metrics) {
+    Builder::new(optimizer, storage, plan).build_with_metrics()
+}
+
 /// The builder of executor.
 struct Builder<S: Storage> {
     storage: Arc<S>,
@@ -202,6 +212,12 @@ impl<S: Storage> Builder<S> {
         self.build_id(self.root)
     }
 
+    /// Builds the executor and returns the metrics of its operators.
+    fn build_with_metrics(mut self) -> (BoxedExecutor, Metrics) {
+        let stream = self.build_id(self.root);
+        (stream, std::mem::take(&mut self.metrics))
+    }
+
     /// Builds the executor and returns its subscriber.
     fn build_subscriber(mut self) -> StreamSubscriber {
         self.build_id_subscriber(self.root)
@@ -524,7 +540,7 @@ impl<S: Storage> Builder<S> {
         let output_row_counter = Counter::default();
 
         self.metrics
-            .register(id, span.clone(), output_row_counter.clone());
+            .register(id, name.clone(), span.clone(), output_row_counter.clone());
 
         let (tx, rx) = async_broadcast::broadcast(16);
         let handle = tokio::task::Builder::default()
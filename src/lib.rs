@@ -55,7 +55,9 @@ pub mod utils;
 #[cfg(feature = "jemalloc")]
 use tikv_jemallocator::Jemalloc;
 
-pub use self::db::{Database, Error};
+pub use self::db::{
+    Database, Error, PreparedStatement, ProfileCounters, QueryProfile, StatementProfile,
+};
 
 /// Jemalloc can significantly improve performance compared to the default system allocator.
 #[cfg(feature = "jemalloc")]
@@ -7,7 +7,6 @@ use std::path::PathBuf;
 use std::path::Path;
 use std::sync::Arc;
 use std::time::{Duration, Instant};
-use std::io::Write;
 
 use anyhow::{anyhow, Result};
 use async_trait::async_trait;
@@ -15,6 +14,7 @@ use clap::Parser;
 use humantime::format_duration;
 use itertools::Itertools;
 use risinglight::array::{datachunk_to_sqllogictest_string, Chunk};
+use risinglight::planner::{StatsDetail, TelemetrySink};
 use risinglight::server::run_server;
 use risinglight::storage::SecondaryStorageOptions;
 use risinglight::utils::time::RoundingDuration;
@@ -40,6 +40,11 @@ struct Args {
     #[clap(short, long)]
     file: Option<String>,
 
+    /// How much of the e-graph is inspected for the optimizer statistics of `--file`:
+    /// `counts`, `histogram` or `full`.
+    #[clap(long, default_value = "full")]
+    stats_detail: StatsDetail,
+
     /// Control the output format
     /// - `text`: plain text
     /// - `human`: human readable format
@@ -305,22 +310,38 @@ async fn run_sqllogictest(db: Database, path: &str, output_format: Option<String
     Ok(())
 }
 
+/// Flushes the telemetry sink when dropped, so the reports are written on every exit path.
+struct FlushTelemetry(Option<TelemetrySink>);
+
+impl Drop for FlushTelemetry {
+    fn drop(&mut self) {
+        if let Some(telemetry) = &self.0 {
+            telemetry.flush();
+        }
+    }
+}
+
 #[tokio::main]
 async fn main() -> Result<()> {
     let args = Args::parse();
 
-    if let Some(ref file_path) = args.file {
+    // As estatísticas do optimizer de cada query são guardadas em src/planner/outputs
+    let telemetry = if let Some(ref file_path) = args.file {
         println!("O caminho do arquivo é: {}", file_path);
-        let temp_file_path = "temp_file_path.txt";
-        let mut file = File::create(temp_file_path).expect("Falha ao criar o ficheiro temporário");
-        // Escrever o caminho do arquivo no ficheiro temporário
-        writeln!(file, "{}", file_path).expect("Falha ao escrever no ficheiro temporário");
-
+        let query = Path::new(file_path)
+            .file_stem()
+            .unwrap_or_default()
+            .to_string_lossy();
+        Some(
+            TelemetrySink::new(TelemetrySink::DEFAULT_OUTPUT_DIR, &query)
+                .with_detail(args.stats_detail),
+        )
     }
     else {
         println!("Nenhum arquivo foi passado como argumento");
-    }
-
+        None
+    };
+    let _flush_telemetry = FlushTelemetry(telemetry.clone());
 
 
     if args.tokio_console {
@@ -348,6 +369,7 @@ async fn main() -> Result<()> {
         options.path = PathBuf::new().join(args.filename);
         Database::new_on_disk(options).await
     };
+    db.set_telemetry(telemetry);
 
     if let Some(file) = args.file {
         if file.ends_with(".sql") {
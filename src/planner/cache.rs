@@ -0,0 +1,320 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! A least-recently-used cache of optimized plans.
+
+use std::collections::HashMap;
+
+use super::{Expr, RecExpr, Statistics};
+use crate::types::{DataType, DataValue};
+
+/// The key of a cached plan: the statement text and the types of its parameters.
+pub type PlanCacheKey = (String, Vec<DataType>);
+
+/// An LRU cache of optimized plans, invalidated by catalog and statistics changes.
+///
+/// Parameters are bound as constants, so the optimizer may fold them into the plan. An entry
+/// starts as a plan for the values it was optimized with. When the statement is optimized again
+/// with other values and the two plans only differ in the parameter constants, the plan is
+/// marked generic and from then on reused for any values by substituting the constants.
+///
+/// Each entry remembers the catalog version and the storage statistics it was planned against,
+/// and is dropped when looked up under different ones. Eviction scans for the least recently
+/// used entry, which is cheap for the small capacities a plan cache is meant for.
+pub struct PlanCache {
+    capacity: usize,
+    entries: HashMap<PlanCacheKey, Entry>,
+    /// A logical clock, advanced on every access.
+    tick: u64,
+    stats: PlanCacheStats,
+}
+
+struct Entry {
+    plan: RecExpr,
+    /// The parameter values the plan was optimized with.
+    params: Vec<DataValue>,
+    /// Whether the plan was found not to depend on the parameter values.
+    generic: bool,
+    catalog_version: u64,
+    statistics: Statistics,
+    last_used: u64,
+}
+
+/// Counters of a [`PlanCache`].
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq)]
+pub struct PlanCacheStats {
+    pub hits: u64,
+    pub misses: u64,
+    /// Entries dropped to make room for new ones.
+    pub evictions: u64,
+    /// Entries dropped because the catalog or the statistics changed.
+    pub invalidations: u64,
+    pub size: usize,
+    pub capacity: usize,
+}
+
+impl Default for PlanCache {
+    fn default() -> Self {
+        Self::new(Self::DEFAULT_CAPACITY)
+    }
+}
+
+impl PlanCache {
+    pub const DEFAULT_CAPACITY: usize = 128;
+
+    /// Create a cache holding at most `capacity` plans. A capacity of 0 disables caching.
+    pub fn new(capacity: usize) -> Self {
+        PlanCache {
+            capacity,
+            entries: HashMap::new(),
+            tick: 0,
+            stats: PlanCacheStats::default(),
+        }
+    }
+
+    /// Look up a plan for the given parameter values, made under the given catalog version and
+    /// statistics.
+    pub fn get(
+        &mut self,
+        key: &PlanCacheKey,
+        params: &[DataValue],
+        catalog_version: u64,
+        statistics: &Statistics,
+    ) -> Option<RecExpr> {
+        self.tick += 1;
+        match self.entries.get_mut(key) {
+            Some(entry)
+                if entry.catalog_version == catalog_version && entry.statistics == *statistics =>
+            {
+                let plan = if entry.params == params {
+                    entry.plan.clone()
+                } else if entry.generic {
+                    substitute(&entry.plan, &entry.params, params)
+                } else {
+                    self.stats.misses += 1;
+                    return None;
+                };
+                entry.last_used = self.tick;
+                self.stats.hits += 1;
+                Some(plan)
+            }
+            Some(_) => {
+                self.entries.remove(key);
+                self.stats.invalidations += 1;
+                self.stats.misses += 1;
+                None
+            }
+            None => {
+                self.stats.misses += 1;
+                None
+            }
+        }
+    }
+
+    /// Insert a plan optimized with the given parameter values under the given catalog version
+    /// and statistics, evicting the least recently used plan if the cache is full.
+    ///
+    /// The plan replaces the one cached for other values, and is generic if the two only differ
+    /// in the parameter constants.
+    pub fn insert(
+        &mut self,
+        key: PlanCacheKey,
+        params: Vec<DataValue>,
+        plan: RecExpr,
+        catalog_version: u64,
+        statistics: Statistics,
+    ) {
+        if self.capacity == 0 {
+            return;
+        }
+        self.tick += 1;
+        let generic = match self.entries.get(&key) {
+            Some(entry)
+                if entry.catalog_version == catalog_version && entry.statistics == statistics =>
+            {
+                entry.generic || is_generic(&entry.plan, &entry.params, &plan, &params)
+            }
+            Some(_) => false,
+            None => {
+                self.shrink_to(self.capacity - 1);
+                false
+            }
+        };
+        self.entries.insert(
+            key,
+            Entry {
+                plan,
+                params,
+                generic,
+                catalog_version,
+                statistics,
+                last_used: self.tick,
+            },
+        );
+    }
+
+    /// Remove all plans.
+    pub fn clear(&mut self) {
+        self.entries.clear();
+    }
+
+    /// Change the capacity, evicting plans that no longer fit.
+    pub fn set_capacity(&mut self, capacity: usize) {
+        self.capacity = capacity;
+        self.shrink_to(capacity);
+    }
+
+    /// Returns the counters and the current size of the cache.
+    pub fn stats(&self) -> PlanCacheStats {
+        PlanCacheStats {
+            size: self.entries.len(),
+            capacity: self.capacity,
+            ..self.stats
+        }
+    }
+
+    fn shrink_to(&mut self, size: usize) {
+        while self.entries.len() > size {
+            let lru = self
+                .entries
+                .iter()
+                .min_by_key(|(_, entry)| entry.last_used)
+                .map(|(key, _)| key.clone())
+                .unwrap();
+            self.entries.remove(&lru);
+            self.stats.evictions += 1;
+        }
+    }
+}
+
+/// Replace the constants equal to the parameter values `from` with the values `to`.
+fn substitute(plan: &RecExpr, from: &[DataValue], to: &[DataValue]) -> RecExpr {
+    let nodes = plan.as_ref().iter().map(|node| match node {
+        Expr::Constant(value) => match from.iter().position(|v| v == value) {
+            Some(i) => Expr::Constant(to[i].clone()),
+            None => node.clone(),
+        },
+        _ => node.clone(),
+    });
+    nodes.collect::<Vec<_>>().into()
+}
+
+/// Returns true if two plans of a statement, optimized with different values of every
+/// parameter, only differ in the parameter constants.
+///
+/// Substituting in both directions fails if a parameter was folded away or if other constants
+/// of the plan are equal to a parameter value, so the constants left to substitute are those of
+/// the parameters.
+fn is_generic(
+    plan1: &RecExpr,
+    params1: &[DataValue],
+    plan2: &RecExpr,
+    params2: &[DataValue],
+) -> bool {
+    let distinct = |params: &[DataValue]| {
+        let mut values = params.iter().enumerate();
+        values.all(|(i, v)| !v.is_null() && !params[..i].contains(v))
+    };
+    params1.len() == params2.len()
+        && params1.iter().zip(params2).all(|(v1, v2)| v1 != v2)
+        && distinct(params1)
+        && distinct(params2)
+        && substitute(plan1, params1, params2).to_string() == plan2.to_string()
+        && substitute(plan2, params2, params1).to_string() == plan1.to_string()
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::catalog::TableRefId;
+
+    fn key(sql: &str) -> PlanCacheKey {
+        (sql.to_string(), vec![])
+    }
+
+    fn stat() -> Statistics {
+        Statistics::default()
+    }
+
+    /// The key of a statement with one INT parameter.
+    fn int_key() -> PlanCacheKey {
+        ("select".to_string(), vec![DataType::Int32])
+    }
+
+    fn insert_int(cache: &mut PlanCache, value: i32, plan: &str) {
+        let params = vec![DataValue::Int32(value)];
+        cache.insert(int_key(), params, plan.parse().unwrap(), 0, stat());
+    }
+
+    fn get_int(cache: &mut PlanCache, value: i32) -> Option<String> {
+        let plan = cache.get(&int_key(), &[DataValue::Int32(value)], 0, &stat());
+        plan.map(|plan| plan.to_string())
+    }
+
+    #[test]
+    fn evict_least_recently_used() {
+        let mut cache = PlanCache::new(2);
+        cache.insert(key("a"), vec![], RecExpr::default(), 0, stat());
+        cache.insert(key("b"), vec![], RecExpr::default(), 0, stat());
+        assert!(cache.get(&key("a"), &[], 0, &stat()).is_some());
+        cache.insert(key("c"), vec![], RecExpr::default(), 0, stat());
+        assert!(cache.get(&key("b"), &[], 0, &stat()).is_none());
+        assert!(cache.get(&key("a"), &[], 0, &stat()).is_some());
+        assert!(cache.get(&key("c"), &[], 0, &stat()).is_some());
+
+        let stats = cache.stats();
+        assert_eq!((stats.hits, stats.misses, stats.evictions), (3, 1, 1));
+        assert_eq!((stats.size, stats.capacity), (2, 2));
+    }
+
+    #[test]
+    fn invalidate_on_catalog_change() {
+        let mut cache = PlanCache::new(2);
+        cache.insert(key("a"), vec![], RecExpr::default(), 0, stat());
+        assert!(cache.get(&key("a"), &[], 1, &stat()).is_none());
+        assert!(cache.get(&key("a"), &[], 0, &stat()).is_none());
+        assert_eq!(cache.stats().invalidations, 1);
+    }
+
+    #[test]
+    fn invalidate_on_statistics_change() {
+        let mut cache = PlanCache::new(2);
+        cache.insert(key("a"), vec![], RecExpr::default(), 0, stat());
+        let mut grown = stat();
+        grown.add_row_count(TableRefId::new(0, 0), 1000);
+        assert!(cache.get(&key("a"), &[], 0, &grown).is_none());
+        assert!(cache.get(&key("a"), &[], 0, &stat()).is_none());
+        assert_eq!(cache.stats().invalidations, 1);
+    }
+
+    #[test]
+    fn reuse_generic_plans_for_other_values() {
+        let mut cache = PlanCache::new(2);
+        insert_int(&mut cache, 1, "(and (= a 1) (> b 10))");
+        assert!(get_int(&mut cache, 1).is_some());
+        // whether the plan depends on the value is only known once optimized again
+        assert!(get_int(&mut cache, 2).is_none());
+        insert_int(&mut cache, 2, "(and (= a 2) (> b 10))");
+
+        for value in [3, 4] {
+            let plan = format!("(and (= a {value}) (> b 10))");
+            assert_eq!(get_int(&mut cache, value), Some(plan));
+        }
+        let stats = cache.stats();
+        assert_eq!((stats.hits, stats.misses, stats.size), (3, 1, 1));
+    }
+
+    #[test]
+    fn optimize_value_dependent_plans_again() {
+        let mut cache = PlanCache::new(2);
+        // the value was folded away
+        insert_int(&mut cache, 1, "(= a 2)");
+        insert_int(&mut cache, 2, "(= a 3)");
+        assert!(get_int(&mut cache, 3).is_none());
+        // another constant of the plan is equal to one of the values
+        insert_int(&mut cache, 1, "(and (= a 1) (> b 2))");
+        insert_int(&mut cache, 2, "(and (= a 2) (> b 2))");
+        assert!(get_int(&mut cache, 3).is_none());
+        // the plan of the last values is kept
+        assert!(get_int(&mut cache, 2).is_some());
+    }
+}
@@ -8,14 +8,23 @@ use crate::catalog::{ColumnRefId, TableRefId};
 use crate::parser::{BinaryOperator, UnaryOperator};
 use crate::types::{ColumnIndex, DataType, DataValue, DateTimeField};
 
+mod cache;
 mod cost;
 mod explain;
 mod optimizer;
+mod report;
 mod rules;
+mod scheduler;
+mod telemetry;
 
+pub use cache::{PlanCache, PlanCacheKey, PlanCacheStats};
 pub use explain::Explain;
-pub use optimizer::{Config, Optimizer};
+pub use optimizer::{Config, Optimizer, StageParams};
+pub use report::{
+    ClassReport, IterationReport, OptimizerReport, RuleTiming, StageReport, StatsDetail,
+};
 pub use rules::{ExprAnalysis, Statistics, TypeError, TypeSchemaAnalysis};
+pub use telemetry::TelemetrySink;
 
 // Alias types for our language.
 type EGraph = egg::EGraph<Expr, ExprAnalysis>;
@@ -0,0 +1,221 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! In-memory statistics of an optimizer run.
+//!
+//! These are the records behind the CSV files under `src/planner/outputs`, returned by
+//! [`Optimizer::optimize_with_report`](super::Optimizer::optimize_with_report) without any
+//! file I/O.
+
+use std::collections::HashMap;
+use std::fmt;
+use std::str::FromStr;
+use std::time::Duration;
+
+/// How much of the e-graph is inspected for the statistics of a stage.
+///
+/// Each level includes the ones before it.
+#[derive(Debug, Clone, Copy, Default, PartialEq, Eq, PartialOrd, Ord)]
+pub enum StatsDetail {
+    /// The counters maintained by egg (classes, e-nodes, merges), the cost, the relational
+    /// operators of the best expression and the rules applied. The e-classes are not visited.
+    Counts,
+    /// Also the e-node count of every class and their min, max and average, but not the e-nodes.
+    Histogram,
+    /// Also the e-nodes of every class and the best expression.
+    #[default]
+    Full,
+}
+
+/// The statistics of one optimizer run.
+#[derive(Debug, Clone, Default)]
+pub struct OptimizerReport {
+    /// The detail of the statistics in each stage, `None` when each stage only holds its cost,
+    /// peak e-graph size and time.
+    pub detail: Option<StatsDetail>,
+    /// Stage 0 (the unoptimized plan) to stage 3.
+    pub stages: Vec<StageReport>,
+}
+
+/// The e-graph and the best expression at the end of a stage.
+#[derive(Debug, Clone, Default)]
+pub struct StageReport {
+    pub stage: usize,
+    /// The cost of the best expression, `f32::MAX` in stage 0.
+    pub cost: f32,
+    /// The cost of the expression the last egg runner of the stage started from. 0 in stage 0.
+    pub input_cost: f32,
+    /// The number of relational operators in the best expression.
+    pub relational_nodes: usize,
+    pub classes: usize,
+    /// The fewest, most and average e-nodes per class, zero below [`StatsDetail::Histogram`].
+    pub min_nodes: usize,
+    pub max_nodes: usize,
+    pub avg_nodes: f64,
+    /// The number of merges done by egg.
+    pub merge_count: usize,
+    /// The total number of e-nodes.
+    pub egraph_size: usize,
+    /// The most e-nodes in the e-graph of any egg runner of the stage, whatever the detail.
+    pub peak_nodes: usize,
+    /// Empty below [`StatsDetail::Histogram`].
+    pub class_details: Vec<ClassReport>,
+    /// The internal iterations of the last egg runner of the stage. Empty in stage 0.
+    pub iterations: Vec<IterationReport>,
+    /// The best expression, in `Debug` form. Empty below [`StatsDetail::Full`].
+    pub expression: String,
+    pub time: Duration,
+}
+
+/// The e-nodes of an e-class.
+#[derive(Debug, Clone, Default)]
+pub struct ClassReport {
+    pub class_id: usize,
+    pub node_count: usize,
+    /// The e-nodes in `Debug` form. Empty below [`StatsDetail::Full`].
+    pub nodes: Vec<String>,
+}
+
+/// One internal iteration of an egg runner.
+#[derive(Debug, Clone, Default)]
+pub struct IterationReport {
+    /// The size of the e-graph at the start of the iteration.
+    pub classes: usize,
+    pub nodes: usize,
+    /// The number of applications of each rule.
+    pub applied: Vec<(String, usize)>,
+    /// The time egg spent searching, applying and rebuilding, over all rules.
+    pub search_time: Duration,
+    pub apply_time: Duration,
+    pub rebuild_time: Duration,
+    /// The rules searched in the iteration, in search order.
+    pub rules: Vec<RuleTiming>,
+}
+
+/// The work of one rule in one internal iteration of an egg runner.
+#[derive(Debug, Clone, Default)]
+pub struct RuleTiming {
+    pub rule: String,
+    /// The number of matches found by the search.
+    pub matches: usize,
+    /// The number of matches that changed the e-graph.
+    pub applications: usize,
+    pub search_time: Duration,
+    pub apply_time: Duration,
+}
+
+impl StatsDetail {
+    /// Returns the name of the level, as parsed by [`FromStr`].
+    pub fn as_str(self) -> &'static str {
+        match self {
+            StatsDetail::Counts => "counts",
+            StatsDetail::Histogram => "histogram",
+            StatsDetail::Full => "full",
+        }
+    }
+}
+
+impl fmt::Display for StatsDetail {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.write_str(self.as_str())
+    }
+}
+
+impl FromStr for StatsDetail {
+    type Err = String;
+
+    fn from_str(s: &str) -> Result<Self, Self::Err> {
+        match s {
+            "counts" => Ok(StatsDetail::Counts),
+            "histogram" => Ok(StatsDetail::Histogram),
+            "full" => Ok(StatsDetail::Full),
+            _ => Err(format!(
+                "invalid statistics detail {s:?}, expected \"counts\", \"histogram\" or \"full\""
+            )),
+        }
+    }
+}
+
+impl OptimizerReport {
+    /// Returns the report of the given stage.
+    pub fn stage(&self, stage: usize) -> Option<&StageReport> {
+        self.stages.iter().find(|report| report.stage == stage)
+    }
+
+    /// Returns the cost of the final plan.
+    pub fn cost(&self) -> f32 {
+        self.stages.last().map_or(f32::MAX, |stage| stage.cost)
+    }
+
+    /// Returns the most e-nodes in any e-graph of the run.
+    pub fn peak_nodes(&self) -> usize {
+        self.stages
+            .iter()
+            .map(|stage| stage.peak_nodes)
+            .max()
+            .unwrap_or_default()
+    }
+
+    /// Returns the wall time of all stages.
+    pub fn time(&self) -> Duration {
+        self.stages.iter().map(|stage| stage.time).sum()
+    }
+}
+
+impl StageReport {
+    /// Returns the applications of each rule over all iterations, most applied first.
+    pub fn rule_applications(&self) -> Vec<(String, usize)> {
+        let mut applications: HashMap<&str, usize> = HashMap::new();
+        for iteration in &self.iterations {
+            for (rule, count) in &iteration.applied {
+                *applications.entry(rule).or_default() += count;
+            }
+        }
+        let mut applications: Vec<_> = applications
+            .into_iter()
+            .map(|(rule, count)| (rule.to_string(), count))
+            .collect();
+        applications.sort_by(|a, b| b.1.cmp(&a.1).then_with(|| a.0.cmp(&b.0)));
+        applications
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn rule_applications_are_summed_and_ranked() {
+        let iteration = |applied: &[(&str, usize)]| IterationReport {
+            applied: applied.iter().map(|(r, c)| (r.to_string(), *c)).collect(),
+            ..Default::default()
+        };
+        let report = StageReport {
+            iterations: vec![
+                iteration(&[("and-comm", 2), ("join-swap", 1)]),
+                iteration(&[("join-swap", 3), ("add-comm", 2)]),
+            ],
+            ..Default::default()
+        };
+        assert_eq!(
+            report.rule_applications(),
+            vec![
+                ("join-swap".to_string(), 4),
+                ("add-comm".to_string(), 2),
+                ("and-comm".to_string(), 2),
+            ]
+        );
+    }
+
+    #[test]
+    fn stats_detail_names_round_trip() {
+        for detail in [
+            StatsDetail::Counts,
+            StatsDetail::Histogram,
+            StatsDetail::Full,
+        ] {
+            assert_eq!(detail.to_string().parse(), Ok(detail));
+        }
+        assert!("all".parse::<StatsDetail>().is_err());
+        assert!(StatsDetail::Counts < StatsDetail::Histogram);
+    }
+}
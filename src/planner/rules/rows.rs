@@ -96,7 +96,7 @@ pub fn analyze_rows(egraph: &EGraph, enode: &Expr) -> Rows {
 const DEFAULT_ROW_COUNT: u32 = 1000;
 
 /// Statistic from storage for row estimation.
-#[derive(Debug, Clone, Default)]
+#[derive(Debug, Clone, Default, PartialEq)]
 pub struct Statistics {
     row_counts: HashMap<TableRefId, u32>,
     distinct_values: HashMap<ColumnRefId, u32>,
@@ -0,0 +1,97 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! A rewrite scheduler that times each rule.
+
+use std::cell::RefCell;
+use std::rc::Rc;
+use std::time::Instant;
+
+use egg::{BackoffScheduler, RewriteScheduler, SearchMatches};
+
+use super::report::RuleTiming;
+use super::{EGraph, Expr, ExprAnalysis, Rewrite};
+
+/// The timings of each rule, by internal iteration of the runner.
+pub type RuleTimings = Rc<RefCell<Vec<Vec<RuleTiming>>>>;
+
+/// egg's default [`BackoffScheduler`], recording the search and apply time of each rule.
+///
+/// The runner owns its scheduler, so the timings are read through the handle returned by
+/// [`TimedScheduler::new`].
+pub struct TimedScheduler {
+    inner: BackoffScheduler,
+    timings: RuleTimings,
+}
+
+impl TimedScheduler {
+    pub fn new() -> (Self, RuleTimings) {
+        let timings = RuleTimings::default();
+        let scheduler = TimedScheduler {
+            inner: BackoffScheduler::default(),
+            timings: timings.clone(),
+        };
+        (scheduler, timings)
+    }
+
+    fn update(&self, iteration: usize, rewrite: &Rewrite, f: impl FnOnce(&mut RuleTiming)) {
+        let mut timings = self.timings.borrow_mut();
+        if timings.len() <= iteration {
+            timings.resize_with(iteration + 1, Vec::new);
+        }
+        let rules = &mut timings[iteration];
+        let rule = rewrite.name.as_str();
+        let index = match rules.iter().position(|timing| timing.rule == rule) {
+            Some(index) => index,
+            None => {
+                rules.push(RuleTiming {
+                    rule: rule.to_string(),
+                    ..Default::default()
+                });
+                rules.len() - 1
+            }
+        };
+        f(&mut rules[index]);
+    }
+}
+
+impl RewriteScheduler<Expr, ExprAnalysis> for TimedScheduler {
+    fn can_stop(&mut self, iteration: usize) -> bool {
+        self.inner.can_stop(iteration)
+    }
+
+    fn search_rewrite<'a>(
+        &mut self,
+        iteration: usize,
+        egraph: &EGraph,
+        rewrite: &'a Rewrite,
+    ) -> Vec<SearchMatches<'a, Expr>> {
+        let start = Instant::now();
+        let matches = self.inner.search_rewrite(iteration, egraph, rewrite);
+        let elapsed = start.elapsed();
+        let count = matches.iter().map(|m| m.substs.len()).sum::<usize>();
+        self.update(iteration, rewrite, |timing| {
+            timing.search_time += elapsed;
+            timing.matches += count;
+        });
+        matches
+    }
+
+    fn apply_rewrite(
+        &mut self,
+        iteration: usize,
+        egraph: &mut EGraph,
+        rewrite: &Rewrite,
+        matches: Vec<SearchMatches<Expr>>,
+    ) -> usize {
+        let start = Instant::now();
+        let applied = self
+            .inner
+            .apply_rewrite(iteration, egraph, rewrite, matches);
+        let elapsed = start.elapsed();
+        self.update(iteration, rewrite, |timing| {
+            timing.apply_time += elapsed;
+            timing.applications += applied;
+        });
+        applied
+    }
+}
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the analysis scripts.
+
+Generates a synthetic outputs tree (synthetic_outputs.py) of the requested
+size, then times the load, transform and render phases of each script
+against it. Every benchmark runs in a fresh process with cold loader
+caches, so the peak resident memory (ru_maxrss) reported after each phase
+belongs to that benchmark alone; "baseline" is the process after its
+imports, before any data is read.
+
+Results can be appended to a CSV (--output) and compared against an
+earlier results file (--baseline) to flag phases that got slower.
+
+Run from the repository root:
+    python3 src/planner/script/benchmark.py --queries 200 --output bench.csv
+    python3 src/planner/script/benchmark.py --queries 200 --baseline bench.csv
+"""
+
+import argparse
+import contextlib
+import csv
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import synthetic_outputs
+
+RESULT_FIELDS = ["Timestamp", "Benchmark", "Phase", "Seconds", "Peak_RSS_MB", "Queries", "Scale"]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if platform.system() == "Darwin" else peak / 1024
+
+
+def _benchmarks():
+    """
+    {name: [(phase, callable)]}. Each callable receives the previous
+    phase's result. Imported lazily, inside the benchmark process.
+    """
+    import classes_data_extractor
+    import columnar
+    import expr_lines_extracter
+    import expressions
+    import extractor
+    import global_query
+    import graphics
+    import loader
+    import operator_counts
+    import pipeline
+    import rule_efficiency
+    import rule_mostpop
+    import rulesInfo_histogram
+
+    benchmarks = {
+        "loader": [
+            ("load", lambda _: loader.load_all()),
+        ],
+        "extract": [
+            ("load", lambda _: loader.load("query_data")),
+            ("transform", lambda _: (
+                extractor.process_all_queries(),
+                expr_lines_extracter.process_all_queries(),
+                classes_data_extractor.process_all_queries(),
+            )),
+        ],
+        "graphics": [
+            ("load", lambda _: loader.load("filtered_query_data")),
+            ("render", lambda _: graphics.process_all_files()),
+        ],
+        "expressions": [
+            ("load", lambda _: loader.load("filtered_query_data")),
+            ("render", lambda _: expressions.process_all_files()),
+        ],
+        "global_query": [
+            ("transform", lambda _: global_query.calculate_cost_differences()),
+            ("render", lambda differences: global_query.plot_cost_reduction(differences)),
+        ],
+        "classes_histogram": [
+            ("load", lambda _: loader.load("data_classes")),
+            ("transform", lambda _: operator_counts.load_counts(force=True)),
+            ("render", lambda _: pipeline.classes_histogram.process_all_queries()),
+        ],
+        "egg_merges": [
+            ("render", lambda _: pipeline.egg_merges.process_all_queries()),
+        ],
+        "rule_mostpop": [
+            ("load", lambda _: loader.load("rules_stats")),
+            ("render", lambda _: rule_mostpop.process_all_queries()),
+        ],
+        "rules_heatmap": [
+            ("load", lambda _: loader.list_queries("rules_data")),
+            ("transform", lambda queries: [rulesInfo_histogram.aggregate_rule_files(query) for query in queries]),
+            ("render", lambda _: rulesInfo_histogram.process_all_queries()),
+        ],
+        "rule_efficiency": [
+            ("load", lambda _: rule_efficiency.load_timings()),
+            ("transform", lambda timings: rule_efficiency.rank_rules(timings)),
+        ],
+    }
+    if columnar.pa is not None:
+        benchmarks["columnar"] = [
+            ("transform", lambda _: columnar.export("benchmark")),
+            ("load", lambda _: columnar.read("query_data", run="benchmark")),
+        ]
+    return benchmarks
+
+
+def benchmark_names():
+    return ["loader", "extract", "graphics", "expressions", "global_query", "classes_histogram",
+            "egg_merges", "rule_mostpop", "rules_heatmap", "rule_efficiency", "columnar"]
+
+
+def _run_benchmark(name, root, render_settings, verbose, results):
+    """Body of one benchmark process: run the phases, report [(phase, seconds, peak MB)]."""
+    try:
+        os.chdir(root)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import manifest
+        import rendering
+
+        manifest.set_force(True)
+        rendering.configure(**render_settings)
+        phases = _benchmarks().get(name)
+        if phases is None:
+            results.put((name, None, f"benchmark {name} is not available (optional dependency missing?)"))
+            return
+
+        timings = [("baseline", 0.0, _peak_rss_mb())]
+        value = None
+        with open(os.devnull, "w") as devnull:
+            quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+            with quiet:
+                for phase, func in phases:
+                    start = time.perf_counter()
+                    value = func(value)
+                    timings.append((phase, time.perf_counter() - start, _peak_rss_mb()))
+        results.put((name, timings, None))
+    except Exception:
+        results.put((name, None, traceback.format_exc()))
+
+
+def _wait_for_result(process, results, poll=1.0):
+    """
+    (timings, error) of a benchmark process. A process that dies without a
+    result, e.g. killed by the OOM killer, fails with its exit code instead
+    of leaving the parent waiting forever.
+    """
+    result = None
+    while result is None and process.is_alive():
+        try:
+            result = results.get(timeout=poll)
+        except queue.Empty:
+            pass
+    if result is None:
+        # the result may have been put just before the process exited
+        try:
+            result = results.get(timeout=poll)
+        except queue.Empty:
+            pass
+    process.join()
+    _, timings, error = result or (None, None, None)
+    if process.exitcode != 0:
+        status = "without a result" if result is None else "after its result"
+        return None, (error or "") + f"process exited with code {process.exitcode} {status}"
+    if result is None:
+        return None, "process exited without a result"
+    return timings, error
+
+
+def run_benchmarks(root, names, render_settings=None, verbose=False):
+    """
+    Run each benchmark in its own process against the outputs tree under
+    root. Returns {name: [(phase, seconds, peak MB)]} and prints failures.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        result_queue = context.Queue()
+        process = context.Process(
+            target=_run_benchmark,
+            args=(name, root, render_settings or {}, verbose, result_queue),
+        )
+        process.start()
+        timings, error = _wait_for_result(process, result_queue)
+        if error:
+            print(f"❌ Benchmark {name} failed:\n{error}")
+            continue
+        results[name] = timings
+        total = sum(seconds for _, seconds, _ in timings)
+        print(f"✅ {name}: {total:.2f}s, peak {timings[-1][2]:.0f} MB")
+    return results
+
+
+def print_results(results):
+    print("\n==============================================================")
+    print(f"{'Benchmark':<20}{'Phase':<12}{'Seconds':>12}{'Peak RSS (MB)':>16}")
+    for name, timings in results.items():
+        for phase, seconds, peak in timings:
+            print(f"{name:<20}{phase:<12}{seconds:>12.3f}{peak:>16.1f}")
+    print("==============================================================")
+
+
+def write_results(results, path, queries, scale):
+    """Append the results to a CSV, one row per benchmark phase."""
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    exists = os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if not exists:
+            writer.writerow(RESULT_FIELDS)
+        for name, timings in results.items():
+            for phase, seconds, peak in timings:
+                writer.writerow([timestamp, name, phase, f"{seconds:.4f}", f"{peak:.1f}", queries, scale])
+    print(f"✅ Results appended to: {path}")
+
+
+def compare_results(results, baseline_path, queries, scale, tolerance):
+    """
+    Compare against the latest run of the same size in a results CSV.
+    Returns the (benchmark, phase) pairs that got slower than tolerance.
+    """
+    latest = {}
+    with open(baseline_path, "r", newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            if int(row["Queries"]) == queries and row["Scale"] == scale:
+                latest[(row["Benchmark"], row["Phase"])] = float(row["Seconds"])
+
+    regressions = []
+    for name, timings in results.items():
+        for phase, seconds, _ in timings:
+            before = latest.get((name, phase))
+            # Sub-50ms phases are too noisy to judge
+            if before is None or max(before, seconds) < 0.05:
+                continue
+            change = (seconds - before) / before if before else float("inf")
+            marker = "⚠️" if change > tolerance else "  "
+            print(f"{marker} {name:<20}{phase:<12}{before:>10.3f}s -> {seconds:>8.3f}s ({change:+.0%})")
+            if change > tolerance:
+                regressions.append((name, phase))
+    return regressions
+
+
+def _scale_tag(args):
+    return (f"runs={args.runs},classes={args.classes},nodes={args.nodes_per_class},rules={args.rules},"
+            f"iters={args.iterations}x{args.internal_iterations},expr={args.expression_nodes},"
+            f"iter_files={not args.no_iteration_files},seed={args.seed},preview={args.preview}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis scripts on synthetic outputs")
+    synthetic_outputs.add_generator_arguments(parser)
+    parser.add_argument("--benchmarks", nargs="+", choices=benchmark_names(), default=benchmark_names())
+    parser.add_argument("--root", help="reuse or keep the synthetic tree in this directory (default: temporary)")
+    parser.add_argument("--output", help="append the results to this CSV")
+    parser.add_argument("--baseline", help="results CSV to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown flagged as a regression (0.2 = 20%%)")
+    parser.add_argument("--preview", action="store_true", help="render in preview mode (see rendering.py)")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix="planner-bench-")
+    try:
+        if not os.path.isdir(os.path.join(root, "src", "planner", "outputs")):
+            start = time.perf_counter()
+            synthetic_outputs.generate_from_args(root, args)
+            print(f"✅ Synthetic tree for {args.queries} queries generated in {time.perf_counter() - start:.1f}s")
+
+        results = run_benchmarks(root, args.benchmarks, {"preview": args.preview}, args.verbose)
+        print_results(results)
+
+        scale = _scale_tag(args)
+        regressions = []
+        if args.baseline:
+            regressions = compare_results(results, args.baseline, args.queries, scale, args.tolerance)
+        if args.output:
+            write_results(results, args.output, args.queries, scale)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} phase(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-import pandas as pd
 import os
-import glob
-import csv
 import sys
 
+import loader
+
 def extract_all_stages_classes(query_folder):
     output_dir = "src/planner/outputs/filtered_class_data/query_" + query_folder
     
@@ -21,27 +20,20 @@ def extract_all_stages_classes(query_folder):
         # Create output filename
         output_file = f"{output_dir}/stage{stage}_filtered.csv"
 
-        # Read CSV file
-        with open(input_file, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            header = next(reader)  # Store header
-            
-            # Extract only Class_ID and Node_Count columns
-            class_data = []
-            class_id_idx = header.index('Class_ID')
-            node_count_idx = header.index('Node_Count')
-            
-            for row in reader:
-                class_data.append([row[class_id_idx], row[node_count_idx]])
-
-        # Write filtered data to new file
-        with open(output_file, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Class_ID', 'Node_Count'])  # Write new header
-            writer.writerows(class_data)
+        # Read CSV file (shared cache) and keep only Class_ID and Node_Count
+        df = loader.read_class_data(query_folder, stage)
+        class_data = df[['Class_ID', 'Node_Count']]
+
+        # Write filtered data to new file (same CRLF rows as csv.writer)
+        class_data.to_csv(output_file, index=False, lineterminator='\r\n')
 
         print(f"✅ Stage {stage} class data saved to {output_file}")
 
+def process_all_queries():
+    for query_folder in loader.list_queries("data_classes"):
+        print(f"🔍 Extracting class data for query {query_folder}...")
+        extract_all_stages_classes(query_folder)
+
 def main():
     if len(sys.argv) <= 1:
         print("❌ No query folder provided (e.g., q1, q2)")
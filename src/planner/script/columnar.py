@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Optional columnar (Parquet) store for the optimizer telemetry.
+
+export() turns the scattered CSVs of one optimizer run into Parquet
+datasets under src/planner/outputs/columnar/<dataset>, hive-partitioned by
+run, query and stage (Run=.../Query=.../Stage=...) with typed columns.
+Several runs live side by side, so multi-run comparisons read one dataset
+instead of globbing thousands of small files.
+
+A run tagged like a sweep (sweep.py) is exported from its own directory,
+src/planner/outputs/runs/<run_id>. Otherwise the shared outputs tree is
+exported, and the files every run appends to only contribute their last
+run, as the charts read them.
+
+read() scans a dataset through pyarrow.dataset: partition and column
+filters are pushed down (whole directories are pruned) and files are
+memory-mapped. pyarrow is only needed for this module.
+
+Run from the repository root:
+    python3 src/planner/script/columnar.py export [--run NAME]
+    python3 src/planner/script/columnar.py runs
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import loader
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:  # optional dependency
+    pa = None
+
+COLUMNAR_DIR = os.path.join(loader.OUTPUTS_DIR, "columnar")
+
+RUNS_DIR = os.path.join(loader.OUTPUTS_DIR, "runs")
+
+# Datasets of loader.DATASETS that are exported
+EXPORTED_DATASETS = ["query_data", "data_classes", "egg_merges", "rules_data", "rules_stats", "expressions"]
+# Datasets appended to by every run, one record per stage; the others are
+# rewritten by each run, except the rules_stats of q15
+APPENDED_DATASETS = ["query_data", "egg_merges", "expressions"]
+RUN_STAGES = 4
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("the columnar store needs pyarrow: pip install pyarrow")
+
+
+def _partitioning():
+    return ds.partitioning(
+        pa.schema([("Run", pa.string()), ("Query", pa.string()), ("Stage", pa.int8())]),
+        flavor="hive",
+    )
+
+
+def _arrow_type(dtype):
+    # Categoricals are stored as strings; Parquet dictionary-encodes them anyway
+    return {
+        "int8": pa.int8(),
+        "int16": pa.int16(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+    }.get(dtype, pa.string())
+
+
+def _to_arrow(df, dtypes):
+    """Table with the column types of loader's schema, whatever pandas inferred."""
+    fields = []
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        if dtype is None:
+            arrow_type = pa.string() if column in ("Run", "Query") else pa.from_numpy_dtype(df[column].dtype)
+        else:
+            arrow_type = _arrow_type(dtype)
+        if arrow_type == pa.string():
+            df = df.assign(**{column: df[column].astype("string")})
+        fields.append(pa.field(column, arrow_type))
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+def dataset_path(dataset, columnar_dir=COLUMNAR_DIR):
+    return os.path.join(columnar_dir, dataset)
+
+
+def _last_ranking(df):
+    """The rows from the last rank 1 on: q15 appends a ranking per statement."""
+    starts = np.flatnonzero(df["Rank"].to_numpy() == 1)
+    return df.iloc[starts[-1]:].reset_index(drop=True) if len(starts) else df
+
+
+def _last_run(dataset, outputs_dir):
+    """
+    {(query, stage): DataFrame} of the records the latest run left in a
+    dataset of a shared outputs tree. Only the end of appended files is read.
+    """
+    if dataset not in APPENDED_DATASETS:
+        frames = loader.load(dataset, outputs_dir=outputs_dir)
+        if dataset == "rules_stats":
+            frames = {key: _last_ranking(df) for key, df in frames.items()}
+        return frames
+
+    dtypes = loader.DATASETS[dataset][2]
+    frames = {}
+    for query, stage, _, path in loader.scan(dataset, outputs_dir):
+        df = loader.read_tail(path, RUN_STAGES, dtypes)
+        if df is not None:
+            frames[(query, stage)] = df
+    return frames
+
+
+def export(run, datasets=None, outputs_dir=None, columnar_dir=COLUMNAR_DIR, latest_only=True):
+    """
+    Write the CSV outputs of one run into the partitioned Parquet store.
+    Partitions of the same run are replaced, other runs are kept.
+
+    Without an outputs_dir, the run's directory under RUNS_DIR is exported
+    whole if it exists, and the last run of the shared outputs tree
+    otherwise. latest_only=False exports every record of outputs_dir.
+    """
+    _require_pyarrow()
+    if outputs_dir is None:
+        run_dir = os.path.join(RUNS_DIR, run)
+        if os.path.isdir(run_dir):
+            outputs_dir, latest_only = run_dir, False
+        else:
+            outputs_dir = loader.OUTPUTS_DIR
+    for dataset in datasets or EXPORTED_DATASETS:
+        dtypes = loader.DATASETS[dataset][2]
+        if latest_only:
+            frames = _last_run(dataset, outputs_dir)
+        else:
+            frames = loader.load(dataset, outputs_dir=outputs_dir)
+        if not frames:
+            print(f"⚠️ Nothing to export for {dataset}")
+            continue
+
+        tables = []
+        for (query, stage), df in frames.items():
+            if "Stage" not in df.columns:
+                df = df.assign(Stage=stage)
+            df = df.assign(Run=run, Query=query)
+            tables.append(_to_arrow(df, dtypes))
+        table = pa.concat_tables(tables, promote_options="default")
+
+        ds.write_dataset(
+            table,
+            dataset_path(dataset, columnar_dir),
+            format="parquet",
+            partitioning=_partitioning(),
+            existing_data_behavior="delete_matching",
+            basename_template="part-{i}.parquet",
+        )
+        print(f"✅ Exported {dataset}: {table.num_rows} rows for run {run}")
+
+
+def open_dataset(dataset, columnar_dir=COLUMNAR_DIR):
+    """The pyarrow Dataset of a table, with memory-mapped local files."""
+    _require_pyarrow()
+    return ds.dataset(
+        dataset_path(dataset, columnar_dir),
+        format="parquet",
+        partitioning=_partitioning(),
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _as_list(value):
+    return value if isinstance(value, (list, tuple, set)) else [value]
+
+
+def build_filter(run=None, query=None, stage=None, expression=None):
+    """
+    pyarrow filter expression for the partition keys (each a value or a
+    list of values), combined with an optional extra expression.
+    """
+    _require_pyarrow()
+    conditions = []
+    for column, value in (("Run", run), ("Query", query), ("Stage", stage)):
+        if value is not None:
+            conditions.append(ds.field(column).isin(_as_list(value)))
+    if expression is not None:
+        conditions.append(expression)
+    if not conditions:
+        return None
+    result = conditions[0]
+    for condition in conditions[1:]:
+        result = result & condition
+    return result
+
+
+def read(dataset, run=None, query=None, stage=None, columns=None, expression=None,
+         columnar_dir=COLUMNAR_DIR):
+    """
+    Read a dataset into pandas, pushing the run/query/stage filters and the
+    optional pyarrow expression (e.g. ds.field("Applications") > 0) down to
+    the scan. Only the requested columns are materialized.
+    """
+    table = open_dataset(dataset, columnar_dir).to_table(
+        columns=columns,
+        filter=build_filter(run, query, stage, expression),
+    )
+    return table.to_pandas()
+
+
+def list_runs(dataset="query_data", columnar_dir=COLUMNAR_DIR):
+    """Run tags stored for a dataset."""
+    path = dataset_path(dataset, columnar_dir)
+    if not os.path.isdir(path):
+        return []
+    return sorted(name.split("=", 1)[1] for name in os.listdir(path) if name.startswith("Run="))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar (Parquet) store for optimizer telemetry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="export the last run of the CSV outputs, or a sweep run")
+    export_parser.add_argument("--run", default=time.strftime("%Y%m%d-%H%M%S"), help="run tag, or the run id of a sweep")
+    export_parser.add_argument("--datasets", nargs="+", choices=EXPORTED_DATASETS)
+    commands.add_parser("runs", help="list the stored runs")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.run, args.datasets)
+    else:
+        for run in list_runs():
+            print(run)
+
+
+if __name__ == "__main__":
+    main()
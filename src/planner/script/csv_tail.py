@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Backward tail reader for the append-only optimizer CSVs.
+
+The optimizer reopens query_data, egg_merges and expressions CSVs in append
+mode on every run, so the rows the charts need (the last run) are always at
+the end of an ever-growing file. tail_text() finds where the last N logical
+records start by scanning the file backwards in blocks, touching only
+those records instead of parsing the whole file.
+
+A newline ends a record only outside a quoted field. In a well-formed CSV
+every quoted field (including "" escapes) holds an even number of quote
+characters, so a newline is a record boundary exactly when an even number
+of quotes follows it up to the end of the file. This keeps multi-line
+RecExpr strings in expressions.csv intact.
+"""
+
+import csv
+import io
+import os
+
+BLOCK_SIZE = 1 << 16
+
+
+def _header_end(file):
+    """Byte offset just past the header line (headers hold no quoted newlines)."""
+    file.seek(0)
+    file.readline()
+    return file.tell()
+
+
+def _tail_start(file, n, stop):
+    """Byte offset where the last n records after offset stop begin."""
+    file.seek(0, os.SEEK_END)
+    pos = file.tell()
+    if n <= 0:
+        return pos
+
+    # The newline at the very end terminates the last record, it does not start one
+    if pos > stop:
+        file.seek(pos - 1)
+        if file.read(1) == b"\n":
+            pos -= 1
+
+    quotes = 0  # quote characters between the scan position and the end
+    found = 0
+    while pos > stop:
+        start = max(stop, pos - BLOCK_SIZE)
+        file.seek(start)
+        block = file.read(pos - start)
+        i = len(block)
+        while True:
+            newline = block.rfind(b"\n", 0, i)
+            if newline < 0:
+                quotes += block.count(b'"', 0, i)
+                break
+            quotes += block.count(b'"', newline + 1, i)
+            if quotes % 2 == 0:
+                found += 1
+                if found == n:
+                    return start + newline + 1
+            i = newline
+        pos = start
+    return stop
+
+
+def tail_text(path, n):
+    """
+    (header line, text of the last n records) of a CSV file, both as
+    str with their original line endings.
+    """
+    with open(path, "rb") as file:
+        header_end = _header_end(file)
+        file.seek(0)
+        header = file.read(header_end)
+        start = _tail_start(file, n, header_end)
+        file.seek(start)
+        body = file.read()
+    return header.decode("utf-8"), body.decode("utf-8")
+
+
+def _parse(text):
+    return list(csv.reader(io.StringIO(text, newline="")))
+
+
+def tail_rows(path, n, skip=0):
+    """
+    Header and the last n records of a CSV file as csv.reader rows, after
+    dropping the final skip records. Falls back to a full parse if the
+    tail does not split cleanly (e.g. a run that died mid-record).
+    """
+    header, body = tail_text(path, n + skip)
+    header = _parse(header)
+    header = header[0] if header else []
+    rows = _parse(body)
+    if any(len(row) != len(header) for row in rows):
+        print(f"⚠️ Could not split the tail of {path}, reading the whole file")
+        with open(path, "r", newline="", encoding="utf-8") as file:
+            rows = list(csv.reader(file))[1:]
+    if skip:
+        rows = rows[:-skip]
+    return header, rows[-n:] if n > 0 else []
@@ -1,8 +1,16 @@
+import argparse
 import os
-import csv
 import matplotlib.pyplot as plt
 import numpy as np
 
+import loader
+import manifest
+import render_pool
+import rendering
+
+# Render parameters recorded in the rebuild manifest
+MERGE_HISTOGRAM_PARAMS = {"chart": "create_merge_histogram", "figsize": (12, 6), "dpi": 300}
+
 # Creates a histogram visualizing merge operations per stage for a specific query
 def create_merge_histogram(query_folder):
     # Remove "_data" from the folder name for output
@@ -15,90 +23,89 @@ def create_merge_histogram(query_folder):
         print(f"❌ File not found: {input_file}")
         return
 
-    with open(input_file, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        header = next(reader, None)  # Read the header
-        if not header or len(header) < 4:
-            print(f"⚠️ Invalid or empty file: {input_file}")
-            return
-
-        rows = list(reader)
-        if len(rows) < 4:
-            print(f"⚠️ Not enough data in file: {input_file}")
-            return
-
-        last_four = rows[-4:]
-
-    stages = []
-    merge_counts = []
-    num_classes = []
-    unique_nodes = []
-
-    for row in last_four:
-        if len(row) < 4:
-            print(f"⚠️ Skipping malformed row: {row}")
-            continue
-        stages.append(int(row[0]))
-        merge_counts.append(int(row[1]))
-        unique_nodes.append(int(row[2]))      # hc size
-        num_classes.append(int(row[3]))       # eclasses
+    # Skip if the chart was already rendered from this exact input
+    output_path = rendering.output_path(os.path.join(output_dir, f"{output_folder}_sizes.png"))
+    dependencies = [input_file, __file__]
+    params = rendering.params(MERGE_HISTOGRAM_PARAMS)
+    if manifest.skip_if_up_to_date([output_path], dependencies, params):
+        return
+
+    last_four = loader.read_tail(input_file, 4, loader.EGG_MERGES_DTYPES)
+    if last_four is None or len(last_four.columns) < 4:
+        print(f"⚠️ Invalid or empty file: {input_file}")
+        return
+
+    if len(last_four) < 4:
+        print(f"⚠️ Not enough data in file: {input_file}")
+        return
+
+    stages = last_four['Stage'].tolist()
+    merge_counts = last_four['Merge_Count'].tolist()
+    unique_nodes = last_four['HC_Size'].tolist()      # hc size
+    num_classes = last_four['Num_Classes'].tolist()   # eclasses
 
     x = np.arange(len(stages))
     width = 0.25
 
-    fig, ax = plt.subplots(figsize=(12, 6))
-    fig.patch.set_facecolor('white')
-    ax.set_facecolor('white')
-
-    bars1 = ax.bar(x - width, merge_counts, width, label='Number of Merge Operations', color='#4B0082')
-    bars2 = ax.bar(x, num_classes, width, label='Equivalence Classes', color="#FC8B00")
-    bars3 = ax.bar(x + width, unique_nodes, width, label='Unique Nodes', color='#009E73')
-
-    for bars in [bars1, bars2, bars3]:
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 0.5,
-                    f'{int(height)}', ha='center', va='bottom',
-                    color='black', fontweight='bold', fontsize=10)
-
-    plt.xlabel('Stage', color='black', fontsize=14)
-    plt.ylabel('Size', color='black', fontsize=14)
-    plt.xticks(x, stages)
-    plt.xlim(-0.5, len(stages) - 0.5)
-
-    ax.grid(True, color='gray', alpha=0.3, linestyle='--')
-    ax.tick_params(colors='black', labelsize=12)
-    for spine in ax.spines.values():
-        spine.set_color('black')
-        spine.set_linewidth(1)
-
-    plt.legend(fontsize=13)
-    output_path = os.path.join(output_dir, f"{output_folder}_sizes.png")
-    plt.savefig(output_path,
-                facecolor=fig.get_facecolor(),
-                edgecolor='none',
-                bbox_inches='tight',
-                dpi=300)
-    plt.close()
+    with rendering.template("merge_histogram", figsize=(12, 6), facecolor='white', axes_facecolor='white') as (fig, ax):
+        bars1 = ax.bar(x - width, merge_counts, width, label='Number of Merge Operations', color='#4B0082')
+        bars2 = ax.bar(x, num_classes, width, label='Equivalence Classes', color="#FC8B00")
+        bars3 = ax.bar(x + width, unique_nodes, width, label='Unique Nodes', color='#009E73')
+
+        for bars in [bars1, bars2, bars3]:
+            for bar in bars:
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.5,
+                        f'{int(height)}', ha='center', va='bottom',
+                        color='black', fontweight='bold', fontsize=10)
+
+        plt.xlabel('Stage', color='black', fontsize=14)
+        plt.ylabel('Size', color='black', fontsize=14)
+        plt.xticks(x, stages)
+        plt.xlim(-0.5, len(stages) - 0.5)
+
+        ax.grid(True, color='gray', alpha=0.3, linestyle='--')
+        ax.tick_params(colors='black', labelsize=12)
+        for spine in ax.spines.values():
+            spine.set_color('black')
+            spine.set_linewidth(1)
+
+        plt.legend(fontsize=13)
+        rendering.save(fig, output_path,
+                       facecolor=fig.get_facecolor(),
+                       edgecolor='none',
+                       bbox_inches='tight',
+                       dpi=300)
+    manifest.record([output_path], dependencies, params)
     print(f"✅ Size comparison plot saved as: {output_path}")
 
 
 # Process all queries in the directory
-def process_all_queries():
+def process_all_queries(jobs=1):
     input_dir = "src/planner/outputs/egg-merges"
     if not os.path.exists(input_dir):
         print(f"❌ Input directory not found: {input_dir}")
         return
 
+    tasks = []
     for query_folder in os.listdir(input_dir):
         if query_folder.startswith("q"):
             print(f"🔍 Processing egg merges for query {query_folder}...")
-            create_merge_histogram(query_folder)
+            tasks.append(query_folder)
+
+    render_pool.run_tasks(create_merge_histogram, tasks, jobs)
 
 
 # Main entry point
 def main():
-    process_all_queries()
+    parser = argparse.ArgumentParser(description="Egg merge histograms per query")
+    render_pool.add_jobs_argument(parser)
+    manifest.add_force_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    manifest.set_force(args.force)
+    rendering.configure_from_args(args)
+    process_all_queries(args.jobs)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import os
-import pandas as pd
+
+import loader
 
 def filter_last_4_rows(query):
     input_csv = os.path.join("src", "planner", "outputs", "expressions", query, "expressions.csv")
@@ -11,12 +12,12 @@ def filter_last_4_rows(query):
         return
 
     os.makedirs(output_dir, exist_ok=True)
-    df = pd.read_csv(input_csv)
-    if df.empty:
+    # Only the last 4 records are parsed, the file keeps growing across runs
+    filtered_df = loader.read_tail(input_csv, 4, loader.EXPRESSIONS_DTYPES)
+    if filtered_df.empty:
         print(f"⚠️ Input file is empty: {input_csv}")
         return
 
-    filtered_df = df.tail(4)
     filtered_df.to_csv(output_csv, index=False)
     print(f"✅ Saved: {output_csv}")
 
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
+import argparse
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 
-plt.style.use('ggplot')
+import loader
+import render_pool
+import rendering
 
 def plot_expression_groups(csv_file, output_dir):
+    # Scoped style, so other charts drawn in the same interpreter keep theirs
+    with plt.style.context('ggplot'):
+        _plot_expression_groups(csv_file, output_dir)
+
+def _plot_expression_groups(csv_file, output_dir):
     query_name = os.path.basename(csv_file).split('_')[0]
     try:
-        df = pd.read_csv(csv_file)
+        df = loader.read_csv(csv_file, loader.QUERY_DATA_DTYPES)
         if 'Stage' not in df.columns or 'Classes_Total' not in df.columns:
             print(f"❌ Required columns not found in {csv_file}")
             return
@@ -19,33 +26,32 @@ def plot_expression_groups(csv_file, output_dir):
         classes = df['Classes_Total']
 
         # Customize color scheme and add black border
-        plt.figure(figsize=(8, 6))
-        bars = plt.bar(
-            stages,
-            classes,
-            color=["#4B0082", "#FC8B00", "#009E73", "#94004FFF"],
-            edgecolor='black',
-            linewidth=1.2
-        )
-        plt.xlabel('Stage', fontsize=12)
-        plt.ylabel('Expression Groups', fontsize=12)
+        with rendering.figure(figsize=(8, 6)) as fig:
+            bars = plt.bar(
+                stages,
+                classes,
+                color=["#4B0082", "#FC8B00", "#009E73", "#94004FFF"],
+                edgecolor='black',
+                linewidth=1.2
+            )
+            plt.xlabel('Stage', fontsize=12)
+            plt.ylabel('Expression Groups', fontsize=12)
 
-        # Add values on top of the bars
-        for i, v in enumerate(classes):
-            plt.text(i, v + max(classes) * 0.01, str(v), ha='center', va='bottom', fontsize=10)
+            # Add values on top of the bars
+            for i, v in enumerate(classes):
+                plt.text(i, v + max(classes) * 0.01, str(v), ha='center', va='bottom', fontsize=10)
 
-        plt.tight_layout()
+            plt.tight_layout()
 
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{query_name}_expression_groups.png")
-        plt.savefig(output_path, dpi=300)
-        plt.close()
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = rendering.output_path(os.path.join(output_dir, f"{query_name}_expression_groups.png"))
+            rendering.save(fig, output_path, dpi=300)
         print(f"✅ Plot saved at {output_path}")
 
     except Exception as e:
         print(f"❌ Error processing {csv_file}: {e}")
 
-def main():
+def process_all_files(jobs=1):
     base_dir = os.path.join("src", "planner", "outputs", "filtered_query_data")
     output_dir = os.path.join("src", "planner", "outputs", "bar_charts", "expression_groups")
 
@@ -54,13 +60,24 @@ def main():
         return
 
     # Process all query files in the directory
+    tasks = []
     for file_name in os.listdir(base_dir):
         if file_name.endswith("_data_filtered.csv"):
             csv_file = os.path.join(base_dir, file_name)
             print(f"🔍 Processing file: {csv_file}")
-            plot_expression_groups(csv_file, output_dir)
+            tasks.append((csv_file, output_dir))
         else:
             print(f"⚠️ Skipping non-matching file: {file_name}")
 
+    render_pool.run_tasks(plot_expression_groups, tasks, jobs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Expression group bar charts per query")
+    render_pool.add_jobs_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    rendering.configure_from_args(args)
+    process_all_files(args.jobs)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
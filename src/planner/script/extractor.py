@@ -2,6 +2,8 @@ import csv
 import os
 import sys
 
+import csv_tail
+
 def extract_last_four(input_file):
     # Check if input file exists
     if not os.path.exists(input_file):
@@ -16,20 +18,10 @@ def extract_last_four(input_file):
     # Create directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
-    # Read all CSV lines
-    with open(input_file, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        header = next(reader)  # Store header
-        rows = list(reader)    # Convert rest of file to list
-
-        # Special case for query 15
-        if "15" in input_base:
-            # Remove last 4 rows, then get the next 4 (the query costs)
-            rows = rows[:-4]
-            last_rows = rows[-4:]
-        else:
-            # Default: get last 4 rows
-            last_rows = rows[-4:]
+    # Read only the header and the last CSV records
+    # Special case for query 15: skip the last 4 rows, then get the next 4 (the query costs)
+    skip = 4 if "15" in input_base else 0
+    header, last_rows = csv_tail.tail_rows(input_file, 4, skip)
 
     # Write to new file
     with open(output_file, 'w', newline='', encoding='utf-8') as file:
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # filepath: /home/blackparkd/github/risinglight/src/planner/script/calculate_cost_reductions.py
 
+import argparse
 import os
 import glob
 import pandas as pd
@@ -10,6 +11,31 @@ import numpy as np
 import matplotlib.pyplot as plt
 from collections import defaultdict
 
+import loader
+import manifest
+import rendering
+
+# Diretórios de entrada e saída do gráfico e da tabela de redução de custo
+FILTERED_DATA_DIR = "src/planner/outputs/filtered_query_data/"
+COST_REDUCTION_DIR = "src/planner/outputs/bar_charts/cost_reduction"
+COST_REDUCTION_IMAGES = [
+    f"{COST_REDUCTION_DIR}/cost_reduction_all_queries.png",
+    f"{COST_REDUCTION_DIR}/cost_reduction_all_queries_log.png",
+    f"{COST_REDUCTION_DIR}/cost_reduction_table.png",
+]
+COST_REDUCTION_CSV = f"{COST_REDUCTION_DIR}/cost_reduction_data.csv"
+# Parâmetros de renderização registados no manifesto
+COST_REDUCTION_PARAMS = {
+    "chart": "plot_cost_reduction",
+    "figsize": (15, 8),
+    "table_figsize": (20, 10),
+    "dpi": 300,
+}
+
+def cost_reduction_outputs():
+    """Ficheiros gerados, com a extensão do formato de saída escolhido."""
+    return [rendering.output_path(path) for path in COST_REDUCTION_IMAGES] + [COST_REDUCTION_CSV]
+
 def calculate_cost_differences():
     """
     Calcula a diferença de custos entre o estágio inicial e final para todas as queries.
@@ -19,11 +45,19 @@ def calculate_cost_differences():
     # Passo 1: Carregar os custos iniciais (estágio 1)
     initial_costs = {}
     stage2_costs = {}  # Adicionado para armazenar custos do estágio 2
-    initial_cost_dir = "src/planner/outputs/filtered_query_data/"
+    initial_cost_dir = FILTERED_DATA_DIR
     all_data_files = glob.glob(os.path.join(initial_cost_dir, "q*_data_filtered.csv"))
+
+    # Ler cada arquivo uma única vez (cache partilhada) para os dois passos
+    data_frames = {}
+    for file in all_data_files:
+        try:
+            data_frames[file] = loader.read_csv(file, loader.QUERY_DATA_DTYPES)
+        except Exception as e:
+            print(f"  Erro ao ler {file}: {e}")
     
     print("Carregando custos iniciais:")
-    for file in all_data_files:
+    for file, df in data_frames.items():
         try:
             # Extrair o número da query do nome do arquivo
             query_match = re.search(r'q(\d+)_', os.path.basename(file))
@@ -33,9 +67,6 @@ def calculate_cost_differences():
             query_num = int(query_match.group(1))
             query_name = f"Q{query_num}"
             
-            # Ler o arquivo CSV
-            df = pd.read_csv(file)
-            
             # Filtrar para os estágios 1 e 2
             stage1_data = df[df['Stage'] == 1]
             stage2_data = df[df['Stage'] == 2]  # Adicionado para estágio 2
@@ -70,7 +101,7 @@ def calculate_cost_differences():
     # Passo 2: Carregar os custos finais (do último estágio)
     final_costs = {}
     print("\nCarregando custos finais:")
-    for file in all_data_files:  # Usar os mesmos arquivos filtrados
+    for file, df in data_frames.items():  # Usar os mesmos dados já carregados
         try:
             # Extrair o número da query do nome do arquivo
             query_match = re.search(r'q(\d+)_', os.path.basename(file))
@@ -80,9 +111,6 @@ def calculate_cost_differences():
             query_num = int(query_match.group(1))
             query_name = f"Q{query_num}"
 
-            # Ler o arquivo CSV
-            df = pd.read_csv(file)
-
             # Procurar o maior estágio disponível
             if 'Stage' in df.columns and 'Custo' in df.columns:
                 max_stage = df['Stage'].max()
@@ -160,7 +188,7 @@ def plot_cost_reduction(cost_differences):
         return
     
     # Criar o diretório de saída se não existir
-    output_dir = "src/planner/outputs/bar_charts/cost_reduction"
+    output_dir = COST_REDUCTION_DIR
     os.makedirs(output_dir, exist_ok=True)
     
     print("\n📊 Gerando gráfico de redução de custo para todas as queries...")
@@ -179,58 +207,56 @@ def plot_cost_reduction(cost_differences):
     # =========================
     
     # Configurar o gráfico
-    fig, ax = plt.subplots(figsize=(15, 8))  # Aumentei ligeiramente a largura
+    with rendering.subplots(figsize=(15, 8)) as (fig, ax):  # Aumentei ligeiramente a largura
     
-    # Posições das barras
-    x = np.arange(len(query_names))
-    bar_width = 0.25  # Reduzido para acomodar 3 barras
+        # Posições das barras
+        x = np.arange(len(query_names))
+        bar_width = 0.25  # Reduzido para acomodar 3 barras
     
-    # Criar barras para Stage 1
-    p1 = ax.bar(x - bar_width, initial_costs, bar_width, label='Stage 1', color='#0072B2', alpha=0.8)
+        # Criar barras para Stage 1
+        p1 = ax.bar(x - bar_width, initial_costs, bar_width, label='Stage 1', color='#0072B2', alpha=0.8)
     
-    # Criar barras para Stage 2
-    # Converter None para 0 para evitar erros ao plotar
-    stage2_values = [0 if v is None else v for v in stage2_costs]
-    p2 = ax.bar(x, stage2_values, bar_width, label='Stage 2', color='#D55E00', alpha=0.8)
+        # Criar barras para Stage 2
+        # Converter None para 0 para evitar erros ao plotar
+        stage2_values = [0 if v is None else v for v in stage2_costs]
+        p2 = ax.bar(x, stage2_values, bar_width, label='Stage 2', color='#D55E00', alpha=0.8)
     
-    # Criar barras para Final Stage
-    p3 = ax.bar(x + bar_width, final_costs, bar_width, label='Final Stage', color='#009E73', alpha=0.8)
+        # Criar barras para Final Stage
+        p3 = ax.bar(x + bar_width, final_costs, bar_width, label='Final Stage', color='#009E73', alpha=0.8)
     
-    # Adicionar valores nas barras (somente se não forem muito pequenos)
-    max_cost = max(max(initial_costs), max(stage2_values), max(final_costs))
+        # Adicionar valores nas barras (somente se não forem muito pequenos)
+        max_cost = max(max(initial_costs), max(stage2_values), max(final_costs))
     
-    # Configurar eixos e legendas
-    #ax.set_title('Cost Reduction by Query', fontsize=16)
-    ax.set_xlabel('Query', fontsize=14)
-    ax.set_ylabel('Cost', fontsize=14)
-    ax.set_xticks(x)
-    ax.set_xticklabels(query_names)
-    ax.legend(fontsize=12)
+        # Configurar eixos e legendas
+        #ax.set_title('Cost Reduction by Query', fontsize=16)
+        ax.set_xlabel('Query', fontsize=14)
+        ax.set_ylabel('Cost', fontsize=14)
+        ax.set_xticks(x)
+        ax.set_xticklabels(query_names)
+        ax.legend(fontsize=12)
     
-    # Adicionar grid no eixo y
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
+        # Adicionar grid no eixo y
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
     
-    # Considerar usar escala logarítmica se houver grande variação nos valores
-    max_val = max(initial_costs + stage2_values + final_costs)
-    min_val = min([v for v in (initial_costs + stage2_values + final_costs) if v > 0])
+        # Considerar usar escala logarítmica se houver grande variação nos valores
+        max_val = max(initial_costs + stage2_values + final_costs)
+        min_val = min([v for v in (initial_costs + stage2_values + final_costs) if v > 0])
     
-    if max_val / min_val > 100:  # Se a razão entre máx e mín for grande
-        ax.set_yscale('log')
-        print("  Usando escala logarítmica devido à grande variação nos valores")
+        if max_val / min_val > 100:  # Se a razão entre máx e mín for grande
+            ax.set_yscale('log')
+            print("  Usando escala logarítmica devido à grande variação nos valores")
     
-    # Ajustar layout
-    plt.tight_layout()
+        # Ajustar layout
+        plt.tight_layout()
     
-    # Salvar gráfico
-    output_path = f"{output_dir}/cost_reduction_all_queries.png"
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+        # Salvar gráfico
+        output_path = rendering.output_path(f"{output_dir}/cost_reduction_all_queries.png")
+        rendering.save(fig, output_path, dpi=300, bbox_inches='tight')
     
-    # Também criar versão em log independente da razão calculada acima
-    ax.set_yscale('log')
-    output_path_log = f"{output_dir}/cost_reduction_all_queries_log.png"
-    plt.savefig(output_path_log, dpi=300, bbox_inches='tight')
-    
-    plt.close()
+        # Também criar versão em log independente da razão calculada acima
+        ax.set_yscale('log')
+        output_path_log = rendering.output_path(f"{output_dir}/cost_reduction_all_queries_log.png")
+        rendering.save(fig, output_path_log, dpi=300, bbox_inches='tight')
     
     print(f"✅ Gráfico de redução de custo salvo como: {output_path}")
     print(f"✅ Versão com escala logarítmica salva como: {output_path_log}")
@@ -241,76 +267,75 @@ def plot_cost_reduction(cost_differences):
     print("\n📋 Gerando tabela de informações detalhadas...")
     
     # Criar uma figura separada e maior para a tabela
-    fig_table = plt.figure(figsize=(20, 10))  # Aumentado para acomodar mais uma coluna
-    ax_table = fig_table.add_subplot(111)
-    ax_table.axis('off')  # Ocultar eixos para a tabela
-    
-    # Função simplificada - apenas formata com 3 casas decimais
-    def format_number(num):
-        if num is None:
-            return "N/A"
-        return f"{num:.3f}"
-    
-    # Preparar dados para a tabela (agora com coluna para estágio 2)
-    table_data = []
-    for q, init, stage2, fin, red, pct in zip(query_names, initial_costs, stage2_costs, final_costs, reductions, percentages):
-        table_data.append([
-            q,                      # Nome da query
-            format_number(init),    # Custo estágio 1
-            format_number(stage2),  # Custo estágio 2 (adicionado)
-            format_number(fin),     # Custo final
-            format_number(red),     # Redução absoluta
-        ])
-    
-    # Ordenar a tabela por número da query
-    table_data_sorted = sorted(table_data, key=lambda x: int(x[0].replace('Q', '')))
-    
-    # Adicionar o cabeçalho da tabela com nomes atualizados
-    column_labels = ['Query', 'Stage 1', 'Stage 2', 'Final Stage', 'Absolute Reduction']
-    
-    # Criar a tabela
-    table = ax_table.table(
-        cellText=table_data_sorted,
-        colLabels=column_labels,
-        loc='center',
-        cellLoc='center',
-        colColours=['#B0E0E6'] * 5,  # Agora são 5 colunas
-        colWidths=[0.05, 0.24, 0.24, 0.24, 0.23]  # Ajustado para 5 colunas
-    )
-    
-    # Estilizar a tabela
-    table.auto_set_font_size(False)
-    table.set_fontsize(14)
-    table.scale(1.5, 2.2)
-    
-    # Aplicar estilo às células
-    for i, row in enumerate(table_data_sorted):
-        for j in range(5):  # Agora são 5 colunas
-            cell = table[i+1, j]  # +1 para pular o cabeçalho
-            cell.set_facecolor('#FFFFFF')  # Branco para todas as células
-            cell.set_edgecolor('#000000')
-            # Centralizar os números
-            if j > 0:  # Colunas numéricas
-                cell.set_text_props(ha='center')
+    with rendering.figure(figsize=(20, 10)) as fig_table:  # Aumentado para acomodar mais uma coluna
+        ax_table = fig_table.add_subplot(111)
+        ax_table.axis('off')  # Ocultar eixos para a tabela
+    
+        # Função simplificada - apenas formata com 3 casas decimais
+        def format_number(num):
+            if num is None:
+                return "N/A"
+            return f"{num:.3f}"
+    
+        # Preparar dados para a tabela (agora com coluna para estágio 2)
+        table_data = []
+        for q, init, stage2, fin, red, pct in zip(query_names, initial_costs, stage2_costs, final_costs, reductions, percentages):
+            table_data.append([
+                q,                      # Nome da query
+                format_number(init),    # Custo estágio 1
+                format_number(stage2),  # Custo estágio 2 (adicionado)
+                format_number(fin),     # Custo final
+                format_number(red),     # Redução absoluta
+            ])
+    
+        # Ordenar a tabela por número da query
+        table_data_sorted = sorted(table_data, key=lambda x: int(x[0].replace('Q', '')))
+    
+        # Adicionar o cabeçalho da tabela com nomes atualizados
+        column_labels = ['Query', 'Stage 1', 'Stage 2', 'Final Stage', 'Absolute Reduction']
+    
+        # Criar a tabela
+        table = ax_table.table(
+            cellText=table_data_sorted,
+            colLabels=column_labels,
+            loc='center',
+            cellLoc='center',
+            colColours=['#B0E0E6'] * 5,  # Agora são 5 colunas
+            colWidths=[0.05, 0.24, 0.24, 0.24, 0.23]  # Ajustado para 5 colunas
+        )
+    
+        # Estilizar a tabela
+        table.auto_set_font_size(False)
+        table.set_fontsize(14)
+        table.scale(1.5, 2.2)
+    
+        # Aplicar estilo às células
+        for i, row in enumerate(table_data_sorted):
+            for j in range(5):  # Agora são 5 colunas
+                cell = table[i+1, j]  # +1 para pular o cabeçalho
+                cell.set_facecolor('#FFFFFF')  # Branco para todas as células
+                cell.set_edgecolor('#000000')
+                # Centralizar os números
+                if j > 0:  # Colunas numéricas
+                    cell.set_text_props(ha='center')
             
-            # Alinhar à direita os nomes das queries
-            if j == 0:  # Coluna de nome da query
-                cell.set_text_props(ha='center')
+                # Alinhar à direita os nomes das queries
+                if j == 0:  # Coluna de nome da query
+                    cell.set_text_props(ha='center')
                 
-            # Destacar células com "N/A"
-            if row[j] == "N/A":
-                cell.set_facecolor('#f2f2f2')  # Cinza claro para valores faltantes
+                # Destacar células com "N/A"
+                if row[j] == "N/A":
+                    cell.set_facecolor('#f2f2f2')  # Cinza claro para valores faltantes
     
-    # Remover título
-    # plt.title('Detalhes de Redução de Custo por Query', fontsize=16)  # Esta linha foi removida
+        # Remover título
+        # plt.title('Detalhes de Redução de Custo por Query', fontsize=16)  # Esta linha foi removida
     
-    # Ajustar layout
-    plt.tight_layout()
+        # Ajustar layout
+        plt.tight_layout()
     
-    # Salvar tabela como imagem separada
-    table_output_path = f"{output_dir}/cost_reduction_table.png"
-    plt.savefig(table_output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+        # Salvar tabela como imagem separada
+        table_output_path = rendering.output_path(f"{output_dir}/cost_reduction_table.png")
+        rendering.save(fig_table, table_output_path, dpi=300, bbox_inches='tight')
     
     print(f"✅ Tabela detalhada salva como: {table_output_path}")
     
@@ -334,9 +359,34 @@ def plot_cost_reduction(cost_differences):
     
     print(f"✅ Dados de redução de custo salvos em CSV: {csv_output_path}")
 
-if __name__ == "__main__":
+def build_cost_reduction():
+    """
+    Calcula as reduções de custo e gera o gráfico e a tabela, a menos que
+    já estejam atualizados.
+    """
+    # Saltar se o gráfico e a tabela já foram gerados a partir destes ficheiros
+    dependencies = sorted(glob.glob(os.path.join(FILTERED_DATA_DIR, "q*_data_filtered.csv"))) + [__file__]
+    outputs = cost_reduction_outputs()
+    params = rendering.params(COST_REDUCTION_PARAMS)
+    if manifest.skip_if_up_to_date(outputs, dependencies, params):
+        return
+
     # Obter os dados de redução de custo
     cost_differences = calculate_cost_differences()
     
     # Gerar o gráfico
-    plot_cost_reduction(cost_differences)
\ No newline at end of file
+    plot_cost_reduction(cost_differences)
+    if all(os.path.exists(path) for path in outputs):
+        manifest.record(outputs, dependencies, params)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost reduction chart and table for all queries")
+    manifest.add_force_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    manifest.set_force(args.force)
+    rendering.configure_from_args(args)
+    build_cost_reduction()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
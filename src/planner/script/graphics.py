@@ -1,8 +1,16 @@
-import csv
+import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+import loader
+import manifest
+import render_pool
+import rendering
+
+# Render parameters recorded in the rebuild manifest
+GRAPH_PARAMS = {"chart": "create_graph", "figsize": (15, 8), "dpi": 300}
+
 def create_graph(file_path):
     # Get query number from file path
     query_num = os.path.basename(file_path).split('_')[0][1:]
@@ -17,26 +25,21 @@ def create_graph(file_path):
         print(f"❌ File not found: {file_path}")
         return
 
-    # 📌 Lists to store values
-    stages = []
-    costs = []
-    total_classes = []
-    relationals = []
-    minimums = []
-    maximums = []
-    averages = []
-
-    # 📌 Read CSV and store values
-    with open(file_path, mode="r", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            stages.append(int(row["Stage"]))
-            costs.append(float(row["Custo"]))
-            total_classes.append(int(row["Classes_Total"]))
-            relationals.append(int(row["Relacionais"]))
-            minimums.append(int(row["Min"]))
-            maximums.append(int(row["Max"]))
-            averages.append(float(row["Media"]))
+    # Skip if the chart was already rendered from this exact input
+    output_path = rendering.output_path(os.path.join(output_dir, f"query{query_num}_graph.png"))
+    dependencies = [file_path, __file__]
+    params = rendering.params(GRAPH_PARAMS)
+    if manifest.skip_if_up_to_date([output_path], dependencies, params):
+        return
+
+    # 📌 Read CSV (shared cache) and store values
+    df = loader.read_csv(file_path, loader.QUERY_DATA_DTYPES)
+    costs = df["Custo"].tolist()
+    total_classes = df["Classes_Total"].tolist()
+    relationals = df["Relacionais"].tolist()
+    minimums = df["Min"].tolist()
+    maximums = df["Max"].tolist()
+    averages = df["Media"].tolist()
 
     # Create grouped bar chart
     stages = (0, 1, 2, 3)  # your stages
@@ -53,71 +56,82 @@ def create_graph(file_path):
     width = 0.15 # width of the bars
     multiplier = 0 # multiplier to adjust bar position
 
-    # Configure subplot
-    fig, ax = plt.subplots(figsize=(15, 8), layout='constrained')
-
-    # Add background color
-    fig.patch.set_facecolor('#478ac9')  # Graph background color
-    ax.set_facecolor('#2e353b')  # Subplot background color
-
-    # Create bars for each metric
-    colors = ['#FF8C00', '#72266D', '#FF4500', '#D3D3D3', '#9370DB', '#20B2AA']
-    for (attribute, measurement), color in zip(metrics.items(), colors):
-        offset = width * multiplier
-        rects = ax.bar(x + offset, measurement, width, label=attribute, color=color)
-        ax.bar_label(rects, padding=3, rotation=0, color='white', fontsize=8)
-        multiplier += 1
-
-    # Configure labels and title
-    ax.set_ylabel('Values')
-    ax.set_xlabel('Optimization Stages')
-    ax.set_title(f'Metrics for Query {query_num}')
-    ax.set_xticks(x + width, stages)
-    ax.legend(
-        loc='upper center', 
-        bbox_to_anchor=(0.5, 1.15), 
-        ncol=3,
-        facecolor='#2e353b',
-        edgecolor='#478ac9',
-        labelcolor='white'
-    )
-
-    # Adjust logarithmic scale for Y axis due to cost values
-    ax.set_yscale('log')
-
-    # Adjust layout and increase space for labels
-    plt.tight_layout()
-    plt.subplots_adjust(bottom=0.15)
-
-    # Save the plot as PNG file
-    output_path = os.path.join(output_dir, f"query{query_num}_graph.png")
-    plt.savefig(output_path, 
-                bbox_inches='tight',
-                facecolor=fig.get_facecolor(),
-                edgecolor='none',
-                dpi=300)
+    # Configure subplot (reused figure with the graph and subplot background colors)
+    with rendering.template(
+        "metrics_graph",
+        figsize=(15, 8),
+        layout='constrained',
+        facecolor=rendering.DARK_FIGURE_COLOR,
+        axes_facecolor=rendering.DARK_AXES_COLOR,
+    ) as (fig, ax):
+        # Create bars for each metric
+        colors = ['#FF8C00', '#72266D', '#FF4500', '#D3D3D3', '#9370DB', '#20B2AA']
+        for (attribute, measurement), color in zip(metrics.items(), colors):
+            offset = width * multiplier
+            rects = ax.bar(x + offset, measurement, width, label=attribute, color=color)
+            ax.bar_label(rects, padding=3, rotation=0, color='white', fontsize=8)
+            multiplier += 1
+
+        # Configure labels and title
+        ax.set_ylabel('Values')
+        ax.set_xlabel('Optimization Stages')
+        ax.set_title(f'Metrics for Query {query_num}')
+        ax.set_xticks(x + width, stages)
+        ax.legend(
+            loc='upper center', 
+            bbox_to_anchor=(0.5, 1.15), 
+            ncol=3,
+            facecolor='#2e353b',
+            edgecolor='#478ac9',
+            labelcolor='white'
+        )
+
+        # Adjust logarithmic scale for Y axis due to cost values
+        ax.set_yscale('log')
+
+        # Adjust layout and increase space for labels
+        plt.tight_layout()
+        plt.subplots_adjust(bottom=0.15)
+
+        # Save the plot
+        rendering.save(fig, output_path,
+                       bbox_inches='tight',
+                       facecolor=fig.get_facecolor(),
+                       edgecolor='none',
+                       dpi=300)
+    manifest.record([output_path], dependencies, params)
     print(f"✅ Graph saved as: {output_path}")
     
     # Show the plot
     #plt.show() -> Para já so quero guardar a imagem
 
-def process_all_files():
+def process_all_files(jobs=1):
     input_dir = "src/planner/outputs/filtered_query_data"
     if not os.path.exists(input_dir):
         print(f"❌ Input directory not found: {input_dir}")
         return
 
     # Process all files in the directory
+    tasks = []
     for file_name in os.listdir(input_dir):
         if file_name.endswith("_data_filtered.csv"):
             file_path = os.path.join(input_dir, file_name)
             print(f"🔍 Processing file: {file_path}")
-            create_graph(file_path)
+            tasks.append(file_path)
         else:
             print(f"⚠️ Skipping non-matching file: {file_name}")
 
+    render_pool.run_tasks(create_graph, tasks, jobs)
+
 def main():
-    process_all_files()
+    parser = argparse.ArgumentParser(description="Per-query metric bar charts")
+    render_pool.add_jobs_argument(parser)
+    manifest.add_force_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    manifest.set_force(args.force)
+    rendering.configure_from_args(args)
+    process_all_files(args.jobs)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Shared loader for the CSVs written by the optimizer under src/planner/outputs.
+
+Every dataset is scanned once, parsed into typed DataFrames (rule names are
+categorical) and memoized in-process. A cached frame is reused until the
+file's mtime or size changes, so scripts that run in the same interpreter
+never parse the same CSV twice.
+
+Frames returned from the cache are shared: treat them as read-only and
+.copy() before mutating.
+"""
+
+import io
+import os
+import re
+
+import pandas as pd
+
+import csv_tail
+
+OUTPUTS_DIR = os.path.join("src", "planner", "outputs")
+
+# Column types of each CSV schema written by optimizer.rs
+QUERY_DATA_DTYPES = {
+    "Stage": "int8",
+    "Custo": "float64",
+    "Relacionais": "int32",
+    "Classes_Total": "int32",
+    "Min": "int32",
+    "Max": "int32",
+    "Media": "float64",
+}
+CLASS_DATA_DTYPES = {
+    "Stage": "int8",
+    "Class_ID": "int32",
+    "Node_Count": "int32",
+    "Nodes": "string",
+}
+EGG_MERGES_DTYPES = {
+    "Stage": "int8",
+    "Merge_Count": "int64",
+    "HC_Size": "int64",
+    "Num_Classes": "int64",
+}
+RULES_DATA_DTYPES = {
+    "Stage": "int8",
+    "External_Iteration": "int16",
+    "Internal_Iteration": "int16",
+    "Class_Count": "int64",
+    "Node_Count": "int64",
+    "Rule_Name": "category",
+    "Applications": "int64",
+}
+RULE_TIMINGS_DTYPES = {
+    "Stage": "int8",
+    "Internal_Iteration": "int16",
+    "Rule_Name": "category",
+    "Matches": "int64",
+    "Applications": "int64",
+    "Search_Time": "float64",
+    "Apply_Time": "float64",
+    "Rebuild_Time": "float64",
+    "Input_Cost": "float64",
+    "Output_Cost": "float64",
+}
+RULE_STATS_DTYPES = {
+    "Stage": "int8",
+    "Rule_Name": "category",
+    "Total_Applications": "int64",
+    "Rank": "int32",
+}
+EXPRESSIONS_DTYPES = {
+    "Stage": "int8",
+    "Expression": "string",
+}
+
+# dataset -> (directory, file pattern, dtypes)
+# The pattern captures the query name and, when present, stage and iteration.
+DATASETS = {
+    "query_data": ("query_data", r"^(q\d+)_data\.csv$", QUERY_DATA_DTYPES),
+    "filtered_query_data": ("filtered_query_data", r"^(q\d+)_data_filtered\.csv$", QUERY_DATA_DTYPES),
+    "data_classes": ("data_classes", r"^(q\d+)/stage_(\d+)_classes\.csv$", CLASS_DATA_DTYPES),
+    "egg_merges": ("egg-merges", r"^(q\d+)_data/egg_merges\.csv$", EGG_MERGES_DTYPES),
+    "rules_data": ("rules_data", r"^(q\d+)_data/stage_(\d+)(?:_iter_(\d+))?_rules_application\.csv$", RULES_DATA_DTYPES),
+    "rule_timings": ("rules_data", r"^(q\d+)_data/stage_(\d+)_rule_timings\.csv$", RULE_TIMINGS_DTYPES),
+    "rules_stats": ("rules_stats", r"^(q\d+)_data/stage_(\d+)_rule_stats\.csv$", RULE_STATS_DTYPES),
+    "expressions": ("expressions", r"^(q\d+)/expressions\.csv$", EXPRESSIONS_DTYPES),
+}
+
+# path -> (mtime_ns, size, DataFrame)
+_frame_cache = {}
+# (dataset directory, file pattern) -> (mtime_ns signature, entries)
+# Keyed by pattern too: rules_data and rule_timings share a directory
+_scan_cache = {}
+
+
+def query_sort_key(query):
+    """Sort key that orders q2 before q10."""
+    match = re.search(r'(\d+)', query)
+    return (int(match.group(1)) if match else 0, query)
+
+
+def read_csv(path, dtypes=None, cache=True, usecols=None):
+    """
+    Read a CSV into a typed DataFrame, reusing the cached copy while the
+    file's mtime and size are unchanged. Returns None if the file is missing.
+    With cache=False the frame is not kept (for callers that reduce files
+    one at a time) and usecols, if given, limits the parsed columns.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    key = os.path.abspath(path)
+    cached = _frame_cache.get(key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    if cache or usecols is None:
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_csv(path, usecols=lambda col: col in usecols)
+    df = _apply_dtypes(df, dtypes, path)
+
+    if cache:
+        _frame_cache[key] = (stat.st_mtime_ns, stat.st_size, df)
+    return df
+
+
+def _apply_dtypes(df, dtypes, path):
+    if not dtypes:
+        return df
+    present = {col: dtype for col, dtype in dtypes.items() if col in df.columns}
+    try:
+        return df.astype(present)
+    except (TypeError, ValueError):
+        # Leave malformed files untyped rather than failing the whole run
+        print(f"⚠️ Could not apply column types to {path}")
+        return df
+
+
+def read_tail(path, n, dtypes=None, skip=0):
+    """
+    The last n records of a CSV as a typed DataFrame, after dropping the
+    final skip records. Only the end of the file is read (see csv_tail.py),
+    so the cost does not grow with the append-only history before it.
+    Returns None if the file is missing.
+    """
+    if not os.path.exists(path):
+        return None
+    header, body = csv_tail.tail_text(path, n + skip)
+    try:
+        df = pd.read_csv(io.StringIO(header + body))
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        print(f"⚠️ Could not split the tail of {path}, reading the whole file")
+        df = pd.read_csv(path).tail(n + skip)
+    if skip:
+        df = df.iloc[:-skip]
+    return _apply_dtypes(df.tail(n).reset_index(drop=True), dtypes, path)
+
+
+def _dir_signature(base_dir):
+    """mtime signature of a dataset directory and its query subfolders."""
+    signature = [os.stat(base_dir).st_mtime_ns]
+    for entry in os.scandir(base_dir):
+        if entry.is_dir():
+            signature.append(entry.stat().st_mtime_ns)
+    return tuple(signature)
+
+
+def scan(dataset, outputs_dir=OUTPUTS_DIR):
+    """
+    List the files of a dataset as (query, stage, iteration, path) tuples,
+    sorted by query, stage and iteration. Stage and iteration are None when
+    the file name does not carry them. The listing is cached until one of
+    the dataset directories changes.
+    """
+    subdir, pattern, _ = DATASETS[dataset]
+    base_dir = os.path.join(outputs_dir, subdir)
+    if not os.path.isdir(base_dir):
+        return []
+
+    signature = _dir_signature(base_dir)
+    cached = _scan_cache.get((base_dir, pattern))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    regex = re.compile(pattern)
+    entries = []
+    for root, _, files in os.walk(base_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            rel_path = os.path.relpath(path, base_dir).replace(os.sep, "/")
+            match = regex.match(rel_path)
+            if not match:
+                continue
+            groups = match.groups() + (None, None)
+            query = groups[0]
+            stage = int(groups[1]) if groups[1] is not None else None
+            iteration = int(groups[2]) if groups[2] is not None else None
+            entries.append((query, stage, iteration, path))
+
+    entries.sort(key=lambda e: (query_sort_key(e[0]), e[1] if e[1] is not None else -1,
+                                e[2] if e[2] is not None else -1))
+    _scan_cache[(base_dir, pattern)] = (signature, entries)
+    return entries
+
+
+def list_queries(dataset, outputs_dir=OUTPUTS_DIR):
+    """Sorted query names (e.g. "q1") that have files in a dataset."""
+    queries = {entry[0] for entry in scan(dataset, outputs_dir)}
+    return sorted(queries, key=query_sort_key)
+
+
+def load(dataset, query=None, stage=None, outputs_dir=OUTPUTS_DIR):
+    """
+    Load the typed DataFrames of a dataset, keyed by (query, stage).
+
+    query and stage restrict which files are read. For datasets without a
+    stage in the file name (query_data, egg_merges, expressions, ...) the
+    key is (query, None) and the whole file is returned.
+    """
+    _, _, dtypes = DATASETS[dataset]
+    frames = {}
+    parts = {}
+    for file_query, file_stage, iteration, path in scan(dataset, outputs_dir):
+        if query is not None and file_query != query:
+            continue
+        if stage is not None and file_stage is not None and file_stage != int(stage):
+            continue
+        df = read_csv(path, dtypes)
+        if df is None:
+            continue
+        parts.setdefault((file_query, file_stage), []).append((iteration, df))
+
+    for key, dfs in parts.items():
+        # Prefer the per-iteration files of a stage over its summary file
+        if any(iteration is not None for iteration, _ in dfs):
+            dfs = [(iteration, df) for iteration, df in dfs if iteration is not None]
+        if len(dfs) == 1 and dfs[0][0] is None:
+            frames[key] = dfs[0][1]
+        else:
+            frames[key] = _concat_iterations(dfs, key[1])
+    return frames
+
+
+def _concat_iterations(dfs, stage):
+    """Concatenate per-iteration files of one stage, tagging their source."""
+    tagged = []
+    for iteration, df in dfs:
+        if iteration is not None and "External_Iteration" not in df.columns:
+            df = df.assign(External_Iteration=iteration)
+        if stage is not None and "Stage" not in df.columns:
+            df = df.assign(Stage=stage)
+        tagged.append(df)
+    result = pd.concat(tagged, ignore_index=True)
+    if "Rule_Name" in result.columns:
+        result["Rule_Name"] = result["Rule_Name"].astype("category")
+    return result
+
+
+def load_one(dataset, query, stage=None, outputs_dir=OUTPUTS_DIR):
+    """Load a single (query, stage) frame of a dataset, or None if missing."""
+    frames = load(dataset, query, stage, outputs_dir)
+    if not frames:
+        return None
+    if stage is not None and (query, int(stage)) in frames:
+        return frames[(query, int(stage))]
+    return next(iter(frames.values()))
+
+
+# Convenience accessors used by the chart scripts #
+
+def read_query_data(query, filtered=False):
+    """qN_data.csv (or the qN_data_filtered.csv written by extractor.py)."""
+    dataset = "filtered_query_data" if filtered else "query_data"
+    return load_one(dataset, query)
+
+
+def read_class_data(query, stage):
+    """data_classes/qN/stage_K_classes.csv"""
+    return load_one("data_classes", query, stage)
+
+
+def read_egg_merges(query):
+    """egg-merges/qN_data/egg_merges.csv"""
+    return load_one("egg_merges", query)
+
+
+def read_rules_data(query, stage=None):
+    """
+    Rule applications of a query, all requested stages in one frame.
+    Per-iteration stage_K_iter_I files are used when a stage has them.
+    """
+    frames = load("rules_data", query, stage)
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return next(iter(frames.values()))
+    result = pd.concat([frames[key] for key in sorted(frames)], ignore_index=True)
+    result["Rule_Name"] = result["Rule_Name"].astype("category")
+    return result
+
+
+def read_rule_timings(query, stage):
+    """rules_data/qN_data/stage_K_rule_timings.csv"""
+    return load_one("rule_timings", query, stage)
+
+
+def read_rule_stats(query, stage):
+    """rules_stats/qN_data/stage_K_rule_stats.csv"""
+    return load_one("rules_stats", query, stage)
+
+
+def read_expressions(query):
+    """expressions/qN/expressions.csv"""
+    return load_one("expressions", query)
+
+
+def load_all(outputs_dir=OUTPUTS_DIR):
+    """Scan and load every dataset once, warming the cache for later reads."""
+    return {dataset: load(dataset, outputs_dir=outputs_dir) for dataset in DATASETS}
+
+
+def clear_cache():
+    """Drop every cached frame and directory listing."""
+    _frame_cache.clear()
+    _scan_cache.clear()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Dependency manifest for incremental chart rebuilds.
+
+Each generated artifact gets a small JSON entry under
+src/planner/outputs/.manifest recording the content hash of its inputs and
+the render parameters it was produced with. A chart function asks
+up_to_date() before rendering and calls record() after saving; make-style,
+it is skipped when its outputs exist and neither inputs nor parameters
+changed. Inputs are only re-hashed when their mtime or size moved.
+
+One entry file per artifact keeps parallel workers from racing on a shared
+manifest. Pass the script's own __file__ as an input so editing a chart
+script invalidates its outputs.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_DIR = os.path.join("src", "planner", "outputs", ".manifest")
+
+# Set by --force; an environment variable so process-pool workers see it too
+FORCE_ENV = "PLANNER_FORCE_REBUILD"
+
+# abspath -> (mtime_ns, size, sha256)
+_hash_cache = {}
+
+
+def add_force_argument(parser):
+    """Add the common --force option to an argparse parser."""
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="rebuild every output even if its inputs did not change",
+    )
+
+
+def set_force(force):
+    """Ignore (or honour again) up-to-date entries in this and child processes."""
+    if force:
+        os.environ[FORCE_ENV] = "1"
+    else:
+        os.environ.pop(FORCE_ENV, None)
+
+
+def _entry_path(outputs):
+    key = os.path.normpath(outputs[0]).replace(os.sep, "/")
+    return os.path.join(MANIFEST_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def _file_state(path, recorded=None):
+    """(mtime_ns, size, sha256) of a file, hashing only when it changed."""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    for known in (_hash_cache.get(key), recorded):
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return tuple(known)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    state = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    _hash_cache[key] = state
+    return state
+
+
+def _normalize(params):
+    # Round-trip through JSON so tuples and lists compare equal
+    return json.loads(json.dumps(params, sort_keys=True, default=str))
+
+
+def _read_entry(outputs):
+    try:
+        with open(_entry_path(outputs), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def up_to_date(outputs, inputs, params):
+    """
+    True if every output exists and was recorded from inputs with the same
+    content and the same render parameters.
+    """
+    if os.environ.get(FORCE_ENV):
+        return False
+    entry = _read_entry(outputs)
+    if entry is None:
+        return False
+    if sorted(entry.get("outputs", [])) != sorted(outputs):
+        return False
+    if not all(os.path.exists(path) for path in outputs):
+        return False
+    if entry.get("params") != _normalize(params):
+        return False
+
+    recorded = entry.get("inputs", {})
+    if sorted(recorded) != sorted(inputs):
+        return False
+    for path in inputs:
+        if not os.path.exists(path):
+            return False
+        if _file_state(path, recorded[path])[2] != recorded[path][2]:
+            return False
+    return True
+
+
+def record(outputs, inputs, params):
+    """Store the manifest entry of freshly rendered outputs."""
+    entry = {
+        "outputs": list(outputs),
+        "inputs": {path: list(_file_state(path)) for path in inputs},
+        "params": _normalize(params),
+    }
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    entry_path = _entry_path(outputs)
+    tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(entry, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, entry_path)
+
+
+def skip_if_up_to_date(outputs, inputs, params):
+    """up_to_date() that also reports the skip."""
+    if up_to_date(outputs, inputs, params):
+        print(f"⏭️ Up to date, skipping: {outputs[0]}")
+        return True
+    return False
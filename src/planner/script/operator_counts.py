@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Operator-type counts for the data_classes stage dumps.
+
+Every e-node of every e-class is counted, not only the first one of the
+"; "-joined Nodes cell. All queries and stages are handled in one batched
+pass: the Nodes columns are concatenated and the operator names pulled out
+with a single vectorized str.extractall, then grouped into a
+query x stage x operator count matrix.
+
+The long-format result is cached in
+src/planner/outputs/operator_counts/operator_counts.csv and rebuilt only
+when a stage_K_classes.csv file changes (see manifest.py).
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+import loader
+import manifest
+
+COUNTS_DIR = os.path.join(loader.OUTPUTS_DIR, "operator_counts")
+COUNTS_FILE = os.path.join(COUNTS_DIR, "operator_counts.csv")
+COUNTS_DTYPES = {"Query": "category", "Stage": "int8", "Operator": "category", "Count": "int64"}
+COUNTS_PARAMS = {"table": "operator_counts", "split": "; "}
+
+# Operator name at the start of every node of a Nodes cell
+NODE_OPERATOR_PATTERN = r'(?:^|; )([A-Za-z]+)'
+
+RELATIONAL_OPS = [
+    "Join", "Filter", "Proj", "HashAgg", "Order", "Scan",
+    "HashJoin", "IndexScan", "SeqScan", "MergeJoin",
+    "Values", "TopN",
+]
+
+
+def count_operators(frames):
+    """
+    Count operator types over {(query, stage): classes DataFrame}.
+    Returns a long DataFrame with Query, Stage, Operator, Count columns.
+    """
+    parts = []
+    for (query, stage), df in frames.items():
+        if 'Nodes' not in df.columns or df.empty:
+            continue
+        parts.append(pd.DataFrame({
+            'Query': query,
+            'Stage': stage,
+            'Nodes': df['Nodes'].astype('string'),
+        }))
+    if not parts:
+        return pd.DataFrame(columns=list(COUNTS_DTYPES)).astype(COUNTS_DTYPES)
+
+    nodes = pd.concat(parts, ignore_index=True)
+    # One row per e-node: (row of the class, match number) -> operator name
+    operators = nodes['Nodes'].str.extractall(NODE_OPERATOR_PATTERN)[0]
+    rows = operators.index.get_level_values(0)
+
+    counts = (
+        pd.DataFrame({
+            'Query': nodes['Query'].to_numpy()[rows],
+            'Stage': nodes['Stage'].to_numpy()[rows],
+            'Operator': operators.to_numpy(),
+        })
+        .groupby(['Query', 'Stage', 'Operator'], sort=False)
+        .size()
+        .rename('Count')
+        .reset_index()
+    )
+    counts['Order'] = counts['Query'].map(lambda query: loader.query_sort_key(query)[0])
+    counts = counts.sort_values(
+        ['Order', 'Query', 'Stage', 'Count', 'Operator'],
+        ascending=[True, True, True, False, True],
+        ignore_index=True,
+    ).drop(columns='Order')
+    return counts.astype(COUNTS_DTYPES)
+
+
+def load_counts(force=False):
+    """
+    Long-format operator counts for every query and stage, read from the
+    on-disk cache while no stage_K_classes.csv changed.
+    """
+    dependencies = [path for _, _, _, path in loader.scan("data_classes")] + [__file__]
+    if not force and manifest.up_to_date([COUNTS_FILE], dependencies, COUNTS_PARAMS):
+        return loader.read_csv(COUNTS_FILE, COUNTS_DTYPES)
+
+    counts = count_operators(loader.load("data_classes"))
+    os.makedirs(COUNTS_DIR, exist_ok=True)
+    counts.to_csv(COUNTS_FILE, index=False)
+    manifest.record([COUNTS_FILE], dependencies, COUNTS_PARAMS)
+    print(f"✅ Operator counts saved to: {COUNTS_FILE}")
+    return loader.read_csv(COUNTS_FILE, COUNTS_DTYPES)
+
+
+def operator_matrix(force=False):
+    """Count matrix indexed by (Query, Stage) with one column per operator."""
+    counts = load_counts(force)
+    return counts.pivot_table(
+        index=['Query', 'Stage'],
+        columns='Operator',
+        values='Count',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True,
+    )
+
+
+def stage_counts(query, stage, relational_only=False):
+    """Operator -> count Series of one query and stage, most frequent first."""
+    counts = load_counts()
+    selected = counts[(counts['Query'] == query) & (counts['Stage'] == int(stage))]
+    if relational_only:
+        selected = selected[selected['Operator'].isin(RELATIONAL_OPS)]
+    series = selected.set_index('Operator')['Count']
+    series.index = series.index.astype(str)
+    return series.sort_values(ascending=False, kind='stable')
+
+
+def main():
+    counts = load_counts(force="--force" in sys.argv[1:])
+    print(operator_matrix().to_string())
+    print(f"\n{len(counts)} (query, stage, operator) counts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Pareto frontier of the optimizer stage-parameter settings measured by tuning.py.
+
+For each query, a setting is on the frontier when no other setting is at
+least as good on every objective and better on one. Objectives are
+minimized: optimizer wall time and final plan cost, plus the peak e-graph
+size with --with-peak.
+
+Outputs, for one run of tuning.csv (the latest by default):
+    tuning/pareto_frontier.csv   every query's measurements, with On_Frontier
+    tuning/setting_summary.csv   per setting: queries on the frontier, geometric
+                                 mean of time and worst cost ratio against
+                                 the defaults, most promising first
+    bar_charts/pareto/pareto_{query}.png   time against cost per query
+
+Run from the repository root:
+    python3 src/planner/script/pareto.py [--run-id ID] [--with-peak] [--jobs N]
+"""
+
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import loader
+import render_pool
+import rendering
+
+TUNING_DIR = "src/planner/outputs/tuning"
+OUTPUT_DIR = "src/planner/outputs/bar_charts/pareto"
+PARAM_COLUMNS = [
+    "Stage1_Iterations", "Stage1_Iter_Limit",
+    "Stage2_Iterations", "Stage2_Iter_Limit",
+    "Stage3_Iterations", "Stage3_Iter_Limit",
+]
+DEFAULT_SETTING = "2x6 4x6 3x8"
+
+
+def load_run(run_id=None, tuning_dir=TUNING_DIR):
+    """The rows of one run of tuning.csv (the last one appended by default), with a Setting label."""
+    df = loader.read_csv(os.path.join(tuning_dir, "tuning.csv"))
+    if df is None or df.empty:
+        return None
+    run_id = run_id or df["Run_ID"].iloc[-1]
+    df = df[df["Run_ID"].astype(str) == str(run_id)].copy()
+    params = df[PARAM_COLUMNS].astype(int).astype(str)
+    df["Setting"] = (
+        params["Stage1_Iterations"] + "x" + params["Stage1_Iter_Limit"] + " "
+        + params["Stage2_Iterations"] + "x" + params["Stage2_Iter_Limit"] + " "
+        + params["Stage3_Iterations"] + "x" + params["Stage3_Iter_Limit"]
+    )
+    # A setting measured twice in a run keeps its last measurement
+    return df.drop_duplicates(["Query", "Setting"], keep="last").reset_index(drop=True)
+
+
+def pareto_mask(points):
+    """Boolean mask of the non-dominated rows of an (n, k) array, all objectives minimized."""
+    points = np.asarray(points, dtype=float)
+    mask = np.ones(len(points), dtype=bool)
+    for i, point in enumerate(points):
+        dominated = np.all(points <= point, axis=1) & np.any(points < point, axis=1)
+        mask[i] = not dominated.any()
+    return mask
+
+
+def frontier(df, with_peak=False):
+    """df with an On_Frontier column, computed per query."""
+    objectives = ["Wall_Time", "Final_Cost"] + (["Peak_Nodes"] if with_peak else [])
+    df = df.copy()
+    df["On_Frontier"] = False
+    for _, group in df.groupby("Query"):
+        df.loc[group.index, "On_Frontier"] = pareto_mask(group[objectives].to_numpy())
+    return df
+
+
+def summarize(df):
+    """
+    Per setting: the queries where it is on the frontier, the geometric mean
+    of its wall time and the worst ratio of its final cost against the
+    defaults on the same query. Settings that are fast without a worse plan
+    come first.
+    """
+    reference = df[df["Setting"] == DEFAULT_SETTING].set_index("Query")[["Wall_Time", "Final_Cost"]]
+    df = df.join(reference, on="Query", rsuffix="_Default")
+    df["Time_Ratio"] = df["Wall_Time"] / df["Wall_Time_Default"]
+    df["Cost_Ratio"] = df["Final_Cost"] / df["Final_Cost_Default"]
+    summary = df.groupby("Setting").agg(
+        Frontier_Queries=("On_Frontier", "sum"),
+        Time_Ratio=("Time_Ratio", lambda ratios: float(np.exp(np.log(ratios.clip(lower=1e-12)).mean()))),
+        Worst_Cost_Ratio=("Cost_Ratio", "max"),
+        Total_Time=("Wall_Time", "sum"),
+        Max_Peak_Nodes=("Peak_Nodes", "max"),
+    ).reset_index()
+    summary["No_Worse_Plans"] = summary["Worst_Cost_Ratio"] <= 1
+    return summary.sort_values(
+        ["No_Worse_Plans", "Time_Ratio", "Frontier_Queries"], ascending=[False, True, False], ignore_index=True
+    )
+
+
+def plot_query(query, group):
+    """Wall time against final cost of every setting, the frontier highlighted."""
+    with rendering.subplots(figsize=(10, 6)) as (fig, ax):
+        others = group[~group["On_Frontier"]]
+        front = group[group["On_Frontier"]].sort_values("Wall_Time")
+        ax.scatter(others["Wall_Time"], others["Final_Cost"], color="#9AA5B1", label="Dominated", s=25)
+        ax.plot(front["Wall_Time"], front["Final_Cost"], color="#FC8B00", marker="o", label="Pareto frontier")
+        for _, row in front.iterrows():
+            ax.annotate(row["Setting"], (row["Wall_Time"], row["Final_Cost"]), fontsize=7,
+                        xytext=(4, 4), textcoords="offset points")
+        default = group[group["Setting"] == DEFAULT_SETTING]
+        ax.scatter(default["Wall_Time"], default["Final_Cost"], color="#4B0082", marker="*", s=150,
+                   label=f"Default ({DEFAULT_SETTING})", zorder=3)
+
+        ax.set_xlabel("Optimizer wall time (s)")
+        ax.set_ylabel("Final plan cost")
+        if group["Final_Cost"].max() > 100 * max(group["Final_Cost"].min(), 1e-12):
+            ax.set_yscale("log")
+        ax.set_title(f"{query}: stage parameters (iterations x iter_limit per stage)")
+        ax.legend()
+
+        output_file = rendering.output_path(f"{OUTPUT_DIR}/pareto_{query}.png")
+        plt.tight_layout()
+        rendering.save(fig, output_file, dpi=300, bbox_inches="tight")
+        print(f"✅ Plot saved: {output_file}")
+
+
+def _plot_task(query, path):
+    """Render worker entry: reload the frontier of one query from the written CSV."""
+    df = pd.read_csv(path)
+    plot_query(query, df[df["Query"] == query])
+
+
+def analyze(run_id=None, with_peak=False, jobs=1, tuning_dir=TUNING_DIR):
+    df = load_run(run_id, tuning_dir)
+    if df is None or df.empty:
+        print("❌ No tuning results found, run tuning.py first")
+        return None
+    df = frontier(df, with_peak)
+    frontier_file = os.path.join(tuning_dir, "pareto_frontier.csv")
+    df.to_csv(frontier_file, index=False)
+    print(f"✅ Frontier saved: {frontier_file}")
+
+    summary = summarize(df)
+    summary_file = os.path.join(tuning_dir, "setting_summary.csv")
+    summary.to_csv(summary_file, index=False)
+    print(f"✅ Setting summary saved: {summary_file}")
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    queries = sorted(df["Query"].unique(), key=loader.query_sort_key)
+    render_pool.run_tasks(_plot_task, [(query, frontier_file) for query in queries], jobs)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pareto frontier of the optimizer stage parameters")
+    parser.add_argument("--run-id", help="run of tuning.csv to analyze (default: the last one)")
+    parser.add_argument("--with-peak", action="store_true", help="also minimize the peak e-graph size")
+    parser.add_argument("--top", type=int, default=10, help="settings printed (the CSV has all of them)")
+    render_pool.add_jobs_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    rendering.configure_from_args(args)
+
+    summary = analyze(args.run_id, args.with_peak, args.jobs)
+    if summary is not None:
+        with pd.option_context("display.width", 200, "display.float_format", "{:.4g}".format):
+            print(summary.head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the optimizer analysis scripts.
+
+The steps that run.sh used to chain as separate python3 processes are
+declared here as a dependency graph and executed in one warm interpreter:
+pandas, matplotlib and seaborn are imported once and the loader cache is
+shared between steps. Independent branches run concurrently on a thread
+pool. pyplot keeps global state and is not thread-safe, so steps that
+render hold PLOT_LOCK while data-only steps run alongside them; pass
+--jobs to let each rendering step fan its queries out across processes.
+
+Run from the repository root:
+    python3 src/planner/script/pipeline.py [--jobs N] [--force] [--steps ...]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import matplotlib
+
+matplotlib.use("Agg")
+# Pristine rcParams, restored around every step so no style leaks between them
+DEFAULT_RC = matplotlib.rcParams.copy()
+
+import classes_data_extractor  # noqa: E402
+import classes_histogram  # noqa: E402
+import expr_lines_extracter  # noqa: E402
+import expressions  # noqa: E402
+import extractor  # noqa: E402
+import global_query  # noqa: E402
+import graphics  # noqa: E402
+import manifest  # noqa: E402
+import rendering  # noqa: E402
+import rule_efficiency  # noqa: E402
+import rule_mostpop  # noqa: E402
+import rulesInfo_histogram  # noqa: E402
+
+PLOT_LOCK = threading.Lock()
+
+
+def _import_script(module_name, file_name):
+    """Import a script whose file name is not a valid module name."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so render_pool can find the script file of its functions
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+egg_merges = _import_script("egg_merges", "egg-merges.py")
+
+
+def build_steps(jobs):
+    """
+    The analysis DAG as {name: (dependencies, renders, callable)}.
+    Steps that render take PLOT_LOCK.
+    """
+    return {
+        "extract": ([], False, extractor.process_all_queries),
+        "expr_extract": ([], False, expr_lines_extracter.process_all_queries),
+        "classes_extract": ([], False, classes_data_extractor.process_all_queries),
+        "rule_efficiency": ([], False, rule_efficiency.build_ranking),
+        "graphics": (["extract"], True, lambda: graphics.process_all_files(jobs)),
+        "expressions": (["extract"], True, lambda: expressions.process_all_files(jobs)),
+        "global_query": (["extract"], True, global_query.build_cost_reduction),
+        "classes_histogram": ([], True, lambda: classes_histogram.process_all_queries(jobs)),
+        "egg_merges": ([], True, lambda: egg_merges.process_all_queries(jobs)),
+        "rule_mostpop": ([], True, lambda: rule_mostpop.process_all_queries(jobs)),
+        "rules_heatmap": ([], True, lambda: rulesInfo_histogram.process_all_queries(jobs)),
+    }
+
+
+def _run_step(name, renders, func):
+    """Run one step, returning (wall seconds, error or None)."""
+    if renders:
+        PLOT_LOCK.acquire()
+    start = time.perf_counter()
+    try:
+        if renders:
+            with matplotlib.rc_context(DEFAULT_RC):
+                func()
+        else:
+            func()
+        return time.perf_counter() - start, None
+    except Exception:
+        return time.perf_counter() - start, traceback.format_exc()
+    finally:
+        if renders:
+            PLOT_LOCK.release()
+
+
+def run_pipeline(steps, threads=None):
+    """
+    Execute the DAG, starting every step as soon as its dependencies
+    succeeded. Returns {name: (status, seconds)} with status "ok",
+    "failed" or "skipped" (a dependency failed).
+    """
+    pending = dict(steps)
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=threads or len(steps) or 1) as pool:
+        while pending or running:
+            # Drop steps whose dependencies failed or were skipped
+            for name, (deps, _, _) in list(pending.items()):
+                if any(results.get(dep, ("ok",))[0] != "ok" for dep in deps if dep in results):
+                    results[name] = ("skipped", 0.0)
+                    del pending[name]
+                    print(f"⚠️ Step {name} skipped: a dependency failed")
+
+            # Start every step whose dependencies are done
+            for name, (deps, renders, func) in list(pending.items()):
+                if all(dep in results or dep not in steps for dep in deps):
+                    print(f"\n▶️ Step {name} started")
+                    running[pool.submit(_run_step, name, renders, func)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"dependency cycle between steps: {', '.join(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                seconds, error = future.result()
+                if error:
+                    results[name] = ("failed", seconds)
+                    print(f"❌ Step {name} failed after {seconds:.2f}s:\n{error}")
+                else:
+                    results[name] = ("ok", seconds)
+                    print(f"✅ Step {name} finished in {seconds:.2f}s")
+
+    return results
+
+
+def print_report(results, total):
+    print("\n==============================================")
+    print(f"{'Step':<20}{'Status':<10}{'Wall time':>12}")
+    for name, (status, seconds) in results.items():
+        print(f"{name:<20}{status:<10}{seconds:>11.2f}s")
+    print(f"{'total':<30}{total:>11.2f}s")
+    print("==============================================")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the optimizer analysis scripts as one pipeline")
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="worker processes per rendering step (1 = serial, 0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="steps running at the same time (default: all ready steps)",
+    )
+    parser.add_argument(
+        "--steps",
+        nargs="+",
+        metavar="STEP",
+        help="run only these steps (their dependencies are assumed to be up to date)",
+    )
+    manifest.add_force_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    manifest.set_force(args.force)
+    rendering.configure_from_args(args)
+
+    steps = build_steps(args.jobs)
+    if args.steps:
+        unknown = [name for name in args.steps if name not in steps]
+        if unknown:
+            parser.error(f"unknown step(s): {', '.join(unknown)} (choose from {', '.join(steps)})")
+        steps = {name: steps[name] for name in args.steps}
+
+    start = time.perf_counter()
+    results = run_pipeline(steps, args.threads)
+    print_report(results, time.perf_counter() - start)
+    if any(status != "ok" for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Parallel render mode shared by the per-query chart generators.
+
+run_tasks() fans one call per task out across a process pool. A failing
+task is reported and collected instead of stopping the run. Workers load
+the task function's script by file path, so hyphenated scripts such as
+egg-merges.py work under every multiprocessing start method. Each worker
+process keeps its own rendering templates (see rendering.py), which are
+cleared before every chart, so a task draws the same image whichever
+worker runs it and the output matches the serial path.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# script path -> module, per worker process
+_worker_modules = {}
+
+
+def add_jobs_argument(parser):
+    """Add the common --jobs option to an argparse parser."""
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes (1 = serial, 0 = one per CPU core)",
+    )
+
+
+def _resolve_jobs(jobs, n_tasks):
+    if jobs is None or jobs == 1:
+        return 1
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    return max(1, min(jobs, n_tasks))
+
+
+def _mp_context():
+    # Forking a process that has other threads running (pipeline.py) can
+    # deadlock the child on a lock held by another thread
+    if threading.active_count() > 1 and "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return None
+
+
+def _script_path(func):
+    module = sys.modules[func.__module__]
+    return os.path.abspath(module.__file__)
+
+
+def _load_script(path):
+    module = _worker_modules.get(path)
+    if module is None:
+        name = "_render_" + os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _worker_modules[path] = module
+    return module
+
+
+def _run_in_worker(path, func_name, args):
+    func = getattr(_load_script(path), func_name)
+    try:
+        return func(*args)
+    except Exception:
+        # Tracebacks do not survive pickling, send the formatted one back
+        raise RuntimeError(traceback.format_exc())
+
+
+def run_tasks(func, tasks, jobs=1):
+    """
+    Call func(*args) for every args tuple in tasks, serially (jobs=1) or
+    across a process pool. Returns the list of (args, error) failures.
+    """
+    tasks = [args if isinstance(args, tuple) else (args,) for args in tasks]
+    jobs = _resolve_jobs(jobs, len(tasks))
+    failures = []
+
+    if jobs == 1:
+        for args in tasks:
+            try:
+                func(*args)
+            except Exception:
+                failures.append((args, traceback.format_exc()))
+    else:
+        path = _script_path(func)
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=_mp_context()) as pool:
+            futures = [(args, pool.submit(_run_in_worker, path, func.__name__, args)) for args in tasks]
+            for args, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append((args, str(e)))
+
+    report_failures(func.__name__, len(tasks), failures)
+    return failures
+
+
+def report_failures(name, n_tasks, failures):
+    """Print a summary of the tasks that raised."""
+    if not failures:
+        return
+    print(f"\n⚠️ {len(failures)} of {n_tasks} {name} task(s) failed:")
+    for args, error in failures:
+        print(f"❌ {name}{args}:\n{error}")
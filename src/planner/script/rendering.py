@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Rendering layer shared by the chart scripts.
+
+- The Agg backend is fixed on import: charts are only ever written to disk.
+- Output resolution and format are selectable (--dpi, --format) and a
+  --preview mode renders quick low-resolution drafts without the tight
+  bounding-box pass. Settings travel through environment variables so
+  process-pool workers (render_pool.py) use them too, and params() folds
+  them into the rebuild manifest so changing them re-renders.
+- figure()/subplots() always close their figure, and template() hands out
+  a preconfigured figure per chart type that is cleared and reused instead
+  of rebuilt, so a full sweep keeps a constant number of figures alive.
+"""
+
+import os
+from contextlib import contextmanager
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+DPI_ENV = "PLANNER_RENDER_DPI"
+FORMAT_ENV = "PLANNER_RENDER_FORMAT"
+PREVIEW_ENV = "PLANNER_RENDER_PREVIEW"
+
+FORMATS = ["png", "svg", "pdf", "jpg", "webp"]
+PREVIEW_DPI = 72
+
+# Dark theme of the metric and operator charts
+DARK_FIGURE_COLOR = '#478ac9'
+DARK_AXES_COLOR = '#2e353b'
+
+# template name -> (figure, axes, initial subplot parameters, layout)
+_templates = {}
+
+
+def add_render_arguments(parser):
+    """Add the common --dpi, --format and --preview options to an argparse parser."""
+    parser.add_argument("--dpi", type=int, default=None, help="output resolution (default: 300)")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="output image format (default: png)")
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help=f"fast drafts: {PREVIEW_DPI} dpi and no tight bounding box",
+    )
+
+
+def configure(dpi=None, fmt=None, preview=False):
+    """Set the output settings for this and child processes."""
+    for name, value in ((DPI_ENV, dpi), (FORMAT_ENV, fmt), (PREVIEW_ENV, "1" if preview else None)):
+        if value:
+            os.environ[name] = str(value)
+        else:
+            os.environ.pop(name, None)
+
+
+def configure_from_args(args):
+    configure(args.dpi, args.format, args.preview)
+
+
+def settings():
+    """Current output settings as {"dpi", "format", "preview"}; dpi None means the chart's own."""
+    preview = bool(os.environ.get(PREVIEW_ENV))
+    dpi = os.environ.get(DPI_ENV)
+    return {
+        "dpi": PREVIEW_DPI if preview and not dpi else (int(dpi) if dpi else None),
+        "format": os.environ.get(FORMAT_ENV) or "png",
+        "preview": preview,
+    }
+
+
+def params(chart_params):
+    """Chart parameters for the rebuild manifest, with the effective output settings."""
+    current = settings()
+    return dict(
+        chart_params,
+        dpi=current["dpi"] or chart_params.get("dpi"),
+        format=current["format"],
+        preview=current["preview"],
+    )
+
+
+def output_path(path):
+    """path with the extension of the selected output format."""
+    return f"{os.path.splitext(path)[0]}.{settings()['format']}"
+
+
+def save(fig, path, dpi=300, **kwargs):
+    """
+    Save a figure with the selected resolution and format. path should come
+    from output_path(). Preview mode drops the bbox_inches='tight' pass.
+    """
+    current = settings()
+    if current["preview"]:
+        kwargs.pop("bbox_inches", None)
+    fig.savefig(path, dpi=current["dpi"] or dpi, format=current["format"], **kwargs)
+
+
+@contextmanager
+def figure(**kwargs):
+    """plt.figure(**kwargs) that is closed when the block exits, even on errors."""
+    fig = plt.figure(**kwargs)
+    try:
+        yield fig
+    finally:
+        plt.close(fig)
+
+
+@contextmanager
+def subplots(**kwargs):
+    """plt.subplots(**kwargs) as (fig, ax), closed when the block exits."""
+    fig, ax = plt.subplots(**kwargs)
+    try:
+        yield fig, ax
+    finally:
+        plt.close(fig)
+
+
+def _reset(fig, ax, subplotpars):
+    """Bring a template back to its freshly created state."""
+    for extra_ax in fig.axes:
+        if extra_ax is not ax:
+            fig.delaxes(extra_ax)
+    ax.cla()
+    for artist in fig.texts + fig.legends + fig.lines + fig.patches + fig.images:
+        artist.remove()
+    # What subplots_adjust() does, without its layout-engine compatibility check
+    fig.subplotpars.update(**subplotpars)
+    ax._set_position(ax.get_subplotspec().get_position(fig))
+
+
+@contextmanager
+def template(name, figsize, facecolor=None, axes_facecolor=None, **subplots_kwargs):
+    """
+    (fig, ax) of a figure created once per process for a chart type and
+    reused by later charts of that type: the figure, its size, layout and
+    colors are built once, and only the axes contents are redrawn. The
+    template is made current for plt.* calls and cleared on exit.
+    """
+    entry = _templates.get(name)
+    if entry is None:
+        fig, ax = plt.subplots(figsize=figsize, **subplots_kwargs)
+        if facecolor:
+            fig.patch.set_facecolor(facecolor)
+        subplotpars = {
+            key: getattr(fig.subplotpars, key)
+            for key in ("left", "right", "bottom", "top", "wspace", "hspace")
+        }
+        entry = (fig, ax, subplotpars, subplots_kwargs.get("layout"))
+        _templates[name] = entry
+
+    fig, ax, subplotpars, layout = entry
+    plt.figure(fig.number)
+    # tight_layout() leaves the figure without a layout engine, restore it
+    fig.set_layout_engine(layout)
+    if axes_facecolor:
+        ax.set_facecolor(axes_facecolor)
+    try:
+        yield fig, ax
+    finally:
+        _reset(fig, ax, subplotpars)
+
+
+def close_templates():
+    """Close every cached template figure."""
+    for fig, _, _, _ in _templates.values():
+        plt.close(fig)
+    _templates.clear()
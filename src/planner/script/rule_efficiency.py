@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Rank the rewrite rules by optimizer time spent per unit of cost reduction.
+
+Reads the stage_K_rule_timings.csv files the optimizer writes next to the
+rules_data of each query: the search time, apply time, matches and
+applications of every rule in every internal iteration of the last egg
+runner of a stage, with the iteration's rebuild time and the cost the
+runner started from and ended with.
+
+Rebuilding is caused by the unions the rules made, so each iteration's
+rebuild time is shared among its rules by applications; an iteration
+without applications shares it by search time instead. The runner's cost
+reduction, relative to its input cost, is shared the same way over the
+whole runner. A rule's ratio is its time in seconds per percentage point of
+cost reduction; rules that spend time without any reduction rank first.
+
+Run from the repository root:
+    python3 src/planner/script/rule_efficiency.py [--by-stage] [--top N]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import loader
+
+OUTPUT_DIR = "src/planner/outputs/rule_timings"
+
+
+def load_timings(outputs_dir=loader.OUTPUTS_DIR):
+    """Every rule timing row of every query in one frame, with a Query column."""
+    frames = [
+        df.assign(Query=query)
+        for (query, _), df in loader.load("rule_timings", outputs_dir=outputs_dir).items()
+    ]
+    if not frames:
+        return None
+    df = pd.concat(frames, ignore_index=True)
+    df["Rule_Name"] = df["Rule_Name"].astype(str)
+    return df
+
+
+def _share(values, weights, totals):
+    """values * weights / totals, 0 where the total is 0."""
+    return np.where(totals > 0, values * weights / totals.where(totals > 0, 1), 0.0)
+
+
+def attribute(df):
+    """Add each row's share of the rebuild time and of the cost reduction."""
+    stage = ["Query", "Stage"]
+    iteration = stage + ["Internal_Iteration"]
+    iteration_applications = df.groupby(iteration)["Applications"].transform("sum")
+    iteration_search = df.groupby(iteration)["Search_Time"].transform("sum")
+    stage_applications = df.groupby(stage)["Applications"].transform("sum")
+    # Iterations that applied nothing still rebuild, their searches pay for it
+    applied = iteration_applications > 0
+    rebuild_weights = df["Applications"].where(applied, df["Search_Time"])
+    rebuild_totals = iteration_applications.where(applied, iteration_search)
+
+    input_cost = df["Input_Cost"]
+    reduction = ((input_cost - df["Output_Cost"]) / input_cost.where(input_cost > 0, 1)).clip(lower=0)
+    reduction = reduction.where(input_cost > 0, 0.0)
+    return df.assign(
+        Rebuild_Share=_share(df["Rebuild_Time"], rebuild_weights, rebuild_totals),
+        Cost_Reduction=_share(reduction, df["Applications"], stage_applications),
+    )
+
+
+def rank_rules(df, by_stage=False):
+    """
+    One row per rule (per stage and rule with by_stage), least efficient
+    first: by seconds per percentage point of cost reduction, then by time.
+    """
+    group = ["Stage", "Rule_Name"] if by_stage else ["Rule_Name"]
+    ranked = attribute(df).groupby(group).agg(
+        Queries=("Query", "nunique"),
+        Matches=("Matches", "sum"),
+        Applications=("Applications", "sum"),
+        Search_Time=("Search_Time", "sum"),
+        Apply_Time=("Apply_Time", "sum"),
+        Rebuild_Share=("Rebuild_Share", "sum"),
+        Cost_Reduction=("Cost_Reduction", "sum"),
+    ).reset_index()
+
+    ranked["Total_Time"] = ranked["Search_Time"] + ranked["Apply_Time"] + ranked["Rebuild_Share"]
+    points = ranked["Cost_Reduction"] * 100
+    ranked["Time_Per_Reduction"] = np.where(points > 0, ranked["Total_Time"] / points.where(points > 0, 1), np.inf)
+    ranked = ranked.sort_values(["Time_Per_Reduction", "Total_Time"], ascending=False, ignore_index=True)
+    ranked["Rank"] = range(1, len(ranked) + 1)
+    return ranked
+
+
+def build_ranking(by_stage=False, outputs_dir=loader.OUTPUTS_DIR):
+    """Write the ranking to OUTPUT_DIR and return it, or None without timings."""
+    df = load_timings(outputs_dir)
+    if df is None:
+        print("❌ No rule timings found, run the optimizer first")
+        return None
+    ranked = rank_rules(df, by_stage)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    name = "rule_efficiency_by_stage.csv" if by_stage else "rule_efficiency.csv"
+    output_file = os.path.join(OUTPUT_DIR, name)
+    ranked.to_csv(output_file, index=False)
+    print(f"✅ Rule ranking saved: {output_file}")
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the rules by time per unit of cost reduction")
+    parser.add_argument("--by-stage", action="store_true", help="rank each rule separately in each stage")
+    parser.add_argument("--top", type=int, default=15, help="rules printed (the CSV has all of them)")
+    args = parser.parse_args()
+
+    ranked = build_ranking(args.by_stage)
+    if ranked is None:
+        return
+    columns = (["Stage"] if args.by_stage else []) + [
+        "Rank", "Rule_Name", "Applications", "Total_Time", "Cost_Reduction", "Time_Per_Reduction",
+    ]
+    with pd.option_context("display.width", 200, "display.float_format", "{:.4g}".format):
+        print(ranked[columns].head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
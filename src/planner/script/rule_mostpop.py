@@ -1,14 +1,23 @@
-import pandas as pd
+import argparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+import loader
+import render_pool
+import rendering
+
 # Base paths
 base_path = "src/planner/outputs/rules_stats"
 output_dir = "src/planner/outputs/bar_charts/rule_mostpop"
 os.makedirs(output_dir, exist_ok=True)
 
 def process_query(query):
+    # Scoped style, so other charts drawn in the same interpreter keep theirs
+    with sns.axes_style("whitegrid"):
+        _plot_top_rules(query)
+
+def _plot_top_rules(query):
     for stage in [2, 3]:  # Process stages 2 and 3
         file_path = f"{base_path}/{query}_data/stage_{stage}_rule_stats.csv"
         if not os.path.exists(file_path):
@@ -16,57 +25,65 @@ def process_query(query):
             continue
 
         try:
-            # Read the CSV file
-            data = pd.read_csv(file_path)
+            # Read the CSV file (shared cache)
+            data = loader.read_csv(file_path, loader.RULE_STATS_DTYPES)
 
             # Sort by 'Total_Applications' and get the top 5 rules
+            # (plain strings, so seaborn does not draw every unused category)
             top_5_rules = data.sort_values('Total_Applications', ascending=False).head(5)
+            top_5_rules = top_5_rules.astype({'Rule_Name': str})
 
             fig_width = max(10, len(top_5_rules) * 2)  # Largura mínima de 10, ajustada pelo número de barras
-            plt.figure(figsize=(fig_width, 6))
+            with rendering.figure(figsize=(fig_width, 6)) as fig:
            
-            # Create the plot with a fixed larger figure size
-            sns.set_style("whitegrid")
-            bars = sns.barplot(
-                x='Total_Applications', 
-                y='Rule_Name', 
-                data=top_5_rules,
-                palette=["#4B0082", "#FC8B00", "#009E73", "#94004FFF", "#0A9D9B"]
-            )
-            color=["#4B0082", "#FC8B00", "#009E73", "#94004FFF"],
-            # Add labels to the bars
-            for i, v in enumerate(top_5_rules['Total_Applications']):
-                bars.text(v + (0.05 * max(top_5_rules['Total_Applications'])), i, str(v), color='black', va='center')
+                # Create the plot with a fixed larger figure size
+                bars = sns.barplot(
+                    x='Total_Applications', 
+                    y='Rule_Name', 
+                    data=top_5_rules,
+                    palette=["#4B0082", "#FC8B00", "#009E73", "#94004FFF", "#0A9D9B"]
+                )
+                color=["#4B0082", "#FC8B00", "#009E73", "#94004FFF"],
+                # Add labels to the bars
+                for i, v in enumerate(top_5_rules['Total_Applications']):
+                    bars.text(v + (0.05 * max(top_5_rules['Total_Applications'])), i, str(v), color='black', va='center')
 
-            # Configure plot labels and title
-            plt.xlabel('Number of Applications', fontsize=12)
-            plt.ylabel(None)  # Remove a label do eixo Y
+                # Configure plot labels and title
+                plt.xlabel('Number of Applications', fontsize=12)
+                plt.ylabel(None)  # Remove a label do eixo Y
             
 
-            # Dynamically adjust the X-axis limits to ensure all numbers fit
-            max_value = max(top_5_rules['Total_Applications'])
-            plt.xlim(0, max_value * 1.2)  # Adicionar 20% de margem ao limite máximo
+                # Dynamically adjust the X-axis limits to ensure all numbers fit
+                max_value = max(top_5_rules['Total_Applications'])
+                plt.xlim(0, max_value * 1.2)  # Adicionar 20% de margem ao limite máximo
 
-            # Save the plot
-            output_file = f"{output_dir}/top_5_rules_stage{stage}_{query}.png"
-            plt.tight_layout()
-            plt.savefig(output_file, dpi=300, bbox_inches='tight')
-            print(f"✅ Plot saved: {output_file}")
-            plt.close()
+                # Save the plot
+                output_file = rendering.output_path(f"{output_dir}/top_5_rules_stage{stage}_{query}.png")
+                plt.tight_layout()
+                rendering.save(fig, output_file, dpi=300, bbox_inches='tight')
+                print(f"✅ Plot saved: {output_file}")
 
         except Exception as e:
             print(f"❌ Error processing {file_path}: {e}")
 
-def process_all_queries():
+def process_all_queries(jobs=1):
     # Process all query folders in the base path
+    tasks = []
     for query_folder in os.listdir(base_path):
         if query_folder.startswith("q") and query_folder.endswith("_data"):
             query = query_folder.split("_")[0]  # Extract query name (e.g., "q1")
             print(f"🔍 Processing query: {query}")
-            process_query(query)
+            tasks.append(query)
+
+    render_pool.run_tasks(process_query, tasks, jobs)
 
 def main():
-    process_all_queries()
+    parser = argparse.ArgumentParser(description="Top 5 most applied rules per query")
+    render_pool.add_jobs_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    rendering.configure_from_args(args)
+    process_all_queries(args.jobs)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,92 +1,169 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
-import glob
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 from collections import defaultdict
-import re
 
-def load_all_rule_files(query_folder, stage=None):
+import loader
+import manifest
+import render_pool
+import rendering
+
+# Render parameters recorded in the rebuild manifest
+HEATMAP_PARAMS = {"chart": "create_rule_application_heatmap", "figsize": (16, 10), "dpi": 300}
+
+# Above this many cells the heatmap is drawn without per-cell numbers
+ANNOT_MAX_CELLS = 1500
+
+# Columns the heatmap needs from a rules_application file
+HEATMAP_COLUMNS = ['Stage', 'External_Iteration', 'Internal_Iteration', 'Rule_Name', 'Applications']
+
+def rule_files(query_folder, stage=None):
     """
-    Load all rule files for a given query and stage.
-    If stage is None, load all stages.
+    Per-iteration rule files of a query as (stage, iteration, path),
+    sorted by stage and iteration. If stage is None, list all stages.
     """
-    base_dir = f"src/planner/outputs/rules_data/{query_folder}_data"
-    pattern = f"stage_{stage if stage else '*'}_iter_*_rules_application.csv"
-    all_files = glob.glob(os.path.join(base_dir, pattern))
-    
+    return [
+        (file_stage, file_iter, path)
+        for file_query, file_stage, file_iter, path in loader.scan("rules_data")
+        if file_query == query_folder and file_iter is not None
+        and (not stage or file_stage == int(stage))
+    ]
+
+def heatmap_output_path(query_folder, stage=None):
+    stage_str = f"stage{stage}" if stage else "all_stages"
+    return rendering.output_path(f"src/planner/outputs/bar_charts/rules_stats/{query_folder}/{stage_str}/rule_heatmap.png")
+
+def reduce_rule_applications(df, bucket_size=1, file_iter=None):
+    """
+    Sum the applications of one rules DataFrame per
+    (External_Iteration, Internal_Iteration bucket, Rule_Name).
+    Internal iterations are grouped into buckets of bucket_size, each
+    labelled by its first iteration.
+    """
+    if 'External_Iteration' not in df.columns:
+        df = df.assign(External_Iteration=file_iter)
+    # Filter rows with applied rules (not 'None')
+    df = df[df['Rule_Name'].notna() & (df['Rule_Name'] != 'None')]
+    internal = df['Internal_Iteration']
+    if bucket_size > 1:
+        internal = internal // bucket_size * bucket_size
+    return df.groupby(
+        [df['External_Iteration'], internal, df['Rule_Name'].astype(str)],
+        sort=False,
+    )['Applications'].sum()
+
+def aggregate_rule_files(query_folder, stage=None, bucket_size=1):
+    """
+    Stream the rule files of a query (all stages if stage is None), reducing
+    each one as soon as it is read so only the per-cell totals stay in memory.
+    Returns a Series indexed by (External_Iteration, Internal_Iteration,
+    Rule_Name), or None if there is nothing to plot.
+    """
+    all_files = rule_files(query_folder, stage)
     if not all_files:
-        print(f"❌ No files found for pattern: {os.path.join(base_dir, pattern)}")
+        print(f"❌ No rule files found for query {query_folder}, stage {stage if stage else 'All'}")
         return None
-    
-    # Sort files to process them in order
-    all_files.sort(key=lambda x: [int(n) if n.isdigit() else n for n in re.findall(r'\d+|[A-Za-z]+', x)])
-    
-    all_data = []
-    for file in all_files:
+
+    partials = []
+    for _, file_iter, file in all_files:
         try:
-            df = pd.read_csv(file)
-            # Extract stage and iteration info from the filename
-            match = re.search(r'stage_(\d+)_iter_(\d+)', file)
-            if match:
-                file_stage = match.group(1)
-                file_iter = match.group(2)
-                # Add columns to identify the source file if they don't exist
-                if 'Stage' not in df.columns:
-                    df['Stage'] = file_stage
-                if 'External_Iteration' not in df.columns:
-                    df['External_Iteration'] = file_iter
-                
-            all_data.append(df)
-            print(f"✅ Loaded: {file}")
+            df = loader.read_csv(file, loader.RULES_DATA_DTYPES, cache=False, usecols=HEATMAP_COLUMNS)
+            partials.append(reduce_rule_applications(df, bucket_size, file_iter))
         except Exception as e:
             print(f"❌ Error loading {file}: {e}")
-    
-    if not all_data:
+
+    partials = [part for part in partials if not part.empty]
+    if not partials:
         return None
-    
-    # Concatenate all DataFrames
-    return pd.concat(all_data, ignore_index=True)
+    totals = pd.concat(partials)
+    return totals.groupby(level=[0, 1, 2]).sum()
 
-def create_rule_application_heatmap(df, query_folder, stage=None):
+def build_rule_pivot(totals, top_k=None):
     """
-    Create a heatmap showing rule applications per iteration.
+    Pivot the per-cell totals into iterations x rules. With top_k, keep
+    only the k rules with the most applications, most applied first.
     """
-    # Filter rows with applied rules (not 'None')
-    df_rules = df[df['Rule_Name'] != 'None'].copy()
-    
-    # Create a pivot table with iterations as rows, rules as columns, and applications as values
-    pivot = df_rules.pivot_table(
-        index=['External_Iteration', 'Internal_Iteration'],
-        columns='Rule_Name',
-        values='Applications',
-        aggfunc='sum',
-        fill_value=0
-    )
-    
+    pivot = totals.unstack('Rule_Name', fill_value=0)
+    pivot.index.names = ['External_Iteration', 'Internal_Iteration']
+    pivot.columns.name = 'Rule_Name'
+    if top_k and top_k < pivot.shape[1]:
+        ranking = pivot.sum().sort_values(ascending=False, kind='stable')
+        pivot = pivot[ranking.index[:top_k]]
+    return pivot
+
+def draw_rule_heatmap(pivot, query_folder, stage=None, n_rules=None, bucket_size=1):
+    """
+    Draw and save an iterations x rules heatmap. Cells are only annotated
+    while the grid stays below ANNOT_MAX_CELLS.
+    """
+    annotate = pivot.size <= ANNOT_MAX_CELLS
+
     # Configure the heatmap
-    plt.figure(figsize=(16, 10))
-    ax = sns.heatmap(pivot, cmap="YlOrRd", annot=True, fmt=".0f", linewidths=.5)
-    
-    plt.title(f"Rule Applications Heatmap - Query {query_folder}, Stage {stage if stage else 'All'}", fontsize=16)
-    plt.ylabel("Iteration (External, Internal)")
-    plt.xlabel("Rule")
-    plt.xticks(rotation=45, ha="right")
+    with rendering.figure(figsize=(16, 10)) as fig:
+        ax = sns.heatmap(
+            pivot,
+            cmap="YlOrRd",
+            annot=annotate,
+            fmt=".0f",
+            linewidths=.5 if annotate else 0,
+        )
+
+        title = f"Rule Applications Heatmap - Query {query_folder}, Stage {stage if stage else 'All'}"
+        if n_rules and n_rules > pivot.shape[1]:
+            title += f" (top {pivot.shape[1]} of {n_rules} rules)"
+        plt.title(title, fontsize=16)
+        if bucket_size > 1:
+            plt.ylabel(f"Iteration (External, Internal in buckets of {bucket_size})")
+        else:
+            plt.ylabel("Iteration (External, Internal)")
+        plt.xlabel("Rule")
+        plt.xticks(rotation=45, ha="right")
     
-    # Save the heatmap
-    stage_str = f"stage{stage}" if stage else "all_stages"
-    output_dir = f"src/planner/outputs/bar_charts/rules_stats/{query_folder}/{stage_str}"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = f"{output_dir}/rule_heatmap.png"
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=300)
-    plt.close()
+        # Save the heatmap
+        output_path = heatmap_output_path(query_folder, stage)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        plt.tight_layout()
+        rendering.save(fig, output_path, dpi=300)
     print(f"✅ Heatmap saved as: {output_path}")
 
-def process_all_queries():
+def create_rule_application_heatmap(df, query_folder, stage=None, top_k=None, bucket_size=1):
+    """
+    Create a heatmap showing rule applications per iteration.
+    """
+    totals = reduce_rule_applications(df, bucket_size).groupby(level=[0, 1, 2]).sum()
+    n_rules = totals.index.get_level_values('Rule_Name').nunique()
+    draw_rule_heatmap(build_rule_pivot(totals, top_k), query_folder, stage, n_rules, bucket_size)
+
+def process_query(query_name, top_k=None, bucket_size=1):
+    """
+    Aggregate the rule files of one query and draw its heatmap.
+    """
+    print(f"\n🔍 Processing query: {query_name}")
+
+    # Skip if the heatmap was already rendered from these exact files
+    output_path = heatmap_output_path(query_name)
+    dependencies = [path for _, _, path in rule_files(query_name)] + [__file__]
+    params = dict(rendering.params(HEATMAP_PARAMS), top_k=top_k, bucket_size=bucket_size, annot_max_cells=ANNOT_MAX_CELLS)
+    if manifest.skip_if_up_to_date([output_path], dependencies, params):
+        return
+
+    # Aggregate all rule files for the query
+    totals = aggregate_rule_files(query_name, bucket_size=bucket_size)
+    if totals is None:
+        print(f"❌ No data found for query: {query_name}")
+        return
+
+    # Create heatmaps for all stages
+    n_rules = totals.index.get_level_values('Rule_Name').nunique()
+    draw_rule_heatmap(build_rule_pivot(totals, top_k), query_name, n_rules=n_rules, bucket_size=bucket_size)
+    manifest.record([output_path], dependencies, params)
+
+def process_all_queries(jobs=1, top_k=None, bucket_size=1):
     """
     Process all queries in the rules_data directory.
     """
@@ -96,22 +173,24 @@ def process_all_queries():
         return
 
     # Iterate over all query folders
+    tasks = []
     for query_folder in os.listdir(base_dir):
         if query_folder.endswith("_data") and query_folder.startswith("q"):
-            query_name = query_folder.split("_")[0]  # Extract query name (e.g., "q1")
-            print(f"\n🔍 Processing query: {query_name}")
-            
-            # Load all rule files for the query
-            df = load_all_rule_files(query_name)
-            if df is None:
-                print(f"❌ No data found for query: {query_name}")
-                continue
-            
-            # Create heatmaps for all stages
-            create_rule_application_heatmap(df, query_name)
+            tasks.append((query_folder.split("_")[0], top_k, bucket_size))  # Extract query name (e.g., "q1")
+
+    render_pool.run_tasks(process_query, tasks, jobs)
 
 def main():
-    process_all_queries()
+    parser = argparse.ArgumentParser(description="Rule application heatmaps per query")
+    parser.add_argument("--top-k", type=int, default=None, help="only plot the K most applied rules")
+    parser.add_argument("--bucket", type=int, default=1, help="group internal iterations in buckets of this size")
+    render_pool.add_jobs_argument(parser)
+    manifest.add_force_argument(parser)
+    rendering.add_render_arguments(parser)
+    args = parser.parse_args()
+    manifest.set_force(args.force)
+    rendering.configure_from_args(args)
+    process_all_queries(args.jobs, args.top_k, args.bucket)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
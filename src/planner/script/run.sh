@@ -19,29 +19,10 @@ run_all_steps() {
         cargo run --release -- -f tests/mytests/q${query_num}.sql
     done
 
-    echo -e "\n${ORANGE}Extracting data...${NC}"
-    python3 src/planner/script/extractor.py
-
-    echo -e "\n${ORANGE}Generating histograms...${NC}"
-    python3 src/planner/script/graphics.py
-
-    echo -e "\n${ORANGE}Extracting class data...${NC}"
-    python3 src/planner/script/classes_data_extractor.py
-
-    echo -e "\n${ORANGE}Generating class histograms for all stages...${NC}"
-    python3 src/planner/script/classes_histogram.py
-
-    echo -e "\n${ORANGE}Generating Egg Merge histograms...${NC}"
-    python3 src/planner/script/egg-merges.py
-
-    echo -e "\n${ORANGE}Generating most popular rules graphs...${NC}"
-    python3 src/planner/script/rule_mostpop.py
-
-    echo -e "\n${ORANGE}Generating rule application heatmaps...${NC}"
-    python3 src/planner/script/rulesInfo_histogram.py
-
-    echo -e "\n${ORANGE}Generating global query cost reduction graphs...${NC}"
-    python3 src/planner/script/global_query.py
+    # Extraction, histograms, heatmaps and cost reduction graphs run as one
+    # dependency graph inside a single Python process (see pipeline.py)
+    echo -e "\n${ORANGE}Running analysis pipeline...${NC}"
+    python3 src/planner/script/pipeline.py --jobs 0
 
     end_time=$(date +%s)
     duration=$((end_time - start_time))
@@ -93,6 +74,12 @@ run_optimizer_only() {
     echo -e "${GREEN}==============================================${NC}"
 }
 
+# Function to optimize all queries concurrently (see sweep.py)
+run_parallel_sweep() {
+    echo -e "\n${ORANGE}Optimizing all queries in parallel...${NC}"
+    python3 src/planner/script/sweep.py
+}
+
 # Main menu
 while true; do
     clear
@@ -100,6 +87,7 @@ while true; do
     echo -e "${ORANGE}1.${NC} Execute + Histograms: Query 1-22 "
     echo -e "${ORANGE}2.${NC} Execute a single query"
     echo -e "${ORANGE}3.${NC} Execute all queries"
+    echo -e "${ORANGE}4.${NC} Parallel sweep: Query 1-22 (Python binding)"
     echo -e "${ORANGE}0.${NC} Exit"
     echo -e "${BLUE}================================================== ${NC}"
 
@@ -115,6 +103,9 @@ while true; do
         3)
             run_optimizer_only
             ;;
+        4)
+            run_parallel_sweep
+            ;;
         0)
             echo -e "\n${ORANGE}Exiting...${NC}"
             exit 0
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Parallel optimizer sweep over the TPC-H queries in tests/mytests.
+
+Each query file is optimized by its own in-memory database through the
+Python binding (build it first with `maturin develop`), so workers share
+no state: the query a report belongs to is given to each database's
+telemetry sink explicitly. Workers are threads by default, since the
+binding releases the GIL while it optimizes, or processes with
+--mode process.
+
+Every sweep gets a run id. Its outputs go under src/planner/outputs/runs:
+    runs/<run_id>/    the CSV layout of src/planner/outputs (query_data,
+                      rules_data, ...), for loader.load(..., outputs_dir=...)
+    runs/sweeps.csv   one row per query, statement and stage of every run,
+                      tagged with its run id
+
+Run from the repository root:
+    python3 src/planner/script/sweep.py [--queries 1 5 ...] [--workers N] [--mode thread|process]
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+QUERIES_DIR = os.path.join("tests", "mytests")
+RUNS_DIR = os.path.join("src", "planner", "outputs", "runs")
+DETAILS = ["counts", "histogram", "full"]
+
+# Columns of the merged dataset, one row per query, statement and stage
+SWEEP_HEADER = [
+    "Run_ID", "Query", "Statement", "Stage", "Cost", "Relational_Nodes", "Classes",
+    "Min_Nodes", "Max_Nodes", "Avg_Nodes", "Merge_Count", "EGraph_Size", "Stage_Time",
+    "Query_Time",
+]
+
+
+def optimize_query(query, path, run_dir=None, detail="full"):
+    """
+    Optimize the statements of one query file in a fresh database.
+    Returns (query, stage rows without the run id, wall time of the query).
+    """
+    import risinglight
+
+    with open(path, encoding="utf-8") as file:
+        sql = file.read()
+    # One database per query, on the worker's own thread
+    db = risinglight.open_in_memory(runtime="current_thread")
+    if run_dir is not None:
+        db.set_telemetry(run_dir, query, detail)
+    start = time.perf_counter()
+    reports = db.optimizer_report(sql, detail)
+    elapsed = time.perf_counter() - start
+    db.flush_telemetry()
+
+    rows = []
+    for statement, report in enumerate(reports):
+        for stage in report["stages"]:
+            rows.append([
+                query, statement, stage["stage"], stage["cost"], stage["relational_nodes"],
+                stage["classes"], stage["min_nodes"], stage["max_nodes"],
+                round(stage["avg_nodes"], 2), stage["merge_count"], stage["egraph_size"],
+                stage["time"], elapsed,
+            ])
+    return query, rows, elapsed
+
+
+def query_files(numbers, queries_dir=QUERIES_DIR):
+    """The {query: path} of the given query numbers, skipping missing files."""
+    files = {}
+    for number in numbers:
+        path = os.path.join(queries_dir, f"q{number}.sql")
+        if os.path.isfile(path):
+            files[f"q{number}"] = path
+        else:
+            print(f"⚠️ Query file not found: {path}")
+    return files
+
+
+def sweep(numbers=range(1, 23), workers=None, mode="thread", detail="full",
+          run_id=None, runs_dir=RUNS_DIR, telemetry=True):
+    """
+    Optimize the given queries concurrently and append their statistics to
+    runs_dir/sweeps.csv under one run id. With telemetry, each query also
+    writes the usual CSV files under runs_dir/run_id.
+    Returns (run_id, rows of this run).
+    """
+    run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+    run_dir = os.path.join(runs_dir, run_id)
+    if os.path.exists(run_dir):
+        raise FileExistsError(f"run {run_id} already exists in {runs_dir}")
+    os.makedirs(run_dir)
+
+    files = query_files(numbers)
+    pool = ThreadPoolExecutor if mode == "thread" else ProcessPoolExecutor
+    results = {}
+    with pool(max_workers=workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(optimize_query, query, path, run_dir if telemetry else None, detail): query
+            for query, path in files.items()
+        }
+        for future in as_completed(futures):
+            query, rows, elapsed = future.result()
+            results[query] = rows
+            print(f"✅ {query}: {elapsed:.2f}s")
+
+    # Merged in query order, whatever order the workers finished in
+    rows = [
+        [run_id, *row]
+        for query in sorted(results, key=lambda q: int(q[1:]))
+        for row in results[query]
+    ]
+    sweeps = os.path.join(runs_dir, "sweeps.csv")
+    header = not os.path.exists(sweeps)
+    with open(sweeps, "a", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        if header:
+            writer.writerow(SWEEP_HEADER)
+        writer.writerows(rows)
+    return run_id, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize the TPC-H queries concurrently")
+    parser.add_argument("--queries", type=int, nargs="+", default=list(range(1, 23)), help="query numbers (default: 1-22)")
+    parser.add_argument("--workers", type=int, default=0, help="concurrent workers (0: one per core)")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread", help="run the workers as threads or processes")
+    parser.add_argument("--detail", choices=DETAILS, default="full", help="how much of each e-graph is inspected")
+    parser.add_argument("--run-id", help="tag of the run (default: the current time)")
+    parser.add_argument("--runs-dir", default=RUNS_DIR, help="directory of the runs and of sweeps.csv")
+    parser.add_argument("--no-telemetry", action="store_true", help="only append to sweeps.csv, without the per-query CSV files")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    run_id, rows = sweep(
+        args.queries,
+        workers=args.workers or None,
+        mode=args.mode,
+        detail=args.detail,
+        run_id=args.run_id,
+        runs_dir=args.runs_dir,
+        telemetry=not args.no_telemetry,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"✅ Run {run_id}: {len(rows)} stage rows in {elapsed:.2f}s, appended to {os.path.join(args.runs_dir, 'sweeps.csv')}")
+
+
+if __name__ == "__main__":
+    main()
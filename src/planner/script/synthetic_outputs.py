@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Synthetic optimizer outputs for benchmarking the analysis scripts.
+
+generate() writes a src/planner/outputs tree under a root directory with
+the same files and CSV schemas as the optimizer's writers
+(save_to_csv, save_class_details, save_egg_merges, save_rules_data,
+analyze_and_save_rule_statistics, calculate_and_save_total_costs,
+save_stage_expression and the rule timings), so every script under src/planner/script can run
+against it unchanged. Sizes are configurable: the number of queries, the
+appended runs per query, e-classes per stage and nodes per class, rules,
+external/internal iterations and expression length. Output is
+deterministic for a given seed.
+
+Run from any directory:
+    python3 src/planner/script/synthetic_outputs.py /tmp/synthetic --queries 1000
+"""
+
+import argparse
+import csv
+import os
+
+import numpy as np
+
+STAGES = [0, 1, 2, 3]
+RULE_STAGES = [1, 2, 3]
+# Cost the optimizer reports before the first stage (f32::MAX)
+UNOPTIMIZED_COST = "340282350000000000000000000000000000000"
+
+RELATIONAL_OPERATORS = ["Scan", "Proj", "Filter", "Join", "HashJoin", "HashAgg", "Order", "TopN", "Values"]
+SCALAR_OPERATORS = ["Eq", "And", "Gt", "GtEq", "Lt", "Add", "Mul", "List", "Column", "Constant", "Table"]
+
+# Rule names of the optimizer, extended with rule-N names beyond these
+RULE_NAMES = [
+    "add-comm", "mul-comm", "eq-comm", "and-comm", "and-assoc", "not-not",
+    "filter-merge", "pushdown-filter-join", "pushdown-filter-proj",
+    "pushdown-proj-filter", "pushdown-proj-order", "pushdown-proj-join",
+    "identical-proj", "join-swap", "join-rotate", "hash-join",
+    "proj-split", "filter-split", "limit-order-to-topn", "eq-trans",
+    "constant-fold-and", "and-true", "or-false", "agg-merge",
+]
+
+
+def _writer(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file = open(path, "w", newline="", encoding="utf-8")
+    return file, csv.writer(file, lineterminator="\n")
+
+
+def rule_names(n_rules):
+    return [RULE_NAMES[i] if i < len(RULE_NAMES) else f"rule-{i}" for i in range(n_rules)]
+
+
+def _node(rng, class_id, n_classes):
+    """One e-node in the Debug form of the dumps, e.g. Filter([3, 7])."""
+    if rng.random() < 0.35:
+        op = RELATIONAL_OPERATORS[rng.integers(len(RELATIONAL_OPERATORS))]
+    else:
+        op = SCALAR_OPERATORS[rng.integers(len(SCALAR_OPERATORS))]
+    if op == "Column":
+        return f"Column(${rng.integers(8)}.{rng.integers(16)})"
+    if op == "Constant":
+        return f"Constant(Int32({rng.integers(10000)}))"
+    if op == "Table":
+        return f"Table(${rng.integers(8)})"
+    children = rng.integers(0, max(class_id, 1), size=rng.integers(1, 4))
+    return f"{op}([{', '.join(str(child) for child in children)}])"
+
+
+def _expression(rng, n_nodes):
+    """A RecExpr Debug string of n_nodes nodes, with quoted string constants."""
+    nodes = []
+    for i in range(n_nodes):
+        if i % 17 == 5:
+            nodes.append(f'Constant(String("value-{rng.integers(1000)}"))')
+        else:
+            nodes.append(_node(rng, i, n_nodes))
+    return f"RecExpr {{ nodes: [{', '.join(nodes)}] }}"
+
+
+def write_rule_timings(path, stage, timing_rng, n_classes, names, internal_iterations):
+    """
+    stage_K_rule_timings.csv of the last runner of a stage: every rule is
+    searched in every internal iteration, about a third of them apply, and
+    the last iteration applies nothing (the runner saturated).
+    """
+    input_cost = float(timing_rng.uniform(1e15, 1e20))
+    output_cost = input_cost / timing_rng.uniform(1, 1000)
+    file, writer = _writer(path)
+    with file:
+        writer.writerow([
+            "Stage", "Internal_Iteration", "Rule_Name", "Matches", "Applications",
+            "Search_Time", "Apply_Time", "Rebuild_Time", "Input_Cost", "Output_Cost",
+        ])
+        for internal in range(internal_iterations):
+            saturated = internal == internal_iterations - 1
+            rebuild_time = timing_rng.exponential(2e-6 * n_classes)
+            for name in names:
+                applications = 0 if saturated or timing_rng.random() > 1 / 3 else int(timing_rng.geometric(0.2))
+                writer.writerow([
+                    stage, internal, name,
+                    applications + int(timing_rng.poisson(2)),
+                    applications,
+                    f"{timing_rng.exponential(1e-6 * n_classes):.9f}",
+                    f"{timing_rng.exponential(1e-7) * applications:.9f}",
+                    f"{rebuild_time:.9f}",
+                    f"{input_cost:.7g}",
+                    f"{output_cost:.7g}",
+                ])
+
+
+def write_query(root, query, rng, runs, classes, nodes_per_class, rules, iterations,
+                internal_iterations, expression_nodes, iteration_files, timing_rng=None):
+    """
+    Every output file of one query. The rule timings are drawn from their
+    own timing_rng, so the other files are the same with or without them.
+    """
+    outputs = os.path.join(root, "src", "planner", "outputs")
+    names = rule_names(rules)
+    query_num = int(query[1:])
+    # q15 runs two statements, so each run appends 4 extra stage rows
+    passes = 2 if query_num == 15 else 1
+
+    # Per-stage sizes of the last run, reused by the other datasets
+    stage_classes = {stage: max(1, int(classes * (1 + 0.6 * stage) * rng.uniform(0.8, 1.2))) for stage in STAGES}
+
+    file, writer = _writer(os.path.join(outputs, "query_data", f"{query}_data.csv"))
+    with file:
+        writer.writerow(["Stage", "Custo", "Relacionais", "Classes_Total", "Min", "Max", "Media"])
+        for _ in range(runs * passes):
+            cost = float(rng.uniform(1e15, 1e20))
+            for stage in STAGES:
+                total = stage_classes[stage]
+                maximum = int(rng.integers(1, nodes_per_class * 4 + 2))
+                writer.writerow([
+                    stage,
+                    UNOPTIMIZED_COST if stage == 0 else f"{cost:.7g}",
+                    int(total * 0.2),
+                    total,
+                    1,
+                    maximum,
+                    f"{rng.uniform(1, maximum):.2f}",
+                ])
+                cost /= rng.uniform(10, 1000)
+
+    for stage in STAGES:
+        file, writer = _writer(os.path.join(outputs, "data_classes", query, f"stage_{stage}_classes.csv"))
+        with file:
+            writer.writerow(["Stage", "Class_ID", "Node_Count", "Nodes"])
+            n_classes = stage_classes[stage]
+            for class_id in range(n_classes):
+                count = int(min(rng.geometric(1 / nodes_per_class), nodes_per_class * 8))
+                nodes = "; ".join(_node(rng, class_id, n_classes) for _ in range(count))
+                writer.writerow([stage, class_id, count, nodes])
+
+    file, writer = _writer(os.path.join(outputs, "egg-merges", f"{query}_data", "egg_merges.csv"))
+    with file:
+        writer.writerow(["Stage", "Merge_Count", "HC_Size", "Num_Classes"])
+        for _ in range(runs):
+            for stage in STAGES:
+                n_classes = stage_classes[stage]
+                writer.writerow([stage, int(n_classes * rng.uniform(0, 2)), n_classes * nodes_per_class, n_classes])
+
+    for stage in RULE_STAGES:
+        applications = {}
+        rules_dir = os.path.join(outputs, "rules_data", f"{query}_data")
+        summary, summary_writer = _writer(os.path.join(rules_dir, f"stage_{stage}_rules_application.csv"))
+        with summary:
+            summary_writer.writerow(["Stage", "Internal_Iteration", "Class_Count", "Node_Count", "Rule_Name", "Applications"])
+            for external in range(iterations):
+                iteration_file = None
+                if iteration_files:
+                    iteration_file, iteration_writer = _writer(
+                        os.path.join(rules_dir, f"stage_{stage}_iter_{external}_rules_application.csv")
+                    )
+                    iteration_writer.writerow([
+                        "Stage", "External_Iteration", "Internal_Iteration",
+                        "Class_Count", "Node_Count", "Rule_Name", "Applications",
+                    ])
+                for internal in range(internal_iterations):
+                    n_classes = stage_classes[stage] + internal
+                    # Each iteration applies a random subset of the rules
+                    applied = rng.choice(rules, size=max(1, rules // 3), replace=False)
+                    for rule in applied:
+                        count = int(rng.geometric(0.2))
+                        name = names[rule]
+                        applications[name] = applications.get(name, 0) + count
+                        summary_writer.writerow([stage, internal, n_classes, n_classes * nodes_per_class, name, count])
+                        if iteration_file:
+                            iteration_writer.writerow([
+                                stage, external, internal, n_classes, n_classes * nodes_per_class, name, count,
+                            ])
+                if iteration_file:
+                    iteration_file.close()
+
+        if timing_rng is not None:
+            write_rule_timings(
+                os.path.join(rules_dir, f"stage_{stage}_rule_timings.csv"),
+                stage, timing_rng, stage_classes[stage], names, internal_iterations,
+            )
+
+        file, writer = _writer(os.path.join(outputs, "rules_stats", f"{query}_data", f"stage_{stage}_rule_stats.csv"))
+        with file:
+            writer.writerow(["Stage", "Rule_Name", "Total_Applications", "Rank"])
+            ranked = sorted(applications.items(), key=lambda item: (-item[1], item[0]))
+            for rank, (name, total) in enumerate(ranked, start=1):
+                writer.writerow([stage, name, total, rank])
+
+    file, writer = _writer(os.path.join(outputs, "expressions", query, "expressions.csv"))
+    with file:
+        writer.writerow(["Stage", "Expression"])
+        for _ in range(runs):
+            for stage in STAGES:
+                writer.writerow([stage, _expression(rng, expression_nodes)])
+
+    file, writer = _writer(os.path.join(outputs, "total_costs", f"{query}_data_total_cost.csv"))
+    with file:
+        writer.writerow(["Query", "Total_Cost"])
+        writer.writerow([query, f"{rng.uniform(0, 1e6):.3f}"])
+
+
+def generate(root, queries=22, runs=3, classes=60, nodes_per_class=3, rules=40, iterations=3,
+             internal_iterations=4, expression_nodes=200, iteration_files=True, seed=0):
+    """
+    Write a synthetic outputs tree under root/src/planner/outputs for
+    queries q1..qN. Returns the outputs directory.
+    """
+    for num in range(1, queries + 1):
+        rng = np.random.default_rng([seed, num])
+        timing_rng = np.random.default_rng([seed, num, 1])
+        write_query(root, f"q{num}", rng, runs, classes, nodes_per_class, rules, iterations,
+                    internal_iterations, expression_nodes, iteration_files, timing_rng)
+    return os.path.join(root, "src", "planner", "outputs")
+
+
+def add_generator_arguments(parser):
+    """Add the tree size options to an argparse parser."""
+    parser.add_argument("--queries", type=int, default=22, help="number of queries (q1..qN)")
+    parser.add_argument("--runs", type=int, default=3, help="optimizer runs appended to each file")
+    parser.add_argument("--classes", type=int, default=60, help="e-classes in stage 0 (later stages grow)")
+    parser.add_argument("--nodes-per-class", type=int, default=3, help="mean e-nodes per e-class")
+    parser.add_argument("--rules", type=int, default=40, help="distinct rewrite rules")
+    parser.add_argument("--iterations", type=int, default=3, help="external iterations per stage")
+    parser.add_argument("--internal-iterations", type=int, default=4, help="internal iterations per external one")
+    parser.add_argument("--expression-nodes", type=int, default=200, help="nodes in each RecExpr string")
+    parser.add_argument("--no-iteration-files", action="store_true", help="skip the stage_K_iter_I rule files")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def generate_from_args(root, args):
+    return generate(
+        root,
+        queries=args.queries,
+        runs=args.runs,
+        classes=args.classes,
+        nodes_per_class=args.nodes_per_class,
+        rules=args.rules,
+        iterations=args.iterations,
+        internal_iterations=args.internal_iterations,
+        expression_nodes=args.expression_nodes,
+        iteration_files=not args.no_iteration_files,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic optimizer outputs tree")
+    parser.add_argument("root", help="directory that receives src/planner/outputs")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    outputs = generate_from_args(args.root, args)
+    print(f"✅ Synthetic outputs for {args.queries} queries written to: {outputs}")
+
+
+if __name__ == "__main__":
+    main()
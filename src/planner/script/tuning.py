@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Grid sweep of the optimizer stage parameters over the TPC-H queries.
+
+Each optimizer stage runs egg `iterations` times with at most `iter_limit`
+egg iterations per run; the defaults are (2, 6), (4, 6) and (3, 8) for
+stages 1 to 3. This harness optimizes every query of tests/mytests under
+every setting of a grid through the Python binding (`maturin develop`
+first), and records per query and setting:
+    Wall_Time    optimizer wall time of stages 0 to 3 (median of --repeat)
+    Peak_Nodes   the most e-nodes in any e-graph of the run
+    Final_Cost   CostFn cost of the final plan
+
+No e-graph statistics are collected, so Wall_Time is the time a normal
+query spends in the optimizer.
+
+Only the stages given with --stages are swept; the others keep their
+defaults. Results are appended, tagged with a run id, to
+src/planner/outputs/tuning/tuning.csv for pareto.py.
+
+Timings are steadiest with the default single worker; more workers finish
+sooner but compete for cores.
+
+Run from the repository root:
+    python3 src/planner/script/tuning.py --stages 3 --iterations 1 2 3 4 --iter-limits 4 6 8 10
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import sweep
+
+TUNING_DIR = os.path.join("src", "planner", "outputs", "tuning")
+DEFAULT_PARAMS = [(2, 6), (4, 6), (3, 8)]
+
+TUNING_HEADER = [
+    "Run_ID", "Query",
+    "Stage1_Iterations", "Stage1_Iter_Limit",
+    "Stage2_Iterations", "Stage2_Iter_Limit",
+    "Stage3_Iterations", "Stage3_Iter_Limit",
+    "Wall_Time", "Peak_Nodes", "Final_Cost",
+]
+
+
+def grid(stages, iterations, iter_limits):
+    """Every setting (three (iterations, iter_limit) pairs) varying the given stages."""
+    choices = list(itertools.product(iterations, iter_limits))
+    settings = []
+    for combination in itertools.product(choices, repeat=len(stages)):
+        params = list(DEFAULT_PARAMS)
+        for stage, pair in zip(stages, combination):
+            params[stage - 1] = pair
+        settings.append(tuple(params))
+    return settings
+
+
+def measure(query, path, params, repeat=1):
+    """
+    Optimize one query file under one setting in a fresh database.
+    Returns (query, params, wall time, peak e-nodes, final cost).
+    """
+    import risinglight
+
+    with open(path, encoding="utf-8") as file:
+        sql = file.read()
+    times = []
+    for _ in range(repeat):
+        db = risinglight.open_in_memory(runtime="current_thread")
+        db.set_stage_params(list(params))
+        # Without a detail level no statistics are collected, so the time is the optimizer's own
+        reports = db.optimizer_report(sql, None)
+        stages = [stage for report in reports for stage in report["stages"]]
+        times.append(sum(stage["time"] for stage in stages))
+    peak_nodes = max((stage["peak_nodes"] for stage in stages), default=0)
+    # The query statements' final plans (one, except in multi-query files)
+    final_cost = sum(report["stages"][-1]["cost"] for report in reports)
+    return query, params, statistics.median(times), peak_nodes, final_cost
+
+
+def tune(numbers=range(1, 23), settings=None, workers=1, mode="thread", repeat=1,
+         run_id=None, tuning_dir=TUNING_DIR):
+    """
+    Measure every query under every setting and append the results to
+    tuning_dir/tuning.csv under one run id. Returns (run_id, rows).
+    """
+    run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+    settings = settings or [tuple(DEFAULT_PARAMS)]
+    # The defaults are always measured, as the reference of pareto.py
+    if tuple(DEFAULT_PARAMS) not in settings:
+        settings = [tuple(DEFAULT_PARAMS)] + list(settings)
+    files = sweep.query_files(numbers)
+    tasks = [(query, path, params) for params in settings for query, path in files.items()]
+    print(f"🔍 {len(settings)} settings x {len(files)} queries = {len(tasks)} runs")
+
+    rows = []
+    pool = ThreadPoolExecutor if mode == "thread" else ProcessPoolExecutor
+    with pool(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(measure, query, path, params, repeat) for query, path, params in tasks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            query, params, wall_time, peak_nodes, final_cost = future.result()
+            rows.append([run_id, query, *itertools.chain(*params), wall_time, peak_nodes, final_cost])
+            if done % 50 == 0 or done == len(tasks):
+                print(f"✅ {done}/{len(tasks)} runs")
+
+    rows.sort(key=lambda row: (int(row[1][1:]), row[2:8]))
+    os.makedirs(tuning_dir, exist_ok=True)
+    results = os.path.join(tuning_dir, "tuning.csv")
+    header = not os.path.exists(results)
+    with open(results, "a", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        if header:
+            writer.writerow(TUNING_HEADER)
+        writer.writerows(rows)
+    return run_id, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the optimizer stage parameters over the TPC-H queries")
+    parser.add_argument("--queries", type=int, nargs="+", default=list(range(1, 23)), help="query numbers (default: 1-22)")
+    parser.add_argument("--stages", type=int, nargs="+", choices=[1, 2, 3], default=[3], help="stages whose parameters are swept")
+    parser.add_argument("--iterations", type=int, nargs="+", default=[1, 2, 3, 4], help="egg runs per stage to try")
+    parser.add_argument("--iter-limits", type=int, nargs="+", default=[4, 6, 8], help="egg iteration limits to try")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per setting, the median wall time is kept")
+    parser.add_argument("--workers", type=int, default=1, help="concurrent runs (0: one per core)")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread", help="run the workers as threads or processes")
+    parser.add_argument("--run-id", help="tag of the run (default: the current time)")
+    parser.add_argument("--tuning-dir", default=TUNING_DIR, help="directory of tuning.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    settings = grid(sorted(set(args.stages)), args.iterations, args.iter_limits)
+    run_id, rows = tune(
+        args.queries,
+        settings,
+        workers=args.workers,
+        mode=args.mode,
+        repeat=args.repeat,
+        run_id=args.run_id,
+        tuning_dir=args.tuning_dir,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"✅ Run {run_id}: {len(rows)} results in {elapsed:.2f}s, appended to {os.path.join(args.tuning_dir, 'tuning.csv')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! A buffered sink writing optimizer statistics to CSV files in the background.
+//!
+//! The optimizer only queues each [`OptimizerReport`]. A background thread renders the queued
+//! reports into the CSV files read by the analysis scripts under `src/planner/script`, in
+//! batches: each file is opened and written once per batch, however many reports add rows to it.
+
+use std::collections::BTreeMap;
+use std::fs::{self, OpenOptions};
+use std::path::{Path, PathBuf};
+use std::sync::mpsc::{self, RecvTimeoutError};
+use std::sync::Arc;
+use std::time::Duration;
+use std::{fmt, io};
+
+use super::report::{OptimizerReport, StatsDetail};
+
+/// Queued reports are written at the latest after this long without new messages.
+const FLUSH_INTERVAL: Duration = Duration::from_secs(1);
+/// Queued reports are written as soon as there are this many.
+const BATCH_SIZE: usize = 64;
+
+const QUERY_DATA_HEADER: &[&str] = &[
+    "Stage",
+    "Custo",
+    "Relacionais",
+    "Classes_Total",
+    "Min",
+    "Max",
+    "Media",
+];
+const CLASSES_HEADER: &[&str] = &["Stage", "Class_ID", "Node_Count", "Nodes"];
+const EGG_MERGES_HEADER: &[&str] = &["Stage", "Merge_Count", "HC_Size", "Num_Classes"];
+const RULES_APPLICATION_HEADER: &[&str] = &[
+    "Stage",
+    "Internal_Iteration",
+    "Class_Count",
+    "Node_Count",
+    "Rule_Name",
+    "Applications",
+];
+const RULE_TIMINGS_HEADER: &[&str] = &[
+    "Stage",
+    "Internal_Iteration",
+    "Rule_Name",
+    "Matches",
+    "Applications",
+    "Search_Time",
+    "Apply_Time",
+    "Rebuild_Time",
+    "Input_Cost",
+    "Output_Cost",
+];
+const RULE_STATS_HEADER: &[&str] = &["Stage", "Rule_Name", "Total_Applications", "Rank"];
+const EXPRESSIONS_HEADER: &[&str] = &["Stage", "Expression"];
+const TOTAL_COST_HEADER: &[&str] = &["Query", "Total_Cost"];
+
+/// Where the statistics of optimizer runs are written, set in [`Config`](super::Config).
+///
+/// Clones share the background writer. Reports queued before the last clone is dropped are still
+/// written; [`TelemetrySink::flush`] waits for them.
+#[derive(Clone)]
+pub struct TelemetrySink {
+    /// The name of the query the reports belong to, e.g. `q1`.
+    query: Arc<str>,
+    output_dir: Arc<Path>,
+    /// How much of the e-graph the optimizer inspects for the recorded reports.
+    detail: StatsDetail,
+    sender: mpsc::Sender<Message>,
+}
+
+enum Message {
+    Report(Arc<str>, OptimizerReport),
+    /// Write everything queued so far, then signal the sender.
+    Flush(mpsc::Sender<()>),
+}
+
+impl TelemetrySink {
+    /// The directory the analysis scripts read from.
+    pub const DEFAULT_OUTPUT_DIR: &'static str = "src/planner/outputs";
+
+    /// Start a background writer under `output_dir`, recording [`StatsDetail::Full`] reports for
+    /// `query`.
+    pub fn new(output_dir: impl Into<PathBuf>, query: &str) -> Self {
+        let output_dir: Arc<Path> = output_dir.into().into();
+        let (sender, receiver) = mpsc::channel();
+        let writer = Writer {
+            output_dir: output_dir.clone(),
+            queue: vec![],
+        };
+        std::thread::Builder::new()
+            .name("optimizer-telemetry".into())
+            .spawn(move || writer.run(receiver))
+            .expect("failed to spawn the telemetry writer");
+        TelemetrySink {
+            query: query.into(),
+            output_dir,
+            detail: StatsDetail::default(),
+            sender,
+        }
+    }
+
+    /// Returns a sink sharing this writer that records reports with the given detail.
+    ///
+    /// The files that need more detail (`data_classes` below [`StatsDetail::Histogram`],
+    /// `expressions` below [`StatsDetail::Full`]) are not written.
+    pub fn with_detail(&self, detail: StatsDetail) -> Self {
+        TelemetrySink {
+            detail,
+            ..self.clone()
+        }
+    }
+
+    /// Returns a sink sharing this writer that records reports for another query.
+    pub fn with_query(&self, query: &str) -> Self {
+        TelemetrySink {
+            query: query.into(),
+            ..self.clone()
+        }
+    }
+
+    /// Returns the name of the query the reports belong to.
+    pub fn query(&self) -> &str {
+        &self.query
+    }
+
+    /// Returns the detail of the recorded reports.
+    pub fn detail(&self) -> StatsDetail {
+        self.detail
+    }
+
+    /// Returns the directory the CSV files are written to.
+    pub fn output_dir(&self) -> &Path {
+        &self.output_dir
+    }
+
+    /// Queue the report of an optimizer run.
+    pub fn record(&self, report: OptimizerReport) {
+        // fails only if the writer has panicked
+        let _ = self
+            .sender
+            .send(Message::Report(self.query.clone(), report));
+    }
+
+    /// Wait until all reports queued so far are written.
+    pub fn flush(&self) {
+        let (sender, receiver) = mpsc::channel();
+        if self.sender.send(Message::Flush(sender)).is_ok() {
+            let _ = receiver.recv();
+        }
+    }
+}
+
+impl fmt::Debug for TelemetrySink {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.debug_struct("TelemetrySink")
+            .field("query", &self.query)
+            .field("output_dir", &self.output_dir)
+            .field("detail", &self.detail)
+            .finish()
+    }
+}
+
+/// The background writer of a [`TelemetrySink`].
+struct Writer {
+    output_dir: Arc<Path>,
+    queue: Vec<(Arc<str>, OptimizerReport)>,
+}
+
+impl Writer {
+    fn run(mut self, receiver: mpsc::Receiver<Message>) {
+        loop {
+            let message = if self.queue.is_empty() {
+                receiver.recv().map_err(|_| RecvTimeoutError::Disconnected)
+            } else {
+                receiver.recv_timeout(FLUSH_INTERVAL)
+            };
+            match message {
+                Ok(Message::Report(query, report)) => {
+                    self.queue.push((query, report));
+                    if self.queue.len() >= BATCH_SIZE {
+                        self.write();
+                    }
+                }
+                Ok(Message::Flush(done)) => {
+                    self.write();
+                    let _ = done.send(());
+                }
+                Err(RecvTimeoutError::Timeout) => self.write(),
+                Err(RecvTimeoutError::Disconnected) => {
+                    self.write();
+                    return;
+                }
+            }
+        }
+    }
+
+    /// Write the queued reports.
+    fn write(&mut self) {
+        let mut files = Files::default();
+        for (query, report) in self.queue.drain(..) {
+            files.render(&query, &report);
+        }
+        for (path, file) in files.0 {
+            let path = self.output_dir.join(path);
+            if let Err(e) = file.write_to(&path) {
+                tracing::warn!(
+                    "failed to write optimizer telemetry to {}: {e}",
+                    path.display()
+                );
+            }
+        }
+    }
+}
+
+/// The rows of a batch, by file relative to the output directory.
+#[derive(Default)]
+struct Files(BTreeMap<PathBuf, CsvFile>);
+
+struct CsvFile {
+    /// Whether the rows are appended to the file, rather than replacing it.
+    append: bool,
+    header: &'static [&'static str],
+    rows: Vec<Vec<String>>,
+}
+
+impl Files {
+    /// Returns the rows appended to a file.
+    fn append(&mut self, path: PathBuf, header: &'static [&'static str]) -> &mut Vec<Vec<String>> {
+        &mut self.file(path, header, true).rows
+    }
+
+    /// Returns the rows replacing a file, dropping those of earlier reports in the batch.
+    fn replace(&mut self, path: PathBuf, header: &'static [&'static str]) -> &mut Vec<Vec<String>> {
+        let file = self.file(path, header, false);
+        file.rows.clear();
+        &mut file.rows
+    }
+
+    fn file(
+        &mut self,
+        path: PathBuf,
+        header: &'static [&'static str],
+        append: bool,
+    ) -> &mut CsvFile {
+        self.0.entry(path).or_insert_with(|| CsvFile {
+            append,
+            header,
+            rows: vec![],
+        })
+    }
+
+    /// Add the rows of a report, in the layout of the files read by the analysis scripts.
+    fn render(&mut self, query: &str, report: &OptimizerReport) {
+        let data = format!("{query}_data");
+        // some datasets are keyed by the query name before any '_'
+        let query_dir = query.split('_').next().unwrap_or(query);
+
+        for stage in &report.stages {
+            let s = stage.stage.to_string();
+            self.append(
+                Path::new("query_data").join(format!("{data}.csv")),
+                QUERY_DATA_HEADER,
+            )
+            .push(vec![
+                s.clone(),
+                stage.cost.to_string(),
+                stage.relational_nodes.to_string(),
+                stage.classes.to_string(),
+                stage.min_nodes.to_string(),
+                stage.max_nodes.to_string(),
+                format!("{:.2}", stage.avg_nodes),
+            ]);
+
+            if report.detail >= Some(StatsDetail::Histogram) {
+                let classes = self.replace(
+                    Path::new("data_classes")
+                        .join(query_dir)
+                        .join(format!("stage_{s}_classes.csv")),
+                    CLASSES_HEADER,
+                );
+                for class in &stage.class_details {
+                    classes.push(vec![
+                        s.clone(),
+                        class.class_id.to_string(),
+                        class.node_count.to_string(),
+                        class.nodes.join("; "),
+                    ]);
+                }
+            }
+
+            self.append(
+                Path::new("egg-merges").join(&data).join("egg_merges.csv"),
+                EGG_MERGES_HEADER,
+            )
+            .push(vec![
+                s.clone(),
+                stage.merge_count.to_string(),
+                stage.egraph_size.to_string(),
+                stage.classes.to_string(),
+            ]);
+
+            if report.detail >= Some(StatsDetail::Full) {
+                self.append(
+                    Path::new("expressions")
+                        .join(query_dir)
+                        .join("expressions.csv"),
+                    EXPRESSIONS_HEADER,
+                )
+                .push(vec![s.clone(), stage.expression.clone()]);
+            }
+
+            // stage 0 applies no rules
+            if stage.stage == 0 {
+                continue;
+            }
+            let applications = self.replace(
+                Path::new("rules_data")
+                    .join(&data)
+                    .join(format!("stage_{s}_rules_application.csv")),
+                RULES_APPLICATION_HEADER,
+            );
+            for (i, iteration) in stage.iterations.iter().enumerate() {
+                let row = |rule: &str, count: String| {
+                    vec![
+                        s.clone(),
+                        i.to_string(),
+                        iteration.classes.to_string(),
+                        iteration.nodes.to_string(),
+                        rule.to_string(),
+                        count,
+                    ]
+                };
+                for (rule, count) in &iteration.applied {
+                    applications.push(row(rule, count.to_string()));
+                }
+                if iteration.applied.is_empty() {
+                    applications.push(row("None", "0".to_string()));
+                }
+            }
+
+            // times in seconds; the rebuild time is the iteration's, repeated for each rule
+            let timings = self.replace(
+                Path::new("rules_data")
+                    .join(&data)
+                    .join(format!("stage_{s}_rule_timings.csv")),
+                RULE_TIMINGS_HEADER,
+            );
+            for (i, iteration) in stage.iterations.iter().enumerate() {
+                for rule in &iteration.rules {
+                    timings.push(vec![
+                        s.clone(),
+                        i.to_string(),
+                        rule.rule.clone(),
+                        rule.matches.to_string(),
+                        rule.applications.to_string(),
+                        rule.search_time.as_secs_f64().to_string(),
+                        rule.apply_time.as_secs_f64().to_string(),
+                        iteration.rebuild_time.as_secs_f64().to_string(),
+                        stage.input_cost.to_string(),
+                        stage.cost.to_string(),
+                    ]);
+                }
+            }
+
+            // q15 runs several statements, whose statistics are appended
+            let path = Path::new("rules_stats")
+                .join(&data)
+                .join(format!("stage_{s}_rule_stats.csv"));
+            let stats = if query.starts_with("q15") {
+                self.append(path, RULE_STATS_HEADER)
+            } else {
+                self.replace(path, RULE_STATS_HEADER)
+            };
+            for (rank, (rule, count)) in stage.rule_applications().into_iter().enumerate() {
+                stats.push(vec![
+                    s.clone(),
+                    rule,
+                    count.to_string(),
+                    (rank + 1).to_string(),
+                ]);
+            }
+        }
+
+        // the total cost is not tracked per stage, the file only marks the query as optimized
+        self.replace(
+            Path::new("total_costs").join(format!("{data}_total_cost.csv")),
+            TOTAL_COST_HEADER,
+        )
+        .push(vec![query.to_string(), "0".to_string()]);
+    }
+}
+
+impl CsvFile {
+    fn write_to(&self, path: &Path) -> io::Result<()> {
+        if let Some(parent) = path.parent() {
+            fs::create_dir_all(parent)?;
+        }
+        let file = OpenOptions::new()
+            .create(true)
+            .write(true)
+            .append(self.append)
+            .truncate(!self.append)
+            .open(path)?;
+        let header = !self.append || file.metadata()?.len() == 0;
+        let mut writer = csv::Writer::from_writer(file);
+        if header {
+            writer.write_record(self.header)?;
+        }
+        for row in &self.rows {
+            writer.write_record(row)?;
+        }
+        writer.flush()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::planner::StageReport;
+
+    #[test]
+    fn reports_are_written_in_batches() {
+        let dir = tempfile::tempdir().unwrap();
+        let sink = TelemetrySink::new(dir.path(), "q1");
+        let report = OptimizerReport {
+            detail: Some(StatsDetail::Full),
+            stages: (0..4)
+                .map(|stage| StageReport {
+                    stage,
+                    ..Default::default()
+                })
+                .collect(),
+        };
+        sink.record(report.clone());
+        sink.with_query("q2").record(report.clone());
+        sink.record(report);
+        sink.flush();
+
+        let query_data = fs::read_to_string(dir.path().join("query_data/q1_data.csv")).unwrap();
+        // one header, and one row per stage of each report
+        assert_eq!(query_data.lines().count(), 1 + 2 * 4);
+        assert!(query_data.starts_with("Stage,Custo,"));
+        assert!(dir.path().join("query_data/q2_data.csv").exists());
+        let rule_stats = dir
+            .path()
+            .join("rules_stats/q1_data/stage_3_rule_stats.csv");
+        assert_eq!(fs::read_to_string(rule_stats).unwrap().lines().count(), 1);
+        let rule_timings = dir
+            .path()
+            .join("rules_data/q1_data/stage_1_rule_timings.csv");
+        assert!(fs::read_to_string(rule_timings)
+            .unwrap()
+            .starts_with("Stage,Internal_Iteration,"));
+        assert!(dir.path().join("expressions/q1/expressions.csv").exists());
+    }
+
+    #[test]
+    fn files_needing_more_detail_are_skipped() {
+        let dir = tempfile::tempdir().unwrap();
+        let sink = TelemetrySink::new(dir.path(), "q1").with_detail(StatsDetail::Counts);
+        sink.record(OptimizerReport {
+            detail: Some(sink.detail()),
+            stages: vec![StageReport::default()],
+        });
+        sink.flush();
+
+        assert!(dir.path().join("query_data/q1_data.csv").exists());
+        assert!(dir
+            .path()
+            .join("egg-merges/q1_data/egg_merges.csv")
+            .exists());
+        assert!(!dir.path().join("data_classes").exists());
+        assert!(!dir.path().join("expressions").exists());
+    }
+}
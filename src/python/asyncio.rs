@@ -0,0 +1,113 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Awaitable queries for asyncio.
+//!
+//! A query is spawned on the tokio runtime and reports back to the event loop through an asyncio
+//! future: the task hands the result to the loop with `call_soon_threadsafe`, and a done callback
+//! on the future aborts the task when the future is cancelled.
+
+use std::sync::Arc;
+
+use pyo3::exceptions::{PyException, PyRuntimeError};
+use pyo3::prelude::*;
+use tokio::runtime::Runtime;
+use tokio::task::AbortHandle;
+
+use super::chunks_to_python_list;
+use crate::Database;
+
+/// Completes an asyncio future with a query result, unless it was cancelled in the meantime.
+///
+/// Scheduled on the event loop, which owns the future.
+#[pyclass]
+struct SetFutureResult {
+    future: PyObject,
+    result: Option<PyResult<PyObject>>,
+}
+
+#[pymethods]
+impl SetFutureResult {
+    fn __call__(&mut self, py: Python<'_>) -> PyResult<()> {
+        let future = self.future.bind(py);
+        if future.call_method0("done")?.is_truthy()? {
+            return Ok(());
+        }
+        match self.result.take() {
+            Some(Ok(rows)) => future.call_method1("set_result", (rows,))?,
+            Some(Err(e)) => future.call_method1("set_exception", (e.into_value(py),))?,
+            None => return Ok(()),
+        };
+        Ok(())
+    }
+}
+
+/// Aborts the query task when its future is cancelled. Added as a done callback of the future.
+#[pyclass]
+struct AbortOnCancel {
+    handle: AbortHandle,
+}
+
+#[pymethods]
+impl AbortOnCancel {
+    fn __call__(&self, future: &Bound<'_, PyAny>) -> PyResult<()> {
+        if future.call_method0("cancelled")?.is_truthy()? {
+            self.handle.abort();
+        }
+        Ok(())
+    }
+}
+
+/// Spawn a query on the runtime and return an asyncio future of its rows. With `profiling`, the
+/// query is profiled into the database's counters.
+///
+/// Must be called from a coroutine, the future belongs to the running event loop. The runtime
+/// must have worker threads to run the query while the event loop goes on.
+pub fn spawn_query(
+    py: Python<'_>,
+    runtime: &Runtime,
+    database: Arc<Database>,
+    sql: String,
+    profiling: bool,
+) -> PyResult<PyObject> {
+    if !super::runtime::runs_in_background(runtime) {
+        return Err(PyRuntimeError::new_err(
+            "query_async needs a multi-threaded runtime, the database uses a current_thread one",
+        ));
+    }
+    let event_loop = py
+        .import_bound("asyncio")?
+        .call_method0("get_running_loop")?;
+    let future = event_loop.call_method0("create_future")?;
+
+    let event_loop = event_loop.unbind();
+    let task_future = future.clone().unbind();
+    let handle = runtime.spawn(async move {
+        let result = if profiling {
+            database.run_profiled(&sql).await.map(|(chunks, _)| chunks)
+        } else {
+            database.run(&sql).await
+        };
+        Python::with_gil(|py| {
+            let result = match result {
+                Ok(chunks) => chunks_to_python_list(py, &chunks).map(|rows| rows.to_object(py)),
+                Err(e) => Err(PyException::new_err(e.to_string())),
+            };
+            let callback = SetFutureResult {
+                future: task_future,
+                result: Some(result),
+            };
+            // fails only if the loop has been closed, then nobody is waiting for the result
+            let _ = event_loop
+                .bind(py)
+                .call_method1("call_soon_threadsafe", (callback,));
+        });
+    });
+
+    future.call_method1(
+        "add_done_callback",
+        (AbortOnCancel {
+            handle: handle.abort_handle(),
+        },),
+    )?;
+    Ok(future.unbind())
+}
@@ -0,0 +1,224 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Columnar query results as NumPy arrays.
+//!
+//! Fixed-width columns are handed to NumPy through the buffer protocol: a [`ColumnBuffer`]
+//! keeps the underlying array alive and NumPy reads its memory in place. Only variable-length
+//! and non-native types (strings, blobs, decimals, intervals, vectors) are materialized into
+//! object arrays. Columns with nulls are returned as `numpy.ma.MaskedArray`.
+
+use std::ffi::{c_int, c_void, CStr};
+use std::ptr;
+
+use bitvec::vec::BitVec;
+use pyo3::exceptions::{PyBufferError, PyException};
+use pyo3::ffi;
+use pyo3::prelude::*;
+use pyo3::types::PyList;
+
+use super::values::array_to_objects;
+use crate::array::{ArrayImpl, ArrayImplValidExt, Chunk};
+use crate::types::THIRTY_YEARS_MICROSECONDS;
+
+/// Memory exposed by a [`ColumnBuffer`].
+enum BufferData {
+    /// A fixed-width array, shared with the result chunk.
+    Array(ArrayImpl),
+    /// A null mask built for the array (`true` for null).
+    Mask(Box<[bool]>),
+}
+
+/// A read-only, one-dimensional buffer over the values of a fixed-width column.
+#[pyclass(frozen)]
+pub struct ColumnBuffer {
+    data: BufferData,
+}
+
+/// Reinterpret a slice of plain values as its bytes.
+fn as_bytes<T>(values: &[T]) -> &[u8] {
+    // SAFETY: the element types exposed here are plain old data without padding.
+    unsafe {
+        std::slice::from_raw_parts(values.as_ptr() as *const u8, std::mem::size_of_val(values))
+    }
+}
+
+impl ColumnBuffer {
+    /// Whether the values of `array` can be exposed without copying.
+    fn is_fixed_width(array: &ArrayImpl) -> bool {
+        matches!(
+            array,
+            ArrayImpl::Bool(_)
+                | ArrayImpl::Int16(_)
+                | ArrayImpl::Int32(_)
+                | ArrayImpl::Int64(_)
+                | ArrayImpl::Float64(_)
+                | ArrayImpl::Date(_)
+                | ArrayImpl::Timestamp(_)
+                | ArrayImpl::TimestampTz(_)
+        )
+    }
+
+    /// Returns the raw bytes, the struct format and the item size of the buffer.
+    fn layout(&self) -> (&[u8], &'static CStr, usize) {
+        match &self.data {
+            BufferData::Array(ArrayImpl::Bool(a)) => (as_bytes(a.raw_data()), c"?", 1),
+            BufferData::Array(ArrayImpl::Int16(a)) => (as_bytes(a.raw_data()), c"h", 2),
+            BufferData::Array(ArrayImpl::Int32(a)) => (as_bytes(a.raw_data()), c"i", 4),
+            BufferData::Array(ArrayImpl::Int64(a)) => (as_bytes(a.raw_data()), c"q", 8),
+            BufferData::Array(ArrayImpl::Float64(a)) => (as_bytes(a.raw_data()), c"d", 8),
+            BufferData::Array(ArrayImpl::Date(a)) => (as_bytes(a.raw_data()), c"i", 4),
+            BufferData::Array(ArrayImpl::Timestamp(a)) => (as_bytes(a.raw_data()), c"q", 8),
+            BufferData::Array(ArrayImpl::TimestampTz(a)) => (as_bytes(a.raw_data()), c"q", 8),
+            BufferData::Array(_) => unreachable!("only fixed-width arrays are buffered"),
+            BufferData::Mask(mask) => (as_bytes(mask), c"?", 1),
+        }
+    }
+}
+
+#[pymethods]
+impl ColumnBuffer {
+    unsafe fn __getbuffer__(
+        slf: Bound<'_, Self>,
+        view: *mut ffi::Py_buffer,
+        flags: c_int,
+    ) -> PyResult<()> {
+        if view.is_null() {
+            return Err(PyBufferError::new_err("View is null"));
+        }
+        if (flags & ffi::PyBUF_WRITABLE) == ffi::PyBUF_WRITABLE {
+            return Err(PyBufferError::new_err("Column buffers are read-only"));
+        }
+        let (bytes, format, itemsize) = slf.get().layout();
+        // shape and strides, freed in `__releasebuffer__`
+        let dims = Box::into_raw(Box::new([
+            (bytes.len() / itemsize) as ffi::Py_ssize_t,
+            itemsize as ffi::Py_ssize_t,
+        ]));
+
+        (*view).buf = bytes.as_ptr() as *mut c_void;
+        (*view).len = bytes.len() as ffi::Py_ssize_t;
+        (*view).readonly = 1;
+        (*view).itemsize = itemsize as ffi::Py_ssize_t;
+        (*view).format = if (flags & ffi::PyBUF_FORMAT) == ffi::PyBUF_FORMAT {
+            format.as_ptr() as *mut _
+        } else {
+            ptr::null_mut()
+        };
+        (*view).ndim = 1;
+        (*view).shape = if (flags & ffi::PyBUF_ND) == ffi::PyBUF_ND {
+            &mut (*dims)[0]
+        } else {
+            ptr::null_mut()
+        };
+        (*view).strides = if (flags & ffi::PyBUF_STRIDES) == ffi::PyBUF_STRIDES {
+            &mut (*dims)[1]
+        } else {
+            ptr::null_mut()
+        };
+        (*view).suboffsets = ptr::null_mut();
+        (*view).internal = dims as *mut c_void;
+        // the view holds a reference to the buffer, and through it to the array
+        (*view).obj = slf.into_any().into_ptr();
+        Ok(())
+    }
+
+    unsafe fn __releasebuffer__(&self, view: *mut ffi::Py_buffer) {
+        drop(Box::from_raw((*view).internal as *mut [ffi::Py_ssize_t; 2]));
+    }
+}
+
+/// Convert one array of a data chunk into a NumPy array.
+fn array_to_numpy<'py>(
+    py: Python<'py>,
+    numpy: &Bound<'py, PyModule>,
+    array: &ArrayImpl,
+) -> PyResult<Bound<'py, PyAny>> {
+    let len = array.len();
+    let values = if ColumnBuffer::is_fixed_width(array) {
+        let (dtype, epoch) = match array {
+            ArrayImpl::Bool(_) => ("bool", None),
+            ArrayImpl::Int16(_) => ("int16", None),
+            ArrayImpl::Int32(_) | ArrayImpl::Date(_) => ("int32", None),
+            ArrayImpl::Timestamp(_) | ArrayImpl::TimestampTz(_) => {
+                ("int64", Some(THIRTY_YEARS_MICROSECONDS))
+            }
+            ArrayImpl::Int64(_) => ("int64", None),
+            _ => ("float64", None),
+        };
+        let buffer = Bound::new(
+            py,
+            ColumnBuffer {
+                data: BufferData::Array(array.clone()),
+            },
+        )?;
+        let values = numpy.call_method1("frombuffer", (buffer, dtype))?;
+        // dates and timestamps need a (vectorized) conversion to datetime64
+        match (array, epoch) {
+            (ArrayImpl::Date(_), _) => values.call_method1("astype", ("datetime64[D]",))?,
+            (_, Some(epoch)) => values
+                .call_method1("__sub__", (epoch,))?
+                .call_method1("view", ("datetime64[us]",))?,
+            _ => values,
+        }
+    } else {
+        let objects = PyList::new_bound(py, array_to_objects(py, array, 0..len)?);
+        numpy.call_method1("fromiter", (objects, "object"))?
+    };
+
+    let valid: &BitVec = array.get_valid_bitmap();
+    if valid.all() {
+        return Ok(values);
+    }
+    let mask: Box<[bool]> = valid.iter().by_vals().map(|v| !v).collect();
+    let buffer = Bound::new(
+        py,
+        ColumnBuffer {
+            data: BufferData::Mask(mask),
+        },
+    )?;
+    let mask = numpy.call_method1("frombuffer", (buffer, "bool"))?;
+    numpy
+        .getattr("ma")?
+        .call_method1("MaskedArray", (values, mask))
+}
+
+/// Convert query results into one NumPy array per column.
+///
+/// A column backed by a single data chunk shares its memory with the result; columns that span
+/// several data chunks are concatenated, which copies them once.
+pub fn chunks_to_numpy(py: Python<'_>, chunks: &[Chunk]) -> PyResult<Vec<PyObject>> {
+    let numpy = py.import_bound("numpy")?;
+
+    let mut columns: Vec<Vec<Bound<'_, PyAny>>> = vec![];
+    for data_chunk in chunks.iter().flat_map(|chunk| chunk.data_chunks()) {
+        if columns.is_empty() {
+            columns.resize_with(data_chunk.column_count(), Vec::new);
+        } else if columns.len() != data_chunk.column_count() {
+            return Err(PyException::new_err(
+                "cannot combine results with different numbers of columns",
+            ));
+        }
+        for (column, array) in columns.iter_mut().zip(data_chunk.arrays()) {
+            column.push(array_to_numpy(py, &numpy, array)?);
+        }
+    }
+
+    let ma = numpy.getattr("ma")?;
+    let masked_array = ma.getattr("MaskedArray")?;
+    columns
+        .into_iter()
+        .map(|mut pieces| {
+            if pieces.len() == 1 {
+                return Ok(pieces.pop().unwrap().unbind());
+            }
+            let masked = pieces
+                .iter()
+                .map(|piece| piece.is_instance(&masked_array))
+                .collect::<PyResult<Vec<_>>>()?
+                .into_iter()
+                .any(|m| m);
+            let concatenate = if masked { &ma } else { numpy.as_any() };
+            Ok(concatenate.call_method1("concatenate", (pieces,))?.unbind())
+        })
+        .collect()
+}
@@ -0,0 +1,154 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! A cursor streaming query results to Python batch by batch.
+
+use std::sync::Arc;
+
+use futures::stream::BoxStream;
+use futures::StreamExt;
+use pyo3::exceptions::PyException;
+use pyo3::prelude::*;
+use tokio::runtime::Runtime;
+
+use super::rows_to_python_list;
+use crate::array::DataChunk;
+use crate::Error;
+
+/// A cursor over the result of a query, returned by `PythonDatabase.execute`.
+///
+/// Each batch is one [`DataChunk`] produced by the executor. Only the current batch is held in
+/// memory, and the query keeps running in the background until it finishes or the cursor is
+/// closed. Iterating over the cursor yields batches as lists of rows. The GIL is released while
+/// waiting for a batch; a cursor should still be read from one thread at a time.
+#[pyclass]
+pub struct Cursor {
+    runtime: Arc<Runtime>,
+    /// The remaining output of the query, `None` once exhausted or closed.
+    stream: Option<BoxStream<'static, Result<DataChunk, Error>>>,
+    /// The current batch and the index of its next unread row.
+    batch: Option<(DataChunk, usize)>,
+    /// The default number of rows returned by `fetchmany`.
+    #[pyo3(get, set)]
+    arraysize: usize,
+}
+
+impl Cursor {
+    pub fn new(
+        runtime: Arc<Runtime>,
+        stream: BoxStream<'static, Result<DataChunk, Error>>,
+    ) -> Self {
+        Cursor {
+            runtime,
+            stream: Some(stream),
+            batch: None,
+            arraysize: 1,
+        }
+    }
+
+    /// Make sure there is an unread row in the current batch, pulling the next one if needed.
+    ///
+    /// Returns `false` when the result is exhausted.
+    fn fill(&mut self, py: Python<'_>) -> PyResult<bool> {
+        loop {
+            if matches!(&self.batch, Some((chunk, row)) if *row < chunk.cardinality()) {
+                return Ok(true);
+            }
+            self.batch = None;
+            let Some(stream) = &mut self.stream else {
+                return Ok(false);
+            };
+            let runtime = &self.runtime;
+            match py.allow_threads(|| runtime.block_on(stream.next())) {
+                Some(Ok(chunk)) => self.batch = Some((chunk, 0)),
+                Some(Err(e)) => {
+                    self.stream = None;
+                    return Err(PyException::new_err(e.to_string()));
+                }
+                None => {
+                    self.stream = None;
+                    return Ok(false);
+                }
+            }
+        }
+    }
+
+    /// Take up to `size` unread rows of the current batch.
+    fn take_rows(&mut self, py: Python<'_>, size: usize) -> PyResult<Vec<Vec<PyObject>>> {
+        let Some((chunk, row)) = &mut self.batch else {
+            return Ok(vec![]);
+        };
+        let end = chunk.cardinality().min(row.saturating_add(size));
+        let rows = rows_to_python_list(py, chunk, *row..end)?;
+        *row = end;
+        Ok(rows)
+    }
+}
+
+#[pymethods]
+impl Cursor {
+    /// Return the next row, or `None` when the result is exhausted.
+    pub fn fetchone(&mut self, py: Python<'_>) -> PyResult<Option<Vec<PyObject>>> {
+        if !self.fill(py)? {
+            return Ok(None);
+        }
+        Ok(self.take_rows(py, 1)?.pop())
+    }
+
+    /// Return up to `size` rows (default `arraysize`), an empty list when exhausted.
+    #[pyo3(signature = (size=None))]
+    pub fn fetchmany(
+        &mut self,
+        py: Python<'_>,
+        size: Option<usize>,
+    ) -> PyResult<Vec<Vec<PyObject>>> {
+        let size = size.unwrap_or(self.arraysize);
+        let mut rows = vec![];
+        while rows.len() < size && self.fill(py)? {
+            let mut batch = self.take_rows(py, size - rows.len())?;
+            rows.append(&mut batch);
+        }
+        Ok(rows)
+    }
+
+    /// Return all remaining rows.
+    pub fn fetchall(&mut self, py: Python<'_>) -> PyResult<Vec<Vec<PyObject>>> {
+        self.fetchmany(py, Some(usize::MAX))
+    }
+
+    /// Return the unread rows of the next batch, or `None` when the result is exhausted.
+    pub fn fetch_batch(&mut self, py: Python<'_>) -> PyResult<Option<Vec<Vec<PyObject>>>> {
+        if !self.fill(py)? {
+            return Ok(None);
+        }
+        Ok(Some(self.take_rows(py, usize::MAX)?))
+    }
+
+    /// Stop reading the result. The rest of the query execution is cancelled.
+    pub fn close(&mut self) {
+        // dropping the stream aborts the executor tasks
+        self.stream = None;
+        self.batch = None;
+    }
+
+    fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __next__(&mut self, py: Python<'_>) -> PyResult<Option<Vec<Vec<PyObject>>>> {
+        self.fetch_batch(py)
+    }
+
+    fn __enter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __exit__(
+        &mut self,
+        _exc_type: PyObject,
+        _exc_value: PyObject,
+        _traceback: PyObject,
+    ) -> bool {
+        self.close();
+        false
+    }
+}
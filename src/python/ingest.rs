@@ -0,0 +1,288 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Conversion of Python columns into arrays for bulk ingestion.
+//!
+//! NumPy arrays (and pyarrow arrays, through their NumPy view) of fixed-width columns are read
+//! through the buffer protocol in one copy. Other columns, and any Python sequence, are converted
+//! value by value.
+//!
+//! Buffers are only cast when no value changes: pyarrow arrays are cast by Arrow, which checks
+//! for overflow and truncation, and NumPy arrays are cast back to compare with the original.
+//! NumPy `datetime64` arrays are read as microseconds for timestamp columns.
+
+use pyo3::buffer::{Element, PyBuffer};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+use pyo3::types::IntoPyDict;
+
+use super::prepared::python_to_value;
+use crate::array::{ArrayBuilderImpl, ArrayImpl, PrimitiveArray};
+use crate::types::{
+    DataType, DataValue, NativeType, Timestamp, TimestampTz, THIRTY_YEARS_MICROSECONDS,
+};
+
+/// Number of rows per appended chunk.
+pub const DEFAULT_BATCH_SIZE: usize = 65536;
+
+/// Convert a column of Python values into an array of the given type.
+pub fn column_to_array(
+    py: Python<'_>,
+    column: &Bound<'_, PyAny>,
+    ty: &DataType,
+) -> PyResult<ArrayImpl> {
+    let numpy_dtype = match ty {
+        DataType::Bool => Some("uint8"),
+        DataType::Int16 => Some("int16"),
+        DataType::Int32 => Some("int32"),
+        DataType::Int64 => Some("int64"),
+        DataType::Float64 => Some("float64"),
+        _ => None,
+    };
+    let view = match numpy_dtype {
+        Some(dtype) => numpy_view(py, column, dtype)?,
+        None => None,
+    };
+    if let Some((data, mask)) = view {
+        let numpy = py.import_bound("numpy")?;
+        let mask = match mask {
+            Some(mask) => Some(read_buffer::<u8>(
+                py,
+                &numpy.call_method1("ascontiguousarray", (mask, "uint8"))?,
+            )?),
+            None => None,
+        };
+        return Ok(match ty {
+            DataType::Bool => ArrayImpl::new_bool(primitive(py, &data, mask, |v: u8| v != 0)?),
+            DataType::Int16 => ArrayImpl::new_int16(primitive(py, &data, mask, |v: i16| v)?),
+            DataType::Int32 => ArrayImpl::new_int32(primitive(py, &data, mask, |v: i32| v)?),
+            DataType::Int64 => ArrayImpl::new_int64(primitive(py, &data, mask, |v: i64| v)?),
+            _ => ArrayImpl::new_float64(primitive(py, &data, mask, |v: f64| v.into())?),
+        });
+    }
+
+    if let DataType::Timestamp | DataType::TimestampTz = ty {
+        if let Some((micros, mask)) = datetime64_view(py, column)? {
+            let numpy = py.import_bound("numpy")?;
+            let micros = read_buffer::<i64>(py, &micros)?;
+            let mask = read_buffer::<u8>(
+                py,
+                &numpy.call_method1("ascontiguousarray", (mask, "uint8"))?,
+            )?;
+            let values = unix_micros_to_timestamps(&micros, &mask)
+                .ok_or_else(|| PyValueError::new_err("timestamp out of range"))?;
+            return Ok(match ty {
+                DataType::Timestamp => ArrayImpl::new_timestamp(
+                    values.into_iter().map(|v| v.map(Timestamp::new)).collect(),
+                ),
+                _ => ArrayImpl::new_timestamp_tz(
+                    values
+                        .into_iter()
+                        .map(|v| v.map(TimestampTz::new))
+                        .collect(),
+                ),
+            });
+        }
+    }
+
+    // iterating a NumPy array yields NumPy scalars, convert them to Python values first
+    let column = if column.hasattr("tolist")? {
+        column.call_method0("tolist")?
+    } else {
+        column.clone()
+    };
+    let len = column.len()?;
+    let mut builder = ArrayBuilderImpl::with_capacity(len, ty);
+    for value in column.iter()? {
+        let value = python_to_value(&value?)?;
+        let value = match value {
+            DataValue::Null => DataValue::Null,
+            value => value
+                .cast(ty)
+                .map_err(|e| PyValueError::new_err(e.to_string()))?,
+        };
+        builder.push(&value);
+    }
+    Ok(builder.finish())
+}
+
+/// Returns the data, as a contiguous array of `dtype`, and the null mask of a NumPy (masked) or
+/// pyarrow array. `None` for other objects and for arrays that are not numeric or boolean.
+///
+/// Raises `ValueError` if a value that is not null does not fit in `dtype`.
+fn numpy_view<'py>(
+    py: Python<'py>,
+    column: &Bound<'py, PyAny>,
+    dtype: &str,
+) -> PyResult<Option<(Bound<'py, PyAny>, Option<Bound<'py, PyAny>>)>> {
+    let module = column.get_type().module()?.to_string();
+    if module.starts_with("pyarrow") && column.hasattr("is_null")? {
+        return arrow_view(py, column, dtype);
+    }
+    if !module.starts_with("numpy") || !column.hasattr("dtype")? {
+        return Ok(None);
+    }
+    let numpy = py.import_bound("numpy")?;
+    let ma = numpy.getattr("ma")?;
+    let (data, mask) = if ma.call_method1("isMaskedArray", (column,))?.is_truthy()? {
+        let mask = ma.call_method1("getmaskarray", (column,))?;
+        // the values under the mask are arbitrary, they must not fail the cast
+        let data =
+            numpy.call_method1("where", (&mask, 0, ma.call_method1("getdata", (column,))?))?;
+        (data, Some(mask))
+    } else {
+        (column.clone(), None)
+    };
+    let source = data.getattr("dtype")?;
+    let kind = source.getattr("kind")?.to_string();
+    if !"biuf".contains(kind.as_str()) {
+        return Ok(None);
+    }
+    let converted = numpy.call_method1("ascontiguousarray", (&data, dtype))?;
+    if !numpy
+        .call_method1("can_cast", (&source, dtype, "safe"))?
+        .is_truthy()?
+    {
+        let round_trip = converted.call_method1("astype", (&source,))?;
+        if !numpy
+            .call_method1("array_equal", (round_trip, &data))?
+            .is_truthy()?
+        {
+            return Err(PyValueError::new_err(format!(
+                "column of {source} has values that do not fit in {dtype}"
+            )));
+        }
+    }
+    Ok(Some((converted, mask)))
+}
+
+/// Returns the data and the null mask of a numeric or boolean pyarrow array, cast by Arrow to
+/// `dtype` so that integers keep their precision whatever their nulls.
+fn arrow_view<'py>(
+    py: Python<'py>,
+    column: &Bound<'py, PyAny>,
+    dtype: &str,
+) -> PyResult<Option<(Bound<'py, PyAny>, Option<Bound<'py, PyAny>>)>> {
+    let pyarrow = py.import_bound("pyarrow")?;
+    let types = pyarrow.getattr("types")?;
+    let source = column.getattr("type")?;
+    let mut numeric = false;
+    for check in ["is_boolean", "is_integer", "is_floating"] {
+        numeric |= types.call_method1(check, (&source,))?.is_truthy()?;
+    }
+    if !numeric {
+        return Ok(None);
+    }
+    // a safe cast raises ArrowInvalid, a ValueError, on overflow or truncation
+    let target = pyarrow.call_method1("type_for_alias", (dtype,))?;
+    let data = column
+        .call_method1("cast", (target,))
+        .map_err(|e| PyValueError::new_err(e.to_string()))?;
+    let kwargs = [("zero_copy_only", false)].into_py_dict_bound(py);
+    let mask = data
+        .call_method0("is_null")?
+        .call_method("to_numpy", (), Some(&kwargs))?;
+    // without nulls, to_numpy keeps the integer type instead of going through float64
+    let data = data
+        .call_method1("fill_null", (0,))?
+        .call_method("to_numpy", (), Some(&kwargs))?;
+    let data = py
+        .import_bound("numpy")?
+        .call_method1("ascontiguousarray", (data, dtype))?;
+    Ok(Some((data, Some(mask))))
+}
+
+/// Returns the microseconds since the Unix epoch, as a contiguous int64 array, and the null mask
+/// of a NumPy (masked) `datetime64` array. `None` for other objects. `NaT` values are null.
+fn datetime64_view<'py>(
+    py: Python<'py>,
+    column: &Bound<'py, PyAny>,
+) -> PyResult<Option<(Bound<'py, PyAny>, Bound<'py, PyAny>)>> {
+    let module = column.get_type().module()?.to_string();
+    if !module.starts_with("numpy") || !column.hasattr("dtype")? {
+        return Ok(None);
+    }
+    if column.getattr("dtype")?.getattr("kind")?.to_string() != "M" {
+        return Ok(None);
+    }
+    let numpy = py.import_bound("numpy")?;
+    let ma = numpy.getattr("ma")?;
+    let data = ma.call_method1("getdata", (column,))?;
+    let mask = numpy.call_method1(
+        "logical_or",
+        (
+            ma.call_method1("getmaskarray", (column,))?,
+            numpy.call_method1("isnat", (&data,))?,
+        ),
+    )?;
+    let micros = data
+        .call_method1("astype", ("datetime64[us]",))?
+        .call_method1("view", ("int64",))?;
+    let micros = numpy.call_method1("ascontiguousarray", (micros,))?;
+    Ok(Some((micros, mask)))
+}
+
+/// Convert microseconds since the Unix epoch into timestamps, which count from 2000-01-01, null
+/// where `mask` is set. `None` if a timestamp is out of range.
+fn unix_micros_to_timestamps(micros: &[i64], mask: &[u8]) -> Option<Vec<Option<i64>>> {
+    micros
+        .iter()
+        .zip(mask)
+        .map(|(&v, &null)| match null {
+            0 => v.checked_add(THIRTY_YEARS_MICROSECONDS).map(Some),
+            _ => Some(None),
+        })
+        .collect()
+}
+
+/// Copy a contiguous buffer into a vector.
+fn read_buffer<T: Element + Copy>(py: Python<'_>, data: &Bound<'_, PyAny>) -> PyResult<Vec<T>> {
+    PyBuffer::<T>::get_bound(data)?.to_vec(py)
+}
+
+/// Build a primitive array from a buffer and an optional null mask.
+fn primitive<T: Element + Copy, U: NativeType>(
+    py: Python<'_>,
+    data: &Bound<'_, PyAny>,
+    mask: Option<Vec<u8>>,
+    map: impl Fn(T) -> U,
+) -> PyResult<PrimitiveArray<U>> {
+    let values = read_buffer::<T>(py, data)?;
+    Ok(match mask {
+        Some(mask) => values
+            .into_iter()
+            .zip(mask)
+            .map(|(v, null)| (null == 0).then(|| map(v)))
+            .collect(),
+        None => values.into_iter().map(|v| Some(map(v))).collect(),
+    })
+}
+
+#[cfg(test)]
+mod tests {
+    use chrono::NaiveDateTime;
+
+    use super::*;
+
+    #[test]
+    fn sub_second_timestamps() {
+        let unix_micros = |text: &str| {
+            let time: NaiveDateTime = text.parse().unwrap();
+            time.and_utc().timestamp_micros()
+        };
+        let micros = [
+            unix_micros("2024-03-01T12:34:56.789012"),
+            unix_micros("1969-12-31T23:59:59.999999"),
+            i64::MAX,
+        ];
+        let values = unix_micros_to_timestamps(&micros, &[0, 0, 1]).unwrap();
+        // the timestamps `query_numpy` converts back to these datetime64 values
+        let expected = [
+            Some(micros[0] + THIRTY_YEARS_MICROSECONDS),
+            Some(micros[1] + THIRTY_YEARS_MICROSECONDS),
+            None,
+        ];
+        assert_eq!(values, expected);
+
+        assert!(unix_micros_to_timestamps(&micros, &[0, 0, 0]).is_none());
+    }
+}
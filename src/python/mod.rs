@@ -1,6 +1,10 @@
 // Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
 
+use std::collections::HashMap;
+use std::ops::Range;
 use std::path::PathBuf;
+use std::sync::atomic::{AtomicBool, Ordering};
+use std::sync::Arc;
 
 use pyo3::prelude::*;
 use tokio::runtime::Runtime;
@@ -8,100 +12,385 @@ use tokio::runtime::Runtime;
 use crate::storage::SecondaryStorageOptions;
 use crate::Database;
 
-#[pyclass]
+mod asyncio;
+mod columns;
+mod cursor;
+mod ingest;
+mod prepared;
+mod profile;
+mod runtime;
+mod values;
+
+pub use self::cursor::Cursor;
+pub use self::prepared::PythonPreparedStatement;
+
+/// A database handle. It can be shared between Python threads: queries run on the tokio runtime
+/// with the GIL released, so queries issued from several threads execute concurrently.
+#[pyclass(frozen)]
 pub struct PythonDatabase {
-    runtime: Runtime,
-    database: Database,
+    runtime: Arc<Runtime>,
+    database: Arc<Database>,
+    /// Whether queries are profiled into the cumulative counters, shared with the prepared
+    /// statements of the handle.
+    profiling: Arc<AtomicBool>,
 }
-use pyo3::exceptions::PyException;
+use pyo3::exceptions::{PyException, PyValueError};
+use pyo3::types::PyDict;
 
 use crate::array::Chunk;
+use crate::planner::{StageParams, StatsDetail, TelemetrySink};
+
+impl PythonDatabase {
+    fn new(runtime: Arc<Runtime>, database: Database) -> Self {
+        PythonDatabase {
+            runtime,
+            database: Arc::new(database),
+            profiling: Default::default(),
+        }
+    }
+
+    /// Run SQL on the runtime with the GIL released.
+    fn run(&self, py: Python<'_>, sql: &str) -> PyResult<Vec<Chunk>> {
+        let profiling = self.profiling.load(Ordering::Relaxed);
+        py.allow_threads(|| {
+            self.runtime.block_on(async {
+                if profiling {
+                    let (chunks, _) = self.database.run_profiled(sql).await?;
+                    Ok(chunks)
+                } else {
+                    self.database.run(sql).await
+                }
+            })
+        })
+        .map_err(|e: crate::Error| PyException::new_err(e.to_string()))
+    }
+}
 
 #[pymethods]
 impl PythonDatabase {
     pub fn query(&self, py: Python<'_>, sql: String) -> PyResult<Vec<Vec<PyObject>>> {
-        let result = self
-            .runtime
-            .block_on(async { self.database.run(&sql).await });
+        let chunks = self.run(py, &sql)?;
+        chunks_to_python_list(py, &chunks)
+    }
+
+    /// Run a query and return its rows together with a profile dict.
+    ///
+    /// The profile holds the wall time of parsing, and for each statement the time of binding,
+    /// of each optimizer stage (0 to 3) and of execution, with the busy time and output rows of
+    /// every executor operator. Times are in seconds.
+    pub fn query_profiled<'py>(
+        &self,
+        py: Python<'py>,
+        sql: String,
+    ) -> PyResult<(Vec<Vec<PyObject>>, Bound<'py, PyDict>)> {
+        let (chunks, query_profile) = py
+            .allow_threads(|| self.runtime.block_on(self.database.run_profiled(&sql)))
+            .map_err(|e| PyException::new_err(e.to_string()))?;
+        Ok((
+            chunks_to_python_list(py, &chunks)?,
+            profile::profile_to_dict(py, &query_profile)?,
+        ))
+    }
+
+    /// Optimize the queries in SQL and return one dict of optimizer statistics per query.
+    ///
+    /// Each dict holds the statistics of stages 0 to 3 that are otherwise written to the CSV
+    /// files under `src/planner/outputs`. No file is written unless `set_telemetry` was called.
+    /// Queries are not executed; other statements are run as usual.
+    ///
+    /// `detail` is one of `"counts"`, `"histogram"` or `"full"`: lower levels skip visiting
+    /// the e-classes or formatting their e-nodes. With `None`, no statistics are collected and
+    /// each stage only has its cost, peak e-graph size and time.
+    #[pyo3(signature = (sql, detail = Some("full")))]
+    pub fn optimizer_report<'py>(
+        &self,
+        py: Python<'py>,
+        sql: String,
+        detail: Option<&str>,
+    ) -> PyResult<Vec<Bound<'py, PyDict>>> {
+        let detail: Option<StatsDetail> = detail
+            .map(str::parse)
+            .transpose()
+            .map_err(PyValueError::new_err)?;
+        let reports = py
+            .allow_threads(|| {
+                self.runtime
+                    .block_on(self.database.optimizer_report(&sql, detail))
+            })
+            .map_err(|e| PyException::new_err(e.to_string()))?;
+        reports
+            .iter()
+            .map(|report| profile::report_to_dict(py, report))
+            .collect()
+    }
+
+    /// Write the optimizer statistics of the following queries to CSV files under `output_dir`,
+    /// in the layout of `src/planner/outputs`, as the statistics of `query` (e.g. `"q5"`).
+    ///
+    /// The files are written in the background; `flush_telemetry` waits for them. Without an
+    /// `output_dir`, no statistics are written.
+    #[pyo3(signature = (output_dir=None, query="", detail="full"))]
+    pub fn set_telemetry(
+        &self,
+        output_dir: Option<PathBuf>,
+        query: &str,
+        detail: &str,
+    ) -> PyResult<()> {
+        let detail: StatsDetail = detail.parse().map_err(PyValueError::new_err)?;
+        let telemetry = output_dir.map(|dir| TelemetrySink::new(dir, query).with_detail(detail));
+        self.database.set_telemetry(telemetry);
+        Ok(())
+    }
+
+    /// Wait until the optimizer statistics queued so far are written.
+    pub fn flush_telemetry(&self, py: Python<'_>) {
+        if let Some(telemetry) = self.database.telemetry() {
+            py.allow_threads(|| telemetry.flush());
+        }
+    }
+
+    /// Whether queries are profiled into the cumulative counters: those of `query`,
+    /// `query_numpy`, `query_async` and prepared statements. Cursors returned by `execute` are
+    /// not, as their last statement runs while the cursor is read.
+    #[getter]
+    pub fn get_profiling(&self) -> bool {
+        self.profiling.load(Ordering::Relaxed)
+    }
+
+    #[setter]
+    pub fn set_profiling(&self, profiling: bool) {
+        self.profiling.store(profiling, Ordering::Relaxed);
+    }
+
+    /// Returns the totals over all profiled queries as a dict.
+    pub fn profile_counters<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyDict>> {
+        profile::counters_to_dict(py, &self.database.profile_counters())
+    }
+
+    /// Reset the totals over all profiled queries.
+    pub fn reset_profile_counters(&self) {
+        self.database.reset_profile_counters();
+    }
+
+    /// Run a query from asyncio and return an awaitable of its rows.
+    ///
+    /// The query runs on the tokio runtime without blocking the event loop. Cancelling the
+    /// awaiting task aborts the query.
+    pub fn query_async(&self, py: Python<'_>, sql: String) -> PyResult<PyObject> {
+        let profiling = self.profiling.load(Ordering::Relaxed);
+        asyncio::spawn_query(py, &self.runtime, self.database.clone(), sql, profiling)
+    }
+
+    /// Parse a statement with parameters `$1`, `$2`, ... once, to be executed many times.
+    pub fn prepare(&self, sql: String) -> PyResult<PythonPreparedStatement> {
+        match self.database.prepare(&sql) {
+            Ok(statement) => Ok(PythonPreparedStatement::new(
+                self.runtime.clone(),
+                self.database.clone(),
+                self.profiling.clone(),
+                statement,
+            )),
+            Err(e) => Err(PyException::new_err(e.to_string())),
+        }
+    }
+
+    /// Returns the plan cache counters as a dict: hits, misses, evictions, invalidations, size
+    /// and capacity.
+    pub fn plan_cache_stats(&self) -> HashMap<&'static str, u64> {
+        let stats = self.database.plan_cache_stats();
+        HashMap::from([
+            ("hits", stats.hits),
+            ("misses", stats.misses),
+            ("evictions", stats.evictions),
+            ("invalidations", stats.invalidations),
+            ("size", stats.size as u64),
+            ("capacity", stats.capacity as u64),
+        ])
+    }
+
+    /// Set the number of optimized plans kept in the plan cache. 0 disables the cache.
+    pub fn set_plan_cache_capacity(&self, capacity: usize) {
+        self.database.set_plan_cache_capacity(capacity);
+    }
+
+    /// Set whether plain `query` calls also go through the plan cache, keyed by the statement
+    /// text. Off by default: only prepared statements are cached.
+    pub fn set_cache_queries(&self, enabled: bool) {
+        self.database.set_cache_queries(enabled);
+    }
+
+    /// Set the search effort of optimizer stages 1 to 3 as three `(iterations, iter_limit)`
+    /// pairs: egg is run `iterations` times per stage, with at most `iter_limit` iterations per
+    /// run. Without `params`, the defaults are restored.
+    #[pyo3(signature = (params=None))]
+    pub fn set_stage_params(&self, params: Option<Vec<(usize, usize)>>) -> PyResult<()> {
+        let params = match params {
+            Some(params) => StageParams {
+                stages: params.try_into().map_err(|_| {
+                    PyValueError::new_err("params must have one (iterations, iter_limit) per stage")
+                })?,
+            },
+            None => StageParams::default(),
+        };
+        self.database.set_stage_params(params);
+        Ok(())
+    }
+
+    /// Returns the `(iterations, iter_limit)` of optimizer stages 1 to 3.
+    pub fn stage_params(&self) -> Vec<(usize, usize)> {
+        self.database.stage_params().stages.to_vec()
+    }
+
+    /// Append columns to a table without going through SQL, returning the number of rows.
+    ///
+    /// `columns` maps column names to equally long NumPy arrays (masked arrays for nulls),
+    /// pyarrow arrays or Python sequences. Omitted columns are filled with nulls. Rows are
+    /// appended in chunks of `batch_size` rows in one transaction.
+    #[pyo3(signature = (table, columns, batch_size=ingest::DEFAULT_BATCH_SIZE))]
+    pub fn insert_columns(
+        &self,
+        py: Python<'_>,
+        table: String,
+        columns: &Bound<'_, PyDict>,
+        batch_size: usize,
+    ) -> PyResult<usize> {
+        let to_py_err = |e: crate::Error| PyException::new_err(e.to_string());
+        let names = columns
+            .keys()
+            .iter()
+            .map(|name| name.extract::<String>())
+            .collect::<PyResult<Vec<_>>>()?;
+        let types = self
+            .database
+            .column_types(&table, &names)
+            .map_err(to_py_err)?;
+        let arrays = columns
+            .values()
+            .iter()
+            .zip(&types)
+            .map(|(column, ty)| ingest::column_to_array(py, &column, ty))
+            .collect::<PyResult<Vec<_>>>()?;
+        let len = arrays.first().map_or(0, |array| array.len());
+        if arrays.iter().any(|array| array.len() != len) {
+            return Err(PyValueError::new_err("columns must have the same length"));
+        }
+        if batch_size == 0 {
+            return Err(PyValueError::new_err("batch_size must be positive"));
+        }
+
+        let data_chunk: DataChunk = arrays.into_iter().collect();
+        let chunks = (0..len)
+            .step_by(batch_size)
+            .map(|start| data_chunk.slice(start..len.min(start + batch_size)))
+            .collect();
+        py.allow_threads(|| {
+            self.runtime
+                .block_on(self.database.append(&table, &names, chunks))
+        })
+        .map_err(to_py_err)
+    }
+
+    /// Run a query and return a cursor over its result batches.
+    ///
+    /// Statements before the last one run to completion. The last one keeps executing in the
+    /// background while the cursor is read, and closing the cursor cancels it.
+    pub fn execute(&self, py: Python<'_>, sql: String) -> PyResult<Cursor> {
+        let result = py.allow_threads(|| self.runtime.block_on(self.database.run_stream(&sql)));
         match result {
-            Ok(chunks) => {
-                let mut rows = vec![];
-                for chunk in chunks {
-                    let mut table = datachunk_to_python_list(py, &chunk);
-                    rows.append(&mut table);
-                }
-                Ok(rows)
-            }
+            Ok(stream) => Ok(Cursor::new(self.runtime.clone(), stream)),
             Err(e) => Err(PyException::new_err(e.to_string())),
         }
     }
-}
 
-use pyo3::conversion::ToPyObject;
+    /// Run a query and return one NumPy array per column.
+    ///
+    /// Fixed-width columns share memory with the result, columns with nulls are returned as
+    /// `numpy.ma.MaskedArray`. Requires numpy to be installed.
+    pub fn query_numpy(&self, py: Python<'_>, sql: String) -> PyResult<Vec<PyObject>> {
+        let chunks = self.run(py, &sql)?;
+        columns::chunks_to_numpy(py, &chunks)
+    }
+}
 
 /// Open a database for user, user can specify the path of database file
+///
+/// `runtime` selects the tokio runtime: `"multi_thread"` (a new thread pool for this handle),
+/// `"shared"` (one thread pool for all handles of the process) or `"current_thread"` (no
+/// worker threads, queries run on the calling thread). `worker_threads` sets the size of the
+/// thread pool.
 #[pyfunction]
-pub fn open(path: String) -> PyResult<PythonDatabase> {
-    let runtime = tokio::runtime::Builder::new_multi_thread()
-        .enable_all()
-        .build()?;
+#[pyo3(signature = (path, runtime="multi_thread", worker_threads=None))]
+pub fn open(
+    py: Python<'_>,
+    path: String,
+    runtime: &str,
+    worker_threads: Option<usize>,
+) -> PyResult<PythonDatabase> {
+    let runtime = runtime::runtime(runtime, worker_threads)?;
     let mut options = SecondaryStorageOptions::default_for_cli();
     options.path = PathBuf::new().join(path);
 
-    let database = runtime.block_on(async move { Database::new_on_disk(options).await });
-    Ok(PythonDatabase { runtime, database })
+    let database =
+        py.allow_threads(|| runtime.block_on(async move { Database::new_on_disk(options).await }));
+    Ok(PythonDatabase::new(runtime, database))
 }
 
 /// Open a database for user in memory
+///
+/// `runtime` and `worker_threads` are the same as for `open`.
 #[pyfunction]
-pub fn open_in_memory() -> PyResult<PythonDatabase> {
-    let runtime = tokio::runtime::Builder::new_multi_thread()
-        .enable_all()
-        .build()?;
+#[pyo3(signature = (runtime="multi_thread", worker_threads=None))]
+pub fn open_in_memory(runtime: &str, worker_threads: Option<usize>) -> PyResult<PythonDatabase> {
+    let runtime = runtime::runtime(runtime, worker_threads)?;
     let database = Database::new_in_memory();
-    Ok(PythonDatabase { runtime, database })
+    Ok(PythonDatabase::new(runtime, database))
 }
 
 #[pymodule]
 fn risinglight(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(open, m)?)?;
     m.add_function(wrap_pyfunction!(open_in_memory, m)?)?;
+    m.add_class::<Cursor>()?;
+    m.add_class::<PythonPreparedStatement>()?;
     Ok(())
 }
 
-use crate::types::DataValue;
+use crate::array::DataChunk;
+/// Convert the outputs of all statements into one Python List
+pub fn chunks_to_python_list(py: Python, chunks: &[Chunk]) -> PyResult<Vec<Vec<PyObject>>> {
+    let mut rows = vec![];
+    for chunk in chunks {
+        let mut table = datachunk_to_python_list(py, chunk)?;
+        rows.append(&mut table);
+    }
+    Ok(rows)
+}
+
 /// Convert datachunk into Python List
-pub fn datachunk_to_python_list(py: Python, chunk: &Chunk) -> Vec<Vec<PyObject>> {
+pub fn datachunk_to_python_list(py: Python, chunk: &Chunk) -> PyResult<Vec<Vec<PyObject>>> {
     let mut output = vec![];
     for data_chunk in chunk.data_chunks() {
-        for row in 0..data_chunk.cardinality() {
-            let mut row_vec = vec![];
-
-            for array in data_chunk.arrays() {
-                let s = match array.get(row) {
-                    DataValue::Null => "null".to_object(py),
-                    DataValue::Bool(v) => v.to_object(py),
-                    DataValue::Int16(v) => v.to_object(py),
-                    DataValue::Int32(v) => v.to_object(py),
-                    DataValue::Int64(v) => (v).to_object(py),
-                    DataValue::Float64(v) => v.to_object(py),
-                    DataValue::String(s) => s.to_object(py),
-                    DataValue::Blob(s) => s.to_string().to_object(py),
-                    DataValue::Decimal(v) => v.to_string().to_object(py),
-                    DataValue::Date(v) => v.to_string().to_object(py),
-                    DataValue::Timestamp(v) => v.to_string().to_object(py),
-                    DataValue::TimestampTz(v) => v.to_string().to_object(py),
-                    DataValue::Interval(v) => v.to_string().to_object(py),
-                    DataValue::Vector(v) => v
-                        .iter()
-                        .map(|s| s.to_object(py))
-                        .collect::<Vec<_>>()
-                        .to_object(py),
-                };
-                row_vec.push(s);
-            }
-            output.push(row_vec);
+        let mut rows = rows_to_python_list(py, data_chunk, 0..data_chunk.cardinality())?;
+        output.append(&mut rows);
+    }
+    Ok(output)
+}
+
+/// Convert rows of a datachunk into Python Lists, converting one column at a time
+pub fn rows_to_python_list(
+    py: Python,
+    data_chunk: &DataChunk,
+    rows: Range<usize>,
+) -> PyResult<Vec<Vec<PyObject>>> {
+    let mut output: Vec<Vec<PyObject>> = rows
+        .clone()
+        .map(|_| Vec::with_capacity(data_chunk.column_count()))
+        .collect();
+    for array in data_chunk.arrays() {
+        let values = values::array_to_objects(py, array, rows.clone())?;
+        for (row, value) in output.iter_mut().zip(values) {
+            row.push(value);
         }
     }
-    output
+    Ok(output)
 }
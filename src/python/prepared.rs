@@ -0,0 +1,244 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Prepared statements with parameters.
+
+use std::sync::atomic::{AtomicBool, Ordering};
+use std::sync::Arc;
+
+use chrono::{Datelike, NaiveDate, NaiveDateTime, TimeDelta};
+use pyo3::exceptions::{PyException, PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::{
+    PyBool, PyDate, PyDateAccess, PyDateTime, PyDelta, PyDeltaAccess, PyFloat, PyInt, PyString,
+    PyTimeAccess, PyTuple,
+};
+use rust_decimal::Decimal;
+use tokio::runtime::Runtime;
+
+use super::chunks_to_python_list;
+use crate::types::{
+    DataValue, Date, Timestamp, TimestampTz, THIRTY_YEARS_MICROSECONDS, UNIX_EPOCH_DAYS,
+};
+use crate::{Database, PreparedStatement};
+
+/// A statement parsed once by `PythonDatabase.prepare` and executed with different parameters.
+///
+/// Optimized plans are shared through the database's plan cache, keyed by the statement and the
+/// types of its parameters, and reused for new values once found not to depend on them.
+#[pyclass(name = "PreparedStatement", frozen)]
+pub struct PythonPreparedStatement {
+    runtime: Arc<Runtime>,
+    database: Arc<Database>,
+    /// The profiling flag of the database handle that prepared the statement.
+    profiling: Arc<AtomicBool>,
+    statement: PreparedStatement,
+}
+
+impl PythonPreparedStatement {
+    pub fn new(
+        runtime: Arc<Runtime>,
+        database: Arc<Database>,
+        profiling: Arc<AtomicBool>,
+        statement: PreparedStatement,
+    ) -> Self {
+        PythonPreparedStatement {
+            runtime,
+            database,
+            profiling,
+            statement,
+        }
+    }
+}
+
+#[pymethods]
+impl PythonPreparedStatement {
+    /// Execute the statement with values for `$1`, `$2`, ... and return the rows.
+    #[pyo3(signature = (*params))]
+    pub fn query(
+        &self,
+        py: Python<'_>,
+        params: &Bound<'_, PyTuple>,
+    ) -> PyResult<Vec<Vec<PyObject>>> {
+        let params = params
+            .iter()
+            .map(|param| python_to_value(&param))
+            .collect::<PyResult<Vec<_>>>()?;
+        let profiling = self.profiling.load(Ordering::Relaxed);
+        let result = py.allow_threads(|| {
+            self.runtime.block_on(async {
+                if profiling {
+                    let (chunks, _) = self
+                        .database
+                        .execute_prepared_profiled(&self.statement, &params)
+                        .await?;
+                    Ok(chunks)
+                } else {
+                    self.database
+                        .execute_prepared(&self.statement, &params)
+                        .await
+                }
+            })
+        });
+        match result {
+            Ok(chunks) => chunks_to_python_list(py, &chunks),
+            Err(e) => Err(PyException::new_err(e.to_string())),
+        }
+    }
+
+    /// The SQL text of the statement.
+    #[getter]
+    pub fn sql(&self) -> &str {
+        self.statement.sql()
+    }
+}
+
+/// Convert a Python parameter into a value.
+///
+/// Supports `None`, `bool`, `int`, `float`, `str`, `decimal.Decimal`, `datetime.date` and
+/// `datetime.datetime`, and their subclasses such as `pandas.Timestamp`. Aware datetimes become
+/// timestamps with time zone, in UTC.
+pub(super) fn python_to_value(value: &Bound<'_, PyAny>) -> PyResult<DataValue> {
+    let invalid = |e: &dyn std::fmt::Display| PyValueError::new_err(format!("{value}: {e}"));
+    if value.is_none() {
+        return Ok(DataValue::Null);
+    }
+    if let Ok(b) = value.downcast::<PyBool>() {
+        return Ok(DataValue::Bool(b.is_true()));
+    }
+    if value.is_instance_of::<PyInt>() {
+        if let Ok(v) = value.extract::<i32>() {
+            return Ok(DataValue::Int32(v));
+        }
+        if let Ok(v) = value.extract::<i64>() {
+            return Ok(DataValue::Int64(v));
+        }
+        let text = value.str()?.to_string();
+        return parse_decimal(&text)
+            .map(DataValue::Decimal)
+            .map_err(|e| invalid(&e));
+    }
+    if value.is_instance_of::<PyFloat>() {
+        return Ok(DataValue::Float64(value.extract::<f64>()?.into()));
+    }
+    if let Ok(s) = value.downcast::<PyString>() {
+        return Ok(DataValue::String(s.to_str()?.to_string().into()));
+    }
+    // a datetime is also a date
+    if let Ok(time) = value.downcast::<PyDateTime>() {
+        let naive = NaiveDate::from_ymd_opt(
+            time.get_year(),
+            time.get_month().into(),
+            time.get_day().into(),
+        )
+        .and_then(|date| {
+            date.and_hms_micro_opt(
+                time.get_hour().into(),
+                time.get_minute().into(),
+                time.get_second().into(),
+                time.get_microsecond(),
+            )
+        })
+        .ok_or_else(|| invalid(&"invalid datetime"))?;
+        let offset = time.call_method0("utcoffset")?;
+        let offset = match offset.downcast::<PyDelta>() {
+            Ok(delta) => Some(
+                TimeDelta::days(delta.get_days().into())
+                    + TimeDelta::seconds(delta.get_seconds().into())
+                    + TimeDelta::microseconds(delta.get_microseconds().into()),
+            ),
+            Err(_) => None,
+        };
+        return datetime_value(naive, offset).ok_or_else(|| invalid(&"timestamp out of range"));
+    }
+    if let Ok(date) = value.downcast::<PyDate>() {
+        let date = NaiveDate::from_ymd_opt(
+            date.get_year(),
+            date.get_month().into(),
+            date.get_day().into(),
+        )
+        .ok_or_else(|| invalid(&"invalid date"))?;
+        return Ok(DataValue::Date(Date::new(
+            date.num_days_from_ce() - UNIX_EPOCH_DAYS,
+        )));
+    }
+    let decimal = value.py().import_bound("decimal")?.getattr("Decimal")?;
+    if value.is_instance(&decimal)? {
+        let text = value.str()?.to_string();
+        return parse_decimal(&text)
+            .map(DataValue::Decimal)
+            .map_err(|e| invalid(&e));
+    }
+    Err(PyTypeError::new_err(format!(
+        "unsupported parameter type: {}",
+        value.get_type().qualname()?
+    )))
+}
+
+/// Parse a decimal in plain or exponent notation, e.g. `1E-7` as `str(Decimal)` writes it.
+fn parse_decimal(text: &str) -> Result<Decimal, rust_decimal::Error> {
+    text.parse().or_else(|_| Decimal::from_scientific(text))
+}
+
+/// Convert a date and time into a timestamp. With the offset of its time zone from UTC, it
+/// becomes a timestamp with time zone, in UTC. `None` if out of range.
+fn datetime_value(time: NaiveDateTime, utc_offset: Option<TimeDelta>) -> Option<DataValue> {
+    let micros = |time: NaiveDateTime| {
+        time.and_utc()
+            .timestamp_micros()
+            .checked_add(THIRTY_YEARS_MICROSECONDS)
+    };
+    Some(match utc_offset {
+        None => DataValue::Timestamp(Timestamp::new(micros(time)?)),
+        Some(offset) => {
+            let utc = time.checked_sub_signed(offset)?;
+            DataValue::TimestampTz(TimestampTz::new(micros(utc)?))
+        }
+    })
+}
+
+#[cfg(test)]
+mod tests {
+    use chrono::DateTime;
+
+    use super::*;
+
+    fn datetime(text: &str) -> NaiveDateTime {
+        text.parse().unwrap()
+    }
+
+    #[test]
+    fn datetimes_keep_their_microseconds() {
+        let time = datetime("2024-03-01T12:34:56.789012");
+        let Some(DataValue::Timestamp(timestamp)) = datetime_value(time, None) else {
+            panic!("expected a timestamp");
+        };
+        // the conversion of query results back into datetimes
+        let output =
+            DateTime::from_timestamp_micros(timestamp.get_inner() - THIRTY_YEARS_MICROSECONDS)
+                .unwrap()
+                .naive_utc();
+        assert_eq!(output, time);
+    }
+
+    #[test]
+    fn aware_datetimes_are_stored_in_utc() {
+        let micros = |value| match value {
+            Some(DataValue::Timestamp(t)) => t.get_inner(),
+            Some(DataValue::TimestampTz(t)) => t.get_inner(),
+            value => panic!("expected a timestamp: {value:?}"),
+        };
+        let local = datetime("2024-03-01T10:00:00.5");
+        let aware = datetime_value(local, Some(TimeDelta::hours(8)));
+        assert!(matches!(aware, Some(DataValue::TimestampTz(_))));
+        let utc = datetime("2024-03-01T02:00:00.5");
+        assert_eq!(micros(aware), micros(datetime_value(utc, None)));
+    }
+
+    #[test]
+    fn decimals_in_exponent_notation() {
+        assert_eq!(parse_decimal("1E-7").unwrap(), Decimal::new(1, 7));
+        assert_eq!(parse_decimal("1.5E+2").unwrap(), Decimal::new(150, 0));
+        assert_eq!(parse_decimal("-12.345").unwrap(), Decimal::new(-12345, 3));
+        assert!(parse_decimal("NaN").is_err());
+    }
+}
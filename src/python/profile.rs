@@ -0,0 +1,140 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Query profiles and optimizer reports as Python dicts. Times are in seconds.
+
+use pyo3::prelude::*;
+use pyo3::types::{PyDict, PyList};
+
+use crate::planner::{OptimizerReport, StageReport, StatsDetail};
+use crate::{ProfileCounters, QueryProfile, StatementProfile};
+
+/// Convert a query profile into a dict:
+/// `{"parse", "total", "statements": [{"plan_cached", "bind", "optimizer_stages": [4 stages],
+/// "execute", "operators": [{"id", "name", "time", "rows"}]}]}`.
+pub fn profile_to_dict<'py>(
+    py: Python<'py>,
+    profile: &QueryProfile,
+) -> PyResult<Bound<'py, PyDict>> {
+    let dict = PyDict::new_bound(py);
+    dict.set_item("parse", profile.parse.as_secs_f64())?;
+    dict.set_item("total", profile.total.as_secs_f64())?;
+    let statements = PyList::empty_bound(py);
+    for statement in &profile.statements {
+        statements.append(statement_to_dict(py, statement)?)?;
+    }
+    dict.set_item("statements", statements)?;
+    Ok(dict)
+}
+
+fn statement_to_dict<'py>(
+    py: Python<'py>,
+    statement: &StatementProfile,
+) -> PyResult<Bound<'py, PyDict>> {
+    let dict = PyDict::new_bound(py);
+    dict.set_item("plan_cached", statement.plan_cached)?;
+    dict.set_item("bind", statement.bind.as_secs_f64())?;
+    dict.set_item(
+        "optimizer_stages",
+        statement.optimizer_stages.map(|time| time.as_secs_f64()),
+    )?;
+    dict.set_item("execute", statement.execute.as_secs_f64())?;
+    let operators = PyList::empty_bound(py);
+    for operator in &statement.operators {
+        let op = PyDict::new_bound(py);
+        op.set_item("id", operator.id)?;
+        op.set_item("name", &operator.name)?;
+        op.set_item("time", operator.time.as_secs_f64())?;
+        op.set_item("rows", operator.rows)?;
+        operators.append(op)?;
+    }
+    dict.set_item("operators", operators)?;
+    Ok(dict)
+}
+
+/// Convert the cumulative counters into a dict with the same time keys as a statement profile.
+pub fn counters_to_dict<'py>(
+    py: Python<'py>,
+    counters: &ProfileCounters,
+) -> PyResult<Bound<'py, PyDict>> {
+    let dict = PyDict::new_bound(py);
+    dict.set_item("queries", counters.queries)?;
+    dict.set_item("statements", counters.statements)?;
+    dict.set_item("plan_cache_hits", counters.plan_cache_hits)?;
+    dict.set_item("parse", counters.parse.as_secs_f64())?;
+    dict.set_item("bind", counters.bind.as_secs_f64())?;
+    dict.set_item(
+        "optimizer_stages",
+        counters.optimizer_stages.map(|time| time.as_secs_f64()),
+    )?;
+    dict.set_item("execute", counters.execute.as_secs_f64())?;
+    dict.set_item("total", counters.total.as_secs_f64())?;
+    Ok(dict)
+}
+
+/// Convert an optimizer report into a dict: `{"detail": ..., "stages": [stage 0 to 3]}`.
+pub fn report_to_dict<'py>(
+    py: Python<'py>,
+    report: &OptimizerReport,
+) -> PyResult<Bound<'py, PyDict>> {
+    let dict = PyDict::new_bound(py);
+    let stages = PyList::empty_bound(py);
+    for stage in &report.stages {
+        stages.append(stage_to_dict(py, stage)?)?;
+    }
+    dict.set_item("detail", report.detail.map(StatsDetail::as_str))?;
+    dict.set_item("stages", stages)?;
+    Ok(dict)
+}
+
+fn stage_to_dict<'py>(py: Python<'py>, stage: &StageReport) -> PyResult<Bound<'py, PyDict>> {
+    let dict = PyDict::new_bound(py);
+    dict.set_item("stage", stage.stage)?;
+    dict.set_item("cost", stage.cost)?;
+    dict.set_item("input_cost", stage.input_cost)?;
+    dict.set_item("relational_nodes", stage.relational_nodes)?;
+    dict.set_item("classes", stage.classes)?;
+    dict.set_item("min_nodes", stage.min_nodes)?;
+    dict.set_item("max_nodes", stage.max_nodes)?;
+    dict.set_item("avg_nodes", stage.avg_nodes)?;
+    dict.set_item("merge_count", stage.merge_count)?;
+    dict.set_item("egraph_size", stage.egraph_size)?;
+    dict.set_item("peak_nodes", stage.peak_nodes)?;
+    dict.set_item("time", stage.time.as_secs_f64())?;
+    dict.set_item("expression", &stage.expression)?;
+
+    let classes = PyList::empty_bound(py);
+    for class in &stage.class_details {
+        let info = PyDict::new_bound(py);
+        info.set_item("class_id", class.class_id)?;
+        info.set_item("node_count", class.node_count)?;
+        info.set_item("nodes", &class.nodes)?;
+        classes.append(info)?;
+    }
+    dict.set_item("class_details", classes)?;
+
+    let iterations = PyList::empty_bound(py);
+    for iteration in &stage.iterations {
+        let info = PyDict::new_bound(py);
+        info.set_item("classes", iteration.classes)?;
+        info.set_item("nodes", iteration.nodes)?;
+        info.set_item("applied", iteration.applied.clone())?;
+        info.set_item("search_time", iteration.search_time.as_secs_f64())?;
+        info.set_item("apply_time", iteration.apply_time.as_secs_f64())?;
+        info.set_item("rebuild_time", iteration.rebuild_time.as_secs_f64())?;
+        let rules = PyList::empty_bound(py);
+        for timing in &iteration.rules {
+            let rule = PyDict::new_bound(py);
+            rule.set_item("rule", &timing.rule)?;
+            rule.set_item("matches", timing.matches)?;
+            rule.set_item("applications", timing.applications)?;
+            rule.set_item("search_time", timing.search_time.as_secs_f64())?;
+            rule.set_item("apply_time", timing.apply_time.as_secs_f64())?;
+            rules.append(rule)?;
+        }
+        info.set_item("rules", rules)?;
+        iterations.append(info)?;
+    }
+    dict.set_item("iterations", iterations)?;
+    dict.set_item("rule_applications", stage.rule_applications())?;
+    Ok(dict)
+}
@@ -0,0 +1,73 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Tokio runtimes of the database handles.
+
+use std::sync::{Arc, Mutex};
+
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+use tokio::runtime::{Builder, Runtime, RuntimeFlavor};
+
+/// The process-wide runtime shared by handles opened with `runtime="shared"`, and its number of
+/// worker threads.
+static SHARED_RUNTIME: Mutex<Option<(Option<usize>, Arc<Runtime>)>> = Mutex::new(None);
+
+/// Returns a runtime of the given kind:
+///
+/// - `"multi_thread"`: a new multi-threaded runtime owned by the handle.
+/// - `"shared"`: the process-wide multi-threaded runtime, created by its first user.
+/// - `"current_thread"`: a new runtime without worker threads, driven by the calling thread.
+///
+/// `worker_threads` defaults to the number of cores. It cannot be set for `"current_thread"`,
+/// and must match the first user of the shared runtime.
+pub fn runtime(kind: &str, worker_threads: Option<usize>) -> PyResult<Arc<Runtime>> {
+    match kind {
+        "multi_thread" => Ok(Arc::new(multi_thread(worker_threads)?)),
+        "shared" => {
+            let mut shared = SHARED_RUNTIME.lock().unwrap();
+            match &*shared {
+                Some((threads, runtime)) if worker_threads.is_none_or(|n| Some(n) == *threads) => {
+                    Ok(runtime.clone())
+                }
+                Some((threads, _)) => Err(PyValueError::new_err(format!(
+                    "the shared runtime already exists with {} worker threads",
+                    threads.map_or("default".into(), |n| n.to_string())
+                ))),
+                None => {
+                    let runtime = Arc::new(multi_thread(worker_threads)?);
+                    *shared = Some((worker_threads, runtime.clone()));
+                    Ok(runtime)
+                }
+            }
+        }
+        "current_thread" => {
+            if worker_threads.is_some() {
+                return Err(PyValueError::new_err(
+                    "worker_threads cannot be set for a current_thread runtime",
+                ));
+            }
+            Ok(Arc::new(
+                Builder::new_current_thread().enable_all().build()?,
+            ))
+        }
+        _ => Err(PyValueError::new_err(format!(
+            "unknown runtime {kind:?}, expected \"multi_thread\", \"shared\" or \"current_thread\""
+        ))),
+    }
+}
+
+fn multi_thread(worker_threads: Option<usize>) -> PyResult<Runtime> {
+    let mut builder = Builder::new_multi_thread();
+    if let Some(threads) = worker_threads {
+        if threads == 0 {
+            return Err(PyValueError::new_err("worker_threads must be positive"));
+        }
+        builder.worker_threads(threads);
+    }
+    Ok(builder.enable_all().build()?)
+}
+
+/// Whether tasks spawned on the runtime make progress without a thread blocking on it.
+pub fn runs_in_background(runtime: &Runtime) -> bool {
+    runtime.handle().runtime_flavor() != RuntimeFlavor::CurrentThread
+}
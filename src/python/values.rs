@@ -0,0 +1,142 @@
+// Copyright 2024 RisingLight Project Authors. Licensed under Apache-2.0.
+
+//! Conversion of result values into native Python objects.
+//!
+//! Arrays are converted one column at a time: the Python types are looked up once per column and
+//! each value is built from its binary form instead of its text. Decimals become
+//! `decimal.Decimal`, dates `datetime.date`, timestamps `datetime.datetime` (aware, in UTC, for
+//! `TIMESTAMP WITH TIME ZONE`), intervals `datetime.timedelta`, blobs `bytes` and nulls `None`.
+
+use std::ops::Range;
+
+use chrono::{DateTime, Datelike, NaiveDate, Timelike};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+use pyo3::types::{timezone_utc_bound, PyBytes, PyDate, PyDateTime, PyDelta, PyTzInfo};
+use pyo3::ToPyObject;
+
+use crate::array::{Array, ArrayImpl};
+use crate::types::{DataValue, Interval, THIRTY_YEARS_MICROSECONDS, UNIX_EPOCH_DAYS};
+
+/// The length of a month in a `timedelta`, which has no months.
+const DAYS_PER_MONTH: i32 = 30;
+
+/// Convert the values of `array` in `rows` into Python objects, `None` for nulls.
+pub fn array_to_objects(
+    py: Python<'_>,
+    array: &ArrayImpl,
+    rows: Range<usize>,
+) -> PyResult<Vec<PyObject>> {
+    match array {
+        ArrayImpl::Bool(a) => convert(py, &**a, rows, |v| Ok(v.to_object(py))),
+        ArrayImpl::Int16(a) => convert(py, &**a, rows, |v| Ok(v.to_object(py))),
+        ArrayImpl::Int32(a) => convert(py, &**a, rows, |v| Ok(v.to_object(py))),
+        ArrayImpl::Int64(a) => convert(py, &**a, rows, |v| Ok(v.to_object(py))),
+        ArrayImpl::Float64(a) => convert(py, &**a, rows, |v| Ok(v.0.to_object(py))),
+        ArrayImpl::String(a) => convert(py, &**a, rows, |v| Ok(v.to_object(py))),
+        ArrayImpl::Decimal(a) => {
+            let decimal = py.import_bound("decimal")?.getattr("Decimal")?;
+            convert(py, &**a, rows, |v| {
+                Ok(decimal.call1((v.to_string(),))?.unbind())
+            })
+        }
+        ArrayImpl::Date(a) => convert(py, &**a, rows, |v| date_to_object(py, v.get_inner())),
+        ArrayImpl::Timestamp(a) => convert(py, &**a, rows, |v| {
+            timestamp_to_object(py, v.get_inner(), None)
+        }),
+        ArrayImpl::TimestampTz(a) => {
+            let utc = timezone_utc_bound(py);
+            convert(py, &**a, rows, |v| {
+                timestamp_to_object(py, v.get_inner(), Some(&utc))
+            })
+        }
+        ArrayImpl::Interval(a) => convert(py, &**a, rows, |v| interval_to_object(py, v)),
+        // nulls, blobs and vectors
+        _ => rows
+            .map(|row| value_to_object(py, array.get(row)))
+            .collect(),
+    }
+}
+
+/// Convert a single value into a Python object, `None` for nulls.
+pub fn value_to_object(py: Python<'_>, value: DataValue) -> PyResult<PyObject> {
+    Ok(match value {
+        DataValue::Null => py.None(),
+        DataValue::Bool(v) => v.to_object(py),
+        DataValue::Int16(v) => v.to_object(py),
+        DataValue::Int32(v) => v.to_object(py),
+        DataValue::Int64(v) => v.to_object(py),
+        DataValue::Float64(v) => v.0.to_object(py),
+        DataValue::String(s) => s.to_object(py),
+        DataValue::Blob(b) => PyBytes::new_bound(py, &b).into_any().unbind(),
+        DataValue::Decimal(v) => py
+            .import_bound("decimal")?
+            .getattr("Decimal")?
+            .call1((v.to_string(),))?
+            .unbind(),
+        DataValue::Date(v) => date_to_object(py, v.get_inner())?,
+        DataValue::Timestamp(v) => timestamp_to_object(py, v.get_inner(), None)?,
+        DataValue::TimestampTz(v) => {
+            timestamp_to_object(py, v.get_inner(), Some(&timezone_utc_bound(py)))?
+        }
+        DataValue::Interval(v) => interval_to_object(py, &v)?,
+        DataValue::Vector(v) => v
+            .iter()
+            .map(|s| s.to_object(py))
+            .collect::<Vec<_>>()
+            .to_object(py),
+    })
+}
+
+/// Apply `f` to the non-null values of `array` in `rows`.
+fn convert<'a, A: Array>(
+    py: Python<'_>,
+    array: &'a A,
+    rows: Range<usize>,
+    mut f: impl FnMut(&'a A::Item) -> PyResult<PyObject>,
+) -> PyResult<Vec<PyObject>> {
+    rows.map(|row| match array.get(row) {
+        Some(value) => f(value),
+        None => Ok(py.None()),
+    })
+    .collect()
+}
+
+/// Convert days since the Unix epoch into a `datetime.date`.
+fn date_to_object(py: Python<'_>, days: i32) -> PyResult<PyObject> {
+    let date = NaiveDate::from_num_days_from_ce_opt(days + UNIX_EPOCH_DAYS)
+        .ok_or_else(|| PyValueError::new_err("date out of range"))?;
+    let date = PyDate::new_bound(py, date.year(), date.month() as u8, date.day() as u8)?;
+    Ok(date.into_any().unbind())
+}
+
+/// Convert a timestamp into a `datetime.datetime`, naive unless `tz` is given.
+fn timestamp_to_object(
+    py: Python<'_>,
+    timestamp: i64,
+    tz: Option<&Bound<'_, PyTzInfo>>,
+) -> PyResult<PyObject> {
+    let time = DateTime::from_timestamp_micros(timestamp - THIRTY_YEARS_MICROSECONDS)
+        .ok_or_else(|| PyValueError::new_err("timestamp out of range"))?
+        .naive_utc();
+    let time = PyDateTime::new_bound(
+        py,
+        time.year(),
+        time.month() as u8,
+        time.day() as u8,
+        time.hour() as u8,
+        time.minute() as u8,
+        time.second() as u8,
+        time.nanosecond() / 1000,
+        tz,
+    )?;
+    Ok(time.into_any().unbind())
+}
+
+/// Convert an interval into a `datetime.timedelta`, counting a month as 30 days.
+fn interval_to_object(py: Python<'_>, interval: &Interval) -> PyResult<PyObject> {
+    let days = interval.num_months() * DAYS_PER_MONTH + interval.days();
+    let millis = interval.num_millis();
+    let delta = PyDelta::new_bound(py, days, millis / 1000, millis % 1000 * 1000, true)?;
+    Ok(delta.into_any().unbind())
+}
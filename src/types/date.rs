@@ -14,6 +14,7 @@ pub const UNIX_EPOCH_DAYS: i32 = 719_163;
 
 /// Date type
 #[derive(PartialOrd, Ord, PartialEq, Eq, Debug, Copy, Clone, Default, Hash, Serialize)]
+#[repr(transparent)]
 pub struct Date(i32);
 
 impl Date {
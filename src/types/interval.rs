@@ -85,6 +85,10 @@ impl Interval {
         self.months
     }
 
+    pub const fn num_millis(&self) -> i32 {
+        self.ms
+    }
+
     pub const fn is_zero(&self) -> bool {
         matches!(
             self,
@@ -12,7 +12,7 @@ use serde::Serialize;
 /// postgres timestamp counts from 2000-01-01 00:00:00,
 ///
 /// this is the difference between them
-const THIRTY_YEARS_MICROSECONDS: i64 = 946_684_800_000_000;
+pub(crate) const THIRTY_YEARS_MICROSECONDS: i64 = 946_684_800_000_000;
 
 /// global timezone
 static TIME_ZONE: OnceLock<FixedOffset> = OnceLock::new();
@@ -35,6 +35,7 @@ const TIMESTAMP_TZ_FORMATS: [&str; 5] = [
 ];
 
 #[derive(PartialOrd, Ord, PartialEq, Eq, Debug, Copy, Clone, Default, Hash, Serialize)]
+#[repr(transparent)]
 pub struct Timestamp(i64);
 
 #[derive(thiserror::Error, Debug, Clone, PartialEq, Eq)]
@@ -79,6 +80,7 @@ impl FromStr for Timestamp {
 }
 
 #[derive(PartialOrd, Ord, PartialEq, Eq, Debug, Copy, Clone, Default, Hash, Serialize)]
+#[repr(transparent)]
 pub struct TimestampTz(i64);
 
 impl TimestampTz {